@@ -8,6 +8,8 @@ interface DatePickerPanelProps {
     endDate: string | null;
     onChange: (start: string | null, end: string | null) => void;
     className?: string;
+    // Booked intervals (YYYY-MM-DD); end_date is the checkout day and stays bookable
+    bookedRanges?: { start_date: string; end_date: string }[];
 }
 
 export const DatePickerPanel: React.FC<DatePickerPanelProps> = ({
@@ -17,6 +19,7 @@ export const DatePickerPanel: React.FC<DatePickerPanelProps> = ({
     endDate,
     onChange,
     className,
+    bookedRanges = [],
 }) => {
     const [currentDate, setCurrentDate] = useState(new Date());
 
@@ -48,16 +51,31 @@ export const DatePickerPanel: React.FC<DatePickerPanelProps> = ({
         setCurrentDate(new Date(currentDate.getFullYear(), currentDate.getMonth() + 1, 1));
     };
 
+    // The night starting on `dateStr` is taken (YYYY-MM-DD strings compare in date order)
+    const isBookedNight = (dateStr: string) =>
+        bookedRanges.some(range => range.start_date <= dateStr && dateStr < range.end_date);
+
+    // A stay from startDate checking out on `dateStr` would cross a booked night
+    const crossesBooking = (dateStr: string) =>
+        !!startDate && bookedRanges.some(range => range.start_date < dateStr && range.end_date > startDate);
+
+    // Checkout day of the range being picked: the night before may be free even if this one is not
+    const isCheckoutCandidate = (dateStr: string) =>
+        !!startDate && !endDate && dateStr > startDate && !crossesBooking(dateStr);
+
     const handleDateClick = (day: number) => {
         const clickedDate = new Date(currentDate.getFullYear(), currentDate.getMonth(), day);
         const dateStr = formatDate(clickedDate);
+        const booked = isBookedNight(dateStr);
 
         if (!startDate || (startDate && endDate)) {
             // Start new range
+            if (booked) return;
             onChange(dateStr, null);
         } else {
             // Check if clicked date is before start date
-            if (new Date(dateStr) < new Date(startDate)) {
+            if (new Date(dateStr) < new Date(startDate) || crossesBooking(dateStr)) {
+                if (booked) return;
                 onChange(dateStr, null);
             } else if (dateStr === startDate) {
                 return;
@@ -136,6 +154,7 @@ export const DatePickerPanel: React.FC<DatePickerPanelProps> = ({
             const isStartWithRange = isStartDate && endDate;
             const isEndWithRange = isEndDate && startDate;
             const isMiddle = isInRange && !isStartDate && !isEndDate;
+            const isUnavailable = isBookedNight(dateStr) && !isSelected && !isCheckoutCandidate(dateStr);
 
             days.push(
                 <div key={day} className="relative p-0.5 w-full h-full flex items-center justify-center">
@@ -146,10 +165,13 @@ export const DatePickerPanel: React.FC<DatePickerPanelProps> = ({
 
                     <button
                         onClick={(e) => { e.stopPropagation(); handleDateClick(day); }}
+                        disabled={isUnavailable}
+                        title={isUnavailable ? 'Booked' : undefined}
                         className={`
                     relative w-10 h-10 rounded-full flex items-center justify-center text-sm font-medium transition-all
                     ${isSelected ? 'bg-amber-600 text-white shadow-md scale-105' : 'text-gray-700 hover:bg-gray-100 hover:text-black'}
                     ${isMiddle ? '!bg-gray-100 !w-full !rounded-none hover:bg-gray-200' : ''}
+                    ${isUnavailable ? '!text-gray-300 line-through cursor-not-allowed hover:!bg-transparent' : ''}
                   `}
                     >
                         {day}
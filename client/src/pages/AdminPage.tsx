@@ -5,6 +5,7 @@ import { listingService } from '../services/listingService';
 import { userService } from '../services/userService';
 import { reviewService, ReviewWithUser } from '../services/reviewService';
 import { reservationService } from '../services/reservationService';
+import { adminService, PlatformStats, sumCounts } from '../services/adminService';
 import { Hotel, User } from '../types';
 import { Check, X, MapPin, Home, Train, UtensilsCrossed, ShoppingBag, Trees, Landmark, Users, Trash2, Star, List, Calendar } from 'lucide-react';
 import { Button } from '../components/Button';
@@ -27,14 +28,26 @@ export const AdminPage: React.FC<AdminPageProps> = ({ onLogout }) => {
     const [pendingListings, setPendingListings] = useState<Hotel[]>([]);
     const [selectedListing, setSelectedListing] = useState<Hotel | null>(null);
     const [isLoading, setIsLoading] = useState(true);
+    const [pendingCursor, setPendingCursor] = useState<string | null>(null);
+    const [isLoadingMorePending, setIsLoadingMorePending] = useState(false);
     const [users, setUsers] = useState<User[]>([]);
     const [isLoadingUsers, setIsLoadingUsers] = useState(true);
+    const [usersCursor, setUsersCursor] = useState<string | null>(null);
+    const [isLoadingMoreUsers, setIsLoadingMoreUsers] = useState(false);
+    // Users referenced by listings and reservations, keyed by ID, for host/guest names
+    const [userDirectory, setUserDirectory] = useState<Map<string, User>>(new Map());
     const [allListings, setAllListings] = useState<Hotel[]>([]);
     const [isLoadingAllListings, setIsLoadingAllListings] = useState(true);
     const [reviews, setReviews] = useState<ReviewWithUser[]>([]);
     const [isLoadingReviews, setIsLoadingReviews] = useState(true);
+    const [reviewsCursor, setReviewsCursor] = useState<string | null>(null);
+    const [isLoadingMoreReviews, setIsLoadingMoreReviews] = useState(false);
     const [reservations, setReservations] = useState<any[]>([]);
     const [isLoadingReservations, setIsLoadingReservations] = useState(true);
+    const [reservationsCursor, setReservationsCursor] = useState<string | null>(null);
+    const [isLoadingMoreReservations, setIsLoadingMoreReservations] = useState(false);
+    // Dashboard counters; the tables below only hold the pages loaded so far
+    const [stats, setStats] = useState<PlatformStats | null>(null);
     const [allListingsRatings, setAllListingsRatings] = useState<Map<string, { rating: number; count: number }>>(new Map());
 
     // Search and filter state for listings
@@ -51,6 +64,10 @@ export const AdminPage: React.FC<AdminPageProps> = ({ onLogout }) => {
     // Search and filter state for users
     const [userSearchQuery, setUserSearchQuery] = useState('');
     const [selectedRole, setSelectedRole] = useState<string>('all');
+    const USERS_PAGE_SIZE = 50;
+    const PENDING_PAGE_SIZE = 50;
+    const REVIEWS_PAGE_SIZE = 50;
+    const RESERVATIONS_PAGE_SIZE = 50;
 
     // Refs for scroll navigation
     const pendingRef = useRef<HTMLDivElement>(null);
@@ -64,32 +81,54 @@ export const AdminPage: React.FC<AdminPageProps> = ({ onLogout }) => {
             navigate('/', { replace: true });
             return;
         }
+        loadStats();
         loadPendingListings();
-        loadUsers();
         loadAllListings();
         loadReviews();
-        loadReservations();
     }, []);
 
+    const loadStats = async () => {
+        try {
+            setStats(await adminService.getPlatformStats());
+        } catch (error) {
+            console.error("Failed to load platform statistics", error);
+        }
+    };
+
 
 
-    const loadPendingListings = async () => {
-        setIsLoading(true);
+    const loadPendingListings = async (cursor?: string) => {
+        if (cursor) {
+            setIsLoadingMorePending(true);
+        } else {
+            setIsLoading(true);
+        }
         try {
-            const data = await listingService.getPendingListings();
-            setPendingListings(data as Hotel[]);
+            const page = await listingService.getPendingListings({ limit: PENDING_PAGE_SIZE, cursor });
+            const loaded = page.listings as Hotel[];
+            setPendingListings(prev => (cursor ? [...prev, ...loaded] : loaded));
+            setPendingCursor(page.next_cursor);
         } catch (error) {
             console.error("Failed to load pending listings", error);
         } finally {
             setIsLoading(false);
+            setIsLoadingMorePending(false);
         }
     };
 
+    // Moderating every loaded listing leaves the next pages behind the cursor; start over
+    useEffect(() => {
+        if (!isLoading && pendingListings.length === 0 && pendingCursor) {
+            loadPendingListings();
+        }
+    }, [pendingListings, pendingCursor]);
+
     const handleApprove = async (listingId: string) => {
         try {
             await listingService.approveListing(listingId);
             setPendingListings(prev => prev.filter(l => l.id !== listingId));
             setSelectedListing(null);
+            loadStats();
         } catch (error) {
             console.error("Failed to approve listing", error);
         }
@@ -100,23 +139,74 @@ export const AdminPage: React.FC<AdminPageProps> = ({ onLogout }) => {
             await listingService.rejectListing(listingId);
             setPendingListings(prev => prev.filter(l => l.id !== listingId));
             setSelectedListing(null);
+            loadStats();
         } catch (error) {
             console.error("Failed to decline listing", error);
         }
     };
 
-    const loadUsers = async () => {
-        setIsLoadingUsers(true);
+    const userKey = (u: User) => String(typeof u._id === 'object' ? u._id.$oid : u._id);
+
+    const addToDirectory = (loaded: User[]) => {
+        setUserDirectory(prev => {
+            const next = new Map(prev);
+            loaded.forEach(u => next.set(userKey(u), u));
+            return next;
+        });
+    };
+
+    const findUser = (userId: any) => (userId ? userDirectory.get(String(userId)) : undefined);
+
+    // Loads one page of users; search and role filtering happen on the server
+    const loadUsers = async (cursor?: string) => {
+        if (cursor) {
+            setIsLoadingMoreUsers(true);
+        } else {
+            setIsLoadingUsers(true);
+        }
         try {
-            const data = await userService.getAllUsers();
-            setUsers(data);
+            const page = await userService.getUsers({
+                q: userSearchQuery || undefined,
+                role: selectedRole !== 'all' ? selectedRole : undefined,
+                limit: USERS_PAGE_SIZE,
+                cursor
+            });
+            setUsers(prev => (cursor ? [...prev, ...page.users] : page.users));
+            setUsersCursor(page.next_cursor ?? null);
+            addToDirectory(page.users);
         } catch (error) {
             console.error("Failed to load users", error);
         } finally {
             setIsLoadingUsers(false);
+            setIsLoadingMoreUsers(false);
         }
     };
 
+    // Reload the first page when the search or role filter changes
+    useEffect(() => {
+        if (!user || user.role !== 'admin') return;
+        const timeout = setTimeout(() => loadUsers(), 300);
+        return () => clearTimeout(timeout);
+    }, [userSearchQuery, selectedRole]);
+
+    // Fetch the hosts and guests shown in the listing and reservation tables
+    useEffect(() => {
+        const referenced = new Set<string>();
+        [...pendingListings, ...allListings].forEach(l => {
+            const hostId = typeof l.host_id === 'object' ? l.host_id.$oid : l.host_id;
+            if (hostId) referenced.add(String(hostId));
+        });
+        reservations.forEach(r => {
+            const userId = typeof r.user_id === 'object' ? r.user_id.$oid : r.user_id;
+            if (userId) referenced.add(String(userId));
+        });
+        const missing = Array.from(referenced).filter(id => !userDirectory.has(id));
+        if (missing.length === 0) return;
+        userService.getUsersByIds(missing)
+            .then(addToDirectory)
+            .catch(error => console.error("Failed to load listing hosts and guests", error));
+    }, [pendingListings, allListings, reservations]);
+
     const loadAllListings = async () => {
         setIsLoadingAllListings(true);
         try {
@@ -129,15 +219,21 @@ export const AdminPage: React.FC<AdminPageProps> = ({ onLogout }) => {
         }
     };
 
-    const loadReviews = async () => {
-        setIsLoadingReviews(true);
+    const loadReviews = async (cursor?: string) => {
+        if (cursor) {
+            setIsLoadingMoreReviews(true);
+        } else {
+            setIsLoadingReviews(true);
+        }
         try {
-            const data = await reviewService.getAllReviews();
-            setReviews(data);
+            const page = await reviewService.getReviews({ limit: REVIEWS_PAGE_SIZE, cursor });
+            setReviews(prev => (cursor ? [...prev, ...page.reviews] : page.reviews));
+            setReviewsCursor(page.next_cursor);
         } catch (error) {
             console.error("Failed to load reviews", error);
         } finally {
             setIsLoadingReviews(false);
+            setIsLoadingMoreReviews(false);
         }
     };
 
@@ -150,6 +246,7 @@ export const AdminPage: React.FC<AdminPageProps> = ({ onLogout }) => {
                 const id = typeof u._id === 'object' ? u._id.$oid : u._id;
                 return id !== userId;
             }));
+            loadStats();
         } catch (error) {
             console.error("Failed to delete user", error);
         }
@@ -164,23 +261,40 @@ export const AdminPage: React.FC<AdminPageProps> = ({ onLogout }) => {
                 const id = typeof r._id === 'object' ? r._id.$oid : r._id;
                 return id !== reviewId;
             }));
+            loadStats();
         } catch (error) {
             console.error("Failed to delete review", error);
         }
     };
 
-    const loadReservations = async () => {
-        setIsLoadingReservations(true);
+    const loadReservations = async (cursor?: string) => {
+        if (cursor) {
+            setIsLoadingMoreReservations(true);
+        } else {
+            setIsLoadingReservations(true);
+        }
         try {
-            const data = await reservationService.getAllReservations();
-            setReservations(data);
+            const page = await reservationService.getReservations({
+                status: selectedStatus !== 'all' ? selectedStatus : undefined,
+                limit: RESERVATIONS_PAGE_SIZE,
+                cursor
+            });
+            setReservations(prev => (cursor ? [...prev, ...page.reservations] : page.reservations));
+            setReservationsCursor(page.next_cursor);
         } catch (error) {
             console.error("Failed to load reservations", error);
         } finally {
             setIsLoadingReservations(false);
+            setIsLoadingMoreReservations(false);
         }
     };
 
+    // Reload the first page when the status filter changes
+    useEffect(() => {
+        if (!user || user.role !== 'admin') return;
+        loadReservations();
+    }, [selectedStatus]);
+
     const handleDeleteReservation = async (reservationId: string) => {
         if (!confirm('Are you sure you want to delete this reservation?')) return;
 
@@ -190,6 +304,7 @@ export const AdminPage: React.FC<AdminPageProps> = ({ onLogout }) => {
                 const id = typeof r._id === 'object' ? r._id.$oid : r._id;
                 return id !== reservationId;
             }));
+            loadStats();
         } catch (error) {
             console.error("Failed to delete reservation", error);
         }
@@ -248,14 +363,11 @@ export const AdminPage: React.FC<AdminPageProps> = ({ onLogout }) => {
         setCurrentPage(1);
     }, [listingSearchQuery, selectedHost]);
 
-    // Filter and paginate reservations
+    // Search and paginate the loaded reservations (the status filter is applied by the server)
     const filteredReservations = reservations.filter(reservation => {
         // Get guest user info
         const userId = typeof reservation.user_id === 'object' ? reservation.user_id.$oid : reservation.user_id;
-        const guestUser = users.find(u => {
-            const uId = typeof u._id === 'object' ? u._id.$oid : u._id;
-            return String(uId) === String(userId);
-        });
+        const guestUser = findUser(userId);
 
         // Get listing info
         const listingId = typeof reservation.listing_id === 'object' ? reservation.listing_id.$oid : reservation.listing_id;
@@ -268,10 +380,7 @@ export const AdminPage: React.FC<AdminPageProps> = ({ onLogout }) => {
             guestUser?.email?.toLowerCase().includes(searchLower) ||
             listing?.title?.toLowerCase().includes(searchLower);
 
-        // Filter by status
-        const matchesStatus = selectedStatus === 'all' || reservation.status === selectedStatus;
-
-        return matchesSearch && matchesStatus;
+        return matchesSearch;
     });
 
     // Pagination for reservations
@@ -285,21 +394,6 @@ export const AdminPage: React.FC<AdminPageProps> = ({ onLogout }) => {
         setReservationCurrentPage(1);
     }, [reservationSearchQuery, selectedStatus]);
 
-    // Filter users by search and role
-    const filteredUsers = users.filter(user => {
-        // Filter by search query (name, email, or username)
-        const searchLower = userSearchQuery.toLowerCase();
-        const matchesSearch = !userSearchQuery ||
-            user.name?.toLowerCase().includes(searchLower) ||
-            user.email?.toLowerCase().includes(searchLower) ||
-            user.username?.toLowerCase().includes(searchLower);
-
-        // Filter by role
-        const matchesRole = selectedRole === 'all' || user.role === selectedRole;
-
-        return matchesSearch && matchesRole;
-    });
-
     return (
         <>
             {/* Floating Navigation */}
@@ -376,6 +470,24 @@ export const AdminPage: React.FC<AdminPageProps> = ({ onLogout }) => {
                     </Button>
                 </div>
 
+                {/* Platform Counters (GET /api/admin/stats) */}
+                {stats && (
+                    <div className="grid grid-cols-2 md:grid-cols-5 gap-4 mb-8">
+                        {[
+                            { label: 'Users', value: sumCounts(stats.users_by_role).toLocaleString() },
+                            { label: 'Approved Listings', value: (stats.listings_by_status?.approved ?? 0).toLocaleString() },
+                            { label: 'Reservations', value: sumCounts(stats.reservations_by_status).toLocaleString() },
+                            { label: 'Reviews', value: (stats.reviews?.count ?? 0).toLocaleString() },
+                            { label: 'GMV', value: `₺${(stats.payments?.gmv ?? 0).toLocaleString()}` },
+                        ].map(card => (
+                            <div key={card.label} className="bg-white rounded-2xl shadow-lg border border-gray-100 p-4">
+                                <p className="text-xs font-bold text-gray-500 uppercase tracking-wide">{card.label}</p>
+                                <p className="text-2xl font-bold text-gray-900 mt-1">{card.value}</p>
+                            </div>
+                        ))}
+                    </div>
+                )}
+
                 {/* Pending Approvals List */}
                 <div ref={pendingRef}>
                     <div className="bg-white rounded-2xl shadow-lg border border-gray-100 overflow-hidden">
@@ -386,7 +498,7 @@ export const AdminPage: React.FC<AdminPageProps> = ({ onLogout }) => {
                             </div>
                             {pendingListings.length > 0 && (
                                 <span className="bg-amber-100 text-amber-800 text-xs font-bold px-3 py-1 rounded-full uppercase tracking-wide">
-                                    {pendingListings.length} Pending
+                                    {stats?.listings_by_status?.pending ?? `${pendingListings.length}${pendingCursor ? '+' : ''}`} Pending
                                 </span>
                             )}
                         </div>
@@ -441,16 +553,7 @@ export const AdminPage: React.FC<AdminPageProps> = ({ onLogout }) => {
 
                                                     console.log('Extracted host ID:', hostId);
 
-                                                    // Try to find the host in multiple ways
-                                                    const host = hostId ? users.find(u => {
-                                                        // Get user ID in various formats
-                                                        const uId = typeof u._id === 'object' ? u._id.$oid : u._id;
-                                                        const uIdStr = String(uId);
-                                                        const hostIdStr = String(hostId);
-
-                                                        // Try exact match and string comparison
-                                                        return uId === hostId || uIdStr === hostIdStr;
-                                                    }) : null;
+                                                    const host = findUser(hostId);
 
                                                     const hostName = host?.name || host?.username || 'Unknown Host';
                                                     const hostInitial = hostName.charAt(0).toUpperCase();
@@ -491,6 +594,17 @@ export const AdminPage: React.FC<AdminPageProps> = ({ onLogout }) => {
                                         </div>
                                     </div>
                                 ))}
+                                {pendingCursor && (
+                                    <div className="px-6 py-4 bg-gray-50 flex justify-center">
+                                        <button
+                                            onClick={() => loadPendingListings(pendingCursor)}
+                                            disabled={isLoadingMorePending}
+                                            className="px-3 py-1 rounded-lg border border-gray-300 bg-white text-sm font-medium text-gray-700 hover:bg-gray-50 disabled:opacity-50 disabled:cursor-not-allowed transition-colors"
+                                        >
+                                            {isLoadingMorePending ? 'Loading...' : 'Load more'}
+                                        </button>
+                                    </div>
+                                )}
                             </div>
                         )}
                     </div>
@@ -509,18 +623,18 @@ export const AdminPage: React.FC<AdminPageProps> = ({ onLogout }) => {
                             </div>
                             {users.length > 0 && (
                                 <span className="bg-blue-100 text-blue-800 text-xs font-bold px-3 py-1 rounded-full uppercase tracking-wide">
-                                    {users.length} Users
+                                    {users.length}{usersCursor ? '+' : ''} Users
                                 </span>
                             )}
                         </div>
 
                         {/* Search and Filter Controls */}
-                        {!isLoadingUsers && users.length > 0 && (
+                        {(users.length > 0 || userSearchQuery || selectedRole !== 'all') && (
                             <div className="p-4 bg-gray-50 border-b border-gray-200 flex flex-col sm:flex-row gap-3">
                                 <div className="flex-1">
                                     <input
                                         type="text"
-                                        placeholder="Search by name, email, or username..."
+                                        placeholder="Search by start of name, email, or username..."
                                         value={userSearchQuery}
                                         onChange={(e) => setUserSearchQuery(e.target.value)}
                                         className="w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500 focus:border-transparent"
@@ -546,7 +660,7 @@ export const AdminPage: React.FC<AdminPageProps> = ({ onLogout }) => {
                                 <div className="animate-spin rounded-full h-8 w-8 border-b-2 border-blue-500 mb-4"></div>
                                 <p>Loading users...</p>
                             </div>
-                        ) : users.length === 0 ? (
+                        ) : users.length === 0 && !userSearchQuery && selectedRole === 'all' ? (
                             <div className="p-16 text-center text-gray-400 bg-white">
                                 <div className="mx-auto w-16 h-16 bg-gray-100 rounded-full flex items-center justify-center mb-4 text-gray-300">
                                     <Users size={32} />
@@ -568,7 +682,7 @@ export const AdminPage: React.FC<AdminPageProps> = ({ onLogout }) => {
                                         </tr>
                                     </thead>
                                     <tbody className="bg-white divide-y divide-gray-200">
-                                        {filteredUsers.length === 0 ? (
+                                        {users.length === 0 ? (
                                             <tr>
                                                 <td colSpan={6} className="px-6 py-12 text-center text-gray-500">
                                                     <div className="flex flex-col items-center">
@@ -577,7 +691,7 @@ export const AdminPage: React.FC<AdminPageProps> = ({ onLogout }) => {
                                                     </div>
                                                 </td>
                                             </tr>
-                                        ) : filteredUsers.map(u => {
+                                        ) : users.map(u => {
                                             const userId = typeof u._id === 'object' ? u._id.$oid : u._id;
                                             const isCurrentUser = userId === user?.id;
 
@@ -653,6 +767,17 @@ export const AdminPage: React.FC<AdminPageProps> = ({ onLogout }) => {
                                         })}
                                     </tbody>
                                 </table>
+                                {usersCursor && (
+                                    <div className="px-6 py-4 bg-gray-50 border-t border-gray-200 flex justify-center">
+                                        <button
+                                            onClick={() => loadUsers(usersCursor)}
+                                            disabled={isLoadingMoreUsers}
+                                            className="px-3 py-1 rounded-lg border border-gray-300 bg-white text-sm font-medium text-gray-700 hover:bg-gray-50 disabled:opacity-50 disabled:cursor-not-allowed transition-colors"
+                                        >
+                                            {isLoadingMoreUsers ? 'Loading...' : 'Load more'}
+                                        </button>
+                                    </div>
+                                )}
                             </div>
                         )}
                     </div>
@@ -699,10 +824,7 @@ export const AdminPage: React.FC<AdminPageProps> = ({ onLogout }) => {
                                             const hostId = typeof l.host_id === 'object' ? l.host_id.$oid : l.host_id;
                                             return hostId;
                                         }).filter(Boolean))).map(hostId => {
-                                            const host = users.find(u => {
-                                                const uId = typeof u._id === 'object' ? u._id.$oid : u._id;
-                                                return String(uId) === String(hostId);
-                                            });
+                                            const host = findUser(hostId);
                                             return (
                                                 <option key={hostId} value={hostId}>
                                                     {host?.name || host?.username || `Host ${String(hostId).substring(0, 8)}`}
@@ -754,10 +876,7 @@ export const AdminPage: React.FC<AdminPageProps> = ({ onLogout }) => {
                                         ) : paginatedListings.map(listing => {
                                             // Find the host for this listing
                                             const hostId = typeof listing.host_id === 'object' ? listing.host_id.$oid : listing.host_id;
-                                            const host = users.find(u => {
-                                                const uId = typeof u._id === 'object' ? u._id.$oid : u._id;
-                                                return String(uId) === String(hostId);
-                                            });
+                                            const host = findUser(hostId);
 
                                             return (
                                                 <tr key={listing.id} className="hover:bg-gray-50 transition-colors">
@@ -919,7 +1038,7 @@ export const AdminPage: React.FC<AdminPageProps> = ({ onLogout }) => {
                             </div>
                             {reviews.length > 0 && (
                                 <span className="bg-amber-100 text-amber-800 text-xs font-bold px-3 py-1 rounded-full uppercase tracking-wide">
-                                    {reviews.length} Reviews
+                                    {stats?.reviews?.count ?? `${reviews.length}${reviewsCursor ? '+' : ''}`} Reviews
                                 </span>
                             )}
                         </div>
@@ -1049,6 +1168,17 @@ export const AdminPage: React.FC<AdminPageProps> = ({ onLogout }) => {
                                 })}
                             </div>
                         )}
+                        {reviewsCursor && (
+                            <div className="px-6 py-4 bg-gray-50 border-t border-gray-200 flex justify-center">
+                                <button
+                                    onClick={() => loadReviews(reviewsCursor)}
+                                    disabled={isLoadingMoreReviews}
+                                    className="px-3 py-1 rounded-lg border border-gray-300 bg-white text-sm font-medium text-gray-700 hover:bg-gray-50 disabled:opacity-50 disabled:cursor-not-allowed transition-colors"
+                                >
+                                    {isLoadingMoreReviews ? 'Loading...' : 'Load more'}
+                                </button>
+                            </div>
+                        )}
                     </div>
                 </div>
 
@@ -1065,13 +1195,15 @@ export const AdminPage: React.FC<AdminPageProps> = ({ onLogout }) => {
                             </div>
                             {reservations.length > 0 && (
                                 <span className="bg-blue-100 text-blue-800 text-xs font-bold px-3 py-1 rounded-full uppercase tracking-wide">
-                                    {reservations.length} Reservations
+                                    {stats
+                                        ? (selectedStatus === 'all' ? sumCounts(stats.reservations_by_status) : stats.reservations_by_status?.[selectedStatus] ?? 0)
+                                        : `${reservations.length}${reservationsCursor ? '+' : ''}`} Reservations
                                 </span>
                             )}
                         </div>
 
                         {/* Search and Filter Controls */}
-                        {!isLoadingReservations && reservations.length > 0 && (
+                        {(reservations.length > 0 || selectedStatus !== 'all') && (
                             <div className="p-4 bg-gray-50 border-b border-gray-200 flex flex-col sm:flex-row gap-3">
                                 <div className="flex-1">
                                     <input
@@ -1142,10 +1274,7 @@ export const AdminPage: React.FC<AdminPageProps> = ({ onLogout }) => {
 
                                             // Find the listing and user for this reservation
                                             const listing = allListings.find(l => l.id === listingId);
-                                            const guestUser = users.find(u => {
-                                                const uId = typeof u._id === 'object' ? u._id.$oid : u._id;
-                                                return uId === userId;
-                                            });
+                                            const guestUser = findUser(userId);
 
                                             return (
                                                 <tr key={reservationId} className="hover:bg-gray-50 transition-colors">
@@ -1293,6 +1422,17 @@ export const AdminPage: React.FC<AdminPageProps> = ({ onLogout }) => {
                                 </div>
                             </div>
                         )}
+                        {reservationsCursor && (
+                            <div className="px-6 py-4 bg-gray-50 border-t border-gray-200 flex justify-center">
+                                <button
+                                    onClick={() => loadReservations(reservationsCursor)}
+                                    disabled={isLoadingMoreReservations}
+                                    className="px-3 py-1 rounded-lg border border-gray-300 bg-white text-sm font-medium text-gray-700 hover:bg-gray-50 disabled:opacity-50 disabled:cursor-not-allowed transition-colors"
+                                >
+                                    {isLoadingMoreReservations ? 'Loading...' : 'Load more'}
+                                </button>
+                            </div>
+                        )}
                     </div>
                 </div>
 
@@ -72,6 +72,7 @@ export const DetailPage: React.FC<DetailPageProps> = ({ hotel: propHotel, onBack
   const [hostUsername, setHostUsername] = useState<string>('Host');
   const [hostDetails, setHostDetails] = useState<HostDetails | null>(null);
   const [isCurrentUserHost, setIsCurrentUserHost] = useState(false);
+  const [bookedRanges, setBookedRanges] = useState<{ start_date: string; end_date: string }[]>([]);
   const hostRef = useRef<HTMLDivElement>(null);
 
   /* Effects */
@@ -115,6 +116,14 @@ export const DetailPage: React.FC<DetailPageProps> = ({ hotel: propHotel, onBack
     fetchReviews();
   }, [hotel]);
 
+  // Booked nights for the date picker, refreshed each time it opens
+  useEffect(() => {
+    if (!hotel?.id || !showDatePicker) return;
+    listingService.getListingAvailability(String(hotel.id))
+      .then((availability) => setBookedRanges(availability.booked))
+      .catch((err) => console.error('Failed to fetch availability:', err));
+  }, [hotel, showDatePicker]);
+
   // Fetch host details
   useEffect(() => {
     const fetchHostDetails = async () => {
@@ -738,6 +747,7 @@ export const DetailPage: React.FC<DetailPageProps> = ({ hotel: propHotel, onBack
                             startDate={checkIn || null}
                             endDate={checkOut || null}
                             onChange={handleDateChange}
+                            bookedRanges={bookedRanges}
                             className="absolute top-full right-0 mt-4 w-[350px] md:w-[500px] lg:w-[700px] shadow-2xl z-[60]"
                           />
                         </>
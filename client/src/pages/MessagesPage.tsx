@@ -28,6 +28,10 @@ export default function MessagesPage({ onBack }: Props) {
   const [conversations, setConversations] = useState<Conversation[]>([]);
   const [loadingConvos, setLoadingConvos] = useState(false);
   const [loadingChat, setLoadingChat] = useState(false);
+  const [olderCursor, setOlderCursor] = useState<string | null>(null);
+  // Bumped to reload the open chat after the stream missed too much
+  const [chatReloads, setChatReloads] = useState(0);
+  const [loadingOlder, setLoadingOlder] = useState(false);
 
   const [query, setQuery] = useState("");
 
@@ -76,21 +80,91 @@ export default function MessagesPage({ onBack }: Props) {
     const fetchMessages = async () => {
       setLoadingChat(true);
       try {
-        const msgs = await messageService.getDMMessages(selectedUser);
-        setChat(Array.isArray(msgs) ? msgs : []);
+        const page = await messageService.getDMMessagesPage(selectedUser);
+        setChat(Array.isArray(page.messages) ? page.messages : []);
+        setOlderCursor(page.before);
       } catch (e) {
         console.error("Failed to fetch messages:", e);
         setChat([]);
+        setOlderCursor(null);
       } finally {
         setLoadingChat(false);
       }
     };
 
     fetchMessages();
-  }, [selectedUser, token]);
+  }, [selectedUser, token, chatReloads]);
+
+  // Live updates: append incoming messages to the open chat and refresh the list.
+  // The open chat is read through a ref so switching chats keeps the same stream.
+  const selectedUserRef = useRef<string | null>(selectedUser);
+  useEffect(() => {
+    selectedUserRef.current = selectedUser;
+  }, [selectedUser]);
+
+  useEffect(() => {
+    if (!token) return;
+
+    const refreshConversations = () =>
+      messageService
+        .getAvailableConversations()
+        .then((updated) => setConversations(Array.isArray(updated) ? updated : []))
+        .catch((e) => console.warn("Could not refresh conversations (non-fatal):", e));
+
+    const source = messageService.openMessageStream(
+      (incoming) => {
+        // Own messages are already shown optimistically
+        if (incoming.sender_username === currentUsername) return;
+        if (incoming.sender_username === selectedUserRef.current) {
+          setChat((prev) => [...prev, incoming]);
+        }
+        refreshConversations();
+      },
+      // A broadcast sent from another tab: one summary event for all recipients
+      (summary) => {
+        const open = selectedUserRef.current;
+        if (open && summary.recipients.includes(open)) {
+          setChat((prev) => [...prev, {
+            sender_username: summary.sender_username,
+            receiver_username: open,
+            content: summary.content,
+            created_at: summary.created_at,
+          }]);
+        }
+        refreshConversations();
+      },
+      () => {
+        setChatReloads((n) => n + 1);
+        refreshConversations();
+      }
+    );
+
+    return () => source?.close();
+  }, [token, currentUsername]);
+
+  // Older pages are loaded on demand when scrolling back through the history
+  const skipScrollRef = useRef(false);
+  const loadOlderMessages = async () => {
+    if (!selectedUser || !olderCursor || loadingOlder) return;
+    setLoadingOlder(true);
+    try {
+      const page = await messageService.getDMMessagesPage(selectedUser, { before: olderCursor });
+      skipScrollRef.current = true;
+      setChat((prev) => [...page.messages, ...prev]);
+      setOlderCursor(page.before);
+    } catch (e) {
+      console.error("Failed to load older messages:", e);
+    } finally {
+      setLoadingOlder(false);
+    }
+  };
 
   // ✅ Chat güncellenince en alta kaydır
   useEffect(() => {
+    if (skipScrollRef.current) {
+      skipScrollRef.current = false;
+      return;
+    }
     chatEndRef.current?.scrollIntoView({ behavior: "smooth" });
   }, [chat.length, selectedUser]);
 
@@ -273,6 +347,18 @@ export default function MessagesPage({ onBack }: Props) {
               </div>
             )}
 
+            {selectedUser && !loadingChat && olderCursor && (
+              <div className="text-center">
+                <button
+                  onClick={loadOlderMessages}
+                  disabled={loadingOlder}
+                  className="text-sm text-gray-500 hover:text-gray-700"
+                >
+                  {loadingOlder ? "Loading..." : "Load earlier messages"}
+                </button>
+              </div>
+            )}
+
             {selectedUser && loadingChat && (
               <div className="text-center text-gray-500">Loading messages...</div>
             )}
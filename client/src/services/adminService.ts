@@ -0,0 +1,30 @@
+import api from './api';
+
+// Materialized counters kept by the server (GET /api/admin/stats)
+export interface PlatformStats {
+    users_by_role?: Record<string, number>;
+    listings_by_status?: Record<string, number>;
+    reservations_by_status?: Record<string, number>;
+    payments?: { count?: number; gmv?: number };
+    reviews?: { count?: number; rating_sum?: number };
+    daily: {
+        date: string;
+        reservations?: Record<string, number>;
+        payments?: { count?: number; gmv?: number };
+        reviews?: { count?: number };
+        users?: { registered?: number };
+        listings?: { created?: number };
+    }[];
+}
+
+// Total of a {status: count} counter group
+export const sumCounts = (counts?: Record<string, number>) =>
+    Object.values(counts || {}).reduce((total, count) => total + count, 0);
+
+export const adminService = {
+    // Admin: Dashboard counters in one small request, plus the last `days` daily entries
+    getPlatformStats: async (days: number = 30): Promise<PlatformStats> => {
+        const response = await api.get('/api/admin/stats', { params: { days } });
+        return response.data;
+    },
+};
@@ -47,10 +47,24 @@ export const listingService = {
         return response.data;
     },
 
+    getListingAvailability: async (listingId: string, from?: string, to?: string) => {
+        const response = await api.get(`/api/listings/${listingId}/availability`, { params: { from, to } });
+        return response.data as { listing_id: string; from: string; to: string; booked: { start_date: string; end_date: string }[] };
+    },
+
     // Admin methods
-    getPendingListings: async () => {
-        const response = await api.get('/api/listings/admin/pending');
-        return transformAllListingsToHotels(response.data);  // Don't filter pending listings
+    // Admin: One page of pending listings; pass next_cursor back to get the next page
+    getPendingListings: async (params: { limit?: number; cursor?: string } = {}) => {
+        const response = await api.get('/api/listings/admin/pending', { params });
+        return {
+            listings: transformAllListingsToHotels(response.data.listings),  // Don't filter pending listings
+            next_cursor: (response.data.next_cursor ?? null) as string | null
+        };
+    },
+
+    moderateListings: async (decisions: { listing_id: string; decision: 'approve' | 'reject' }[]) => {
+        const response = await api.post('/api/listings/admin/moderate', { decisions });
+        return response.data as { results: { listing_id: string; result: string }[]; modified: number };
     },
 
     approveListing: async (id: number | string) => {
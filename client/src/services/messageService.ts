@@ -9,6 +9,39 @@ export interface Message {
   created_at?: string;
 }
 
+// Wait before reopening a stream the server refused
+const STREAM_RETRY_MS = 30000;
+
+// Sent to the host's own stream once per broadcast (guests get regular messages)
+export interface BroadcastSummary {
+  sender_username: string;
+  content: string;
+  created_at: string;
+  recipients: string[];
+}
+
+// One page of message history, oldest to newest. `before` loads older
+// messages (null when there are none), `after` fetches newer ones.
+export interface MessagePage {
+  messages: Message[];
+  before: string | null;
+  after: string | null;
+  has_more: boolean;
+}
+
+type PageParams = { limit?: number; before?: string; after?: string };
+
+// Changes since a sync cursor. Store `cursor` and call again while `has_more`;
+// on `reset` reload messages and inbox, then continue from `cursor`.
+export interface SyncResult {
+  messages: Message[];
+  deleted_message_ids: string[];
+  conversations: any[];
+  cursor: string;
+  has_more: boolean;
+  reset: boolean;
+}
+
 export const messageService = {
   // Tüm mesajlar (admin gibi) — lazım olmayabilir
   getAllMessages: async (): Promise<Message[]> => {
@@ -17,11 +50,17 @@ export const messageService = {
   },
 
   // ✅ DM konuşması (conversation_id bilmeye gerek yok)
-  getDMMessages: async (otherUsername: string): Promise<Message[]> => {
-    const res = await api.get(`/api/messages/dm/${encodeURIComponent(otherUsername)}`);
+  getDMMessagesPage: async (otherUsername: string, params: PageParams = {}): Promise<MessagePage> => {
+    const res = await api.get(`/api/messages/dm/${encodeURIComponent(otherUsername)}`, { params });
     return res.data;
   },
 
+  // Latest page only; older pages via getDMMessagesPage(..., { before })
+  getDMMessages: async (otherUsername: string): Promise<Message[]> => {
+    const page = await messageService.getDMMessagesPage(otherUsername);
+    return page.messages;
+  },
+
   // ✅ Mesaj gönder
   sendMessage: async (receiverUsername: string, content: string) => {
     const res = await api.post("/api/messages/", {
@@ -48,13 +87,13 @@ export const messageService = {
   },
 
   // (istersen kullan) conversation_id ile çekme
-  getConversationMessages: async (conversationId: string): Promise<Message[]> => {
-    const res = await api.get(`/api/messages/conversation/${encodeURIComponent(conversationId)}`);
+  getConversationMessages: async (conversationId: string, params: PageParams = {}): Promise<MessagePage> => {
+    const res = await api.get(`/api/messages/conversation/${encodeURIComponent(conversationId)}`, { params });
     return res.data;
   },
 
-  getUserMessages: async (username: string): Promise<Message[]> => {
-    const res = await api.get(`/api/messages/user/${encodeURIComponent(username)}`);
+  getUserMessages: async (username: string, params: PageParams = {}): Promise<MessagePage> => {
+    const res = await api.get(`/api/messages/user/${encodeURIComponent(username)}`, { params });
     return res.data;
   },
 
@@ -73,6 +112,70 @@ export const messageService = {
     return [];
   },
 
+  // Push channel for new messages (Server-Sent Events). EventSource cannot send
+  // headers, so the token goes in the query string; the browser reconnects on
+  // its own and the server replays messages missed in between. When the server
+  // refuses the stream (503: the worker has no free stream slots) the browser
+  // gives up, so the stream is reopened here after STREAM_RETRY_MS.
+  openMessageStream: (
+    onMessage: (message: Message) => void,
+    onBroadcast?: (summary: BroadcastSummary) => void,
+    // Too many messages were missed to replay: reload conversations and the open chat
+    onReset?: () => void
+  ): { close: () => void } | null => {
+    const token = localStorage.getItem("access_token");
+    if (!token) return null;
+    let source: EventSource;
+    let lastEventId = "";
+    let retry: ReturnType<typeof setTimeout> | undefined;
+    let closed = false;
+
+    const open = () => {
+      const params = `jwt=${encodeURIComponent(token)}` +
+        (lastEventId ? `&last_event_id=${encodeURIComponent(lastEventId)}` : "");
+      source = new EventSource(`${api.defaults.baseURL}/api/messages/stream?${params}`);
+      source.addEventListener("message", (event) => {
+        lastEventId = (event as MessageEvent).lastEventId || lastEventId;
+        onMessage(JSON.parse((event as MessageEvent).data));
+      });
+      if (onBroadcast) {
+        source.addEventListener("broadcast", (event) => {
+          lastEventId = (event as MessageEvent).lastEventId || lastEventId;
+          onBroadcast(JSON.parse((event as MessageEvent).data));
+        });
+      }
+      source.addEventListener("reset", (event) => {
+        lastEventId = (event as MessageEvent).lastEventId || lastEventId;
+        onReset?.();
+      });
+      source.onerror = () => {
+        if (source.readyState === EventSource.CLOSED && !closed) {
+          retry = setTimeout(open, STREAM_RETRY_MS);
+        }
+      };
+    };
+
+    open();
+    return {
+      close: () => {
+        closed = true;
+        clearTimeout(retry);
+        source.close();
+      },
+    };
+  },
+
+  // Host only: message every guest with an upcoming reservation
+  broadcastMessage: async (content: string, listingId?: string): Promise<{ sent: number; recipients: string[] }> => {
+    const res = await api.post("/api/messages/broadcast", { content, listing_id: listingId });
+    return res.data;
+  },
+
+  syncMessages: async (since: string = "0"): Promise<SyncResult> => {
+    const res = await api.get("/api/messages/sync", { params: { since } });
+    return res.data;
+  },
+
   // ✅ Create or get existing conversation with a user
   createOrGetConversation: async (receiverUsername: string): Promise<any> => {
     const res = await api.post("/api/conversations/create", {
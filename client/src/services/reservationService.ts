@@ -22,6 +22,11 @@ export const reservationService = {
         return response.data;
     },
 
+    getUserTrips: async (userId: string, params: { page?: number; limit?: number; status?: string } = {}) => {
+        const response = await api.get(`/api/reservations/user/${userId}/trips`, { params });
+        return response.data;
+    },
+
     getReservationById: async (id: string) => {
         const response = await api.get(`/api/reservations/${id}`);
         return response.data;
@@ -44,6 +49,11 @@ export const reservationService = {
         return response.data;
     },
 
+    getHostDashboard: async (hostId: string, params: { page?: number; limit?: number; status?: string } = {}) => {
+        const response = await api.get(`/api/reservations/host/${hostId}/dashboard`, { params });
+        return response.data;
+    },
+
     approveReservation: async (id: string) => {
         const response = await api.post(`/api/reservations/${id}/accept`);
         return response.data;
@@ -55,9 +65,10 @@ export const reservationService = {
     },
 
     // Admin methods
-    getAllReservations: async () => {
-        const response = await api.get('/api/reservations/');
-        return response.data;
+    // One page of reservations (archived included); pass next_cursor back to get the next page
+    getReservations: async (params: { status?: string; sort?: 'created' | 'start_date'; order?: 'asc' | 'desc'; limit?: number; cursor?: string } = {}) => {
+        const response = await api.get('/api/reservations/', { params });
+        return response.data as { reservations: any[]; next_cursor: string | null };
     },
 
     deleteReservation: async (id: string) => {
@@ -72,8 +72,9 @@ export const reviewService = {
     },
 
     // Admin: Get all reviews
-    getAllReviews: async () => {
-        const response = await api.get('/api/reviews/');
-        return response.data;
+    // Admin: One page of reviews, newest first; pass next_cursor back to get the next page
+    getReviews: async (params: { order?: 'asc' | 'desc'; limit?: number; cursor?: string } = {}) => {
+        const response = await api.get('/api/reviews/', { params });
+        return response.data as { reviews: ReviewWithUser[]; next_cursor: string | null };
     },
 };
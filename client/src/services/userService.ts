@@ -25,12 +25,22 @@ export const userService = {
         return response.data;
     },
 
-    // Admin: Get all users
-    getAllUsers: async () => {
-        const response = await api.get('/api/users/');
+    // Admin: Get one page of users (prefix search, role filter, sorting, cursor pagination)
+    getUsers: async (params: { q?: string; role?: string; ids?: string; sort?: string; order?: 'asc' | 'desc'; limit?: number; cursor?: string } = {}) => {
+        const response = await api.get('/api/users/', { params });
         return response.data;
     },
 
+    // Admin: Get the users with the given IDs (e.g. hosts and guests shown on a page), 100 per request
+    getUsersByIds: async (ids: string[]) => {
+        const users: any[] = [];
+        for (let start = 0; start < ids.length; start += 100) {
+            const page = await userService.getUsers({ ids: ids.slice(start, start + 100).join(','), limit: 100 });
+            users.push(...page.users);
+        }
+        return users;
+    },
+
     // Admin: Update user role to host
     makeUserHost: async (userId: string) => {
         const response = await api.post(`/api/users/${userId}/make-host`);
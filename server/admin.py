@@ -2,9 +2,24 @@ from flask import Blueprint, request, Response, jsonify
 from bson import ObjectId, json_util
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from db import get_db 
+from helpers import serialize_reservation, parse_date, id_variants, get_keyset_params, keyset_page, build_user_filter, USER_SORT_FIELDS, USER_LIST_PROJECTION
+from availability import release_dates
+from analytics import invalidate_host_analytics
+from stats import increment_stats, get_platform_stats
+from cascade import enqueue_cascade
+from contacts import remove_contact
+from archive import tiered_keyset_page
+from identity import get_current_identity, invalidate_identity
 
 admin_bp = Blueprint("admin", __name__, url_prefix="/api/admin")
 
+RESERVATION_SORT_FIELDS = {
+    "created": "_id",
+    "start_date": "start_date",
+    "end_date": "end_date",
+    "total_price": "total_price"
+}
+
 def _ensure_admin(db, current_username):
     """
     Verify whether the current user has admin privileges.
@@ -13,29 +28,23 @@ def _ensure_admin(db, current_username):
     - role = "admin"
     OR
     - is_admin = True
+    (both are folded into the role claim, see identity.effective_role)
 
     Returns:
         True  -> user is admin
         False -> user is not admin
     """
-    user = db.users.find_one({"username": current_username})
-    if not user:
-        return False
-
-    # Admin logic (supports two different schemas)
-    if user.get("role") == "admin":
-        return True
-    if user.get("is_admin") is True:
-        return True
-
-    return False
+    identity = get_current_identity(db)
+    return bool(identity) and identity["username"] == current_username and identity["role"] == "admin"
 
 
 @admin_bp.route("/users", methods=["GET"])
 @jwt_required()
 def get_all_users():
     """
-    Get all users in the system (ADMIN ONLY).
+    Browse users in the system (ADMIN ONLY).
+    Query params: q, username, email, name (prefix search), role, ids,
+    sort (created, username, email or name), order (asc or desc), limit, cursor.
     """
     db = get_db()
     current_user = get_jwt_identity()
@@ -43,9 +52,13 @@ def get_all_users():
     if not _ensure_admin(db, current_user):
         return jsonify({"msg": "Admin access required"}), 403
 
-    users = list(db.users.find({}))
+    params = get_keyset_params(request.args, USER_SORT_FIELDS, "created")
+    if not params:
+        return jsonify({"msg": "Invalid sort or pagination parameters"}), 400
+
+    users, next_cursor = keyset_page(db.users, build_user_filter(request.args), params, USER_LIST_PROJECTION)
     return Response(
-        json_util.dumps(users),
+        json_util.dumps({"users": users, "next_cursor": next_cursor}),
         mimetype="application/json"
     )
 
@@ -67,7 +80,7 @@ def get_user_detail(user_id):
     except Exception:
         return jsonify({"msg": "Invalid user_id"}), 400
 
-    user = db.users.find_one({"_id": obj_id})
+    user = db.users.find_one({"_id": obj_id}, {"password": 0})
     if not user:
         return jsonify({"msg": "User not found"}), 404
 
@@ -94,11 +107,15 @@ def delete_user(user_id):
     except Exception:
         return jsonify({"msg": "Invalid user_id"}), 400
 
-    result = db.users.delete_one({"_id": obj_id})
+    user = db.users.find_one_and_delete({"_id": obj_id}, projection={"role": 1, "username": 1})
 
-    if result.deleted_count == 0:
+    if not user:
         return jsonify({"msg": "User not found"}), 404
 
+    increment_stats(db, {f"users_by_role.{user.get('role', 'user')}": -1})
+    enqueue_cascade(db, "user", obj_id, username=user.get("username"))
+    invalidate_identity(user.get("username"))
+
     return jsonify({"msg": "User deleted successfully"}), 200
 
 
@@ -106,7 +123,9 @@ def delete_user(user_id):
 @jwt_required()
 def get_all_reservations():
     """
-    Get all reservations in the system (ADMIN ONLY).
+    Browse reservations in the system (ADMIN ONLY).
+    Query params: status, user_id, host_id, listing_id, from, to (start_date range, YYYY-MM-DD),
+    sort (created, start_date, end_date or total_price), order (asc or desc), limit, cursor.
     """
     db = get_db()
     current_user = get_jwt_identity()
@@ -114,9 +133,29 @@ def get_all_reservations():
     if not _ensure_admin(db, current_user):
         return jsonify({"msg": "Admin access required"}), 403
 
-    reservations = list(db.reservations.find({}))
+    params = get_keyset_params(request.args, RESERVATION_SORT_FIELDS, "created")
+    if not params:
+        return jsonify({"msg": "Invalid sort or pagination parameters"}), 400
+
+    query = {}
+    if request.args.get("status"):
+        query["status"] = request.args["status"]
+    for field in ("user_id", "host_id", "listing_id"):
+        if request.args.get(field):
+            query[field] = id_variants(request.args[field])
+    for param, op in (("from", "$gte"), ("to", "$lt")):
+        if request.args.get(param):
+            date = parse_date(request.args[param])
+            if not date:
+                return jsonify({"msg": f"Invalid {param} date"}), 400
+            query.setdefault("start_date", {})[op] = date
+
+    reservations, next_cursor = tiered_keyset_page(db, "reservations", query, params)
     return Response(
-        json_util.dumps(reservations),
+        json_util.dumps({
+            "reservations": [serialize_reservation(r) for r in reservations],
+            "next_cursor": next_cursor
+        }),
         mimetype="application/json"
     )
 
@@ -138,9 +177,61 @@ def delete_reservation(reservation_id):
     except Exception:
         return jsonify({"msg": "Invalid reservation_id"}), 400
 
-    result = db.reservations.delete_one({"_id": obj_id})
+    reservation = db.reservations.find_one_and_delete({"_id": obj_id}, projection={"listing_id": 1, "host_id": 1, "user_id": 1, "status": 1})
 
-    if result.deleted_count == 0:
+    if not reservation:
         return jsonify({"msg": "Reservation not found"}), 404
 
+    release_dates(db, obj_id, reservation.get("listing_id"))
+    invalidate_host_analytics(reservation.get("host_id"))
+    remove_contact(db, reservation.get("user_id"), reservation.get("host_id"))
+    increment_stats(db, {f"reservations_by_status.{reservation.get('status')}": -1})
+
     return jsonify({"msg": "Reservation deleted successfully"}), 200
+
+
+@admin_bp.route("/stats", methods=["GET"])
+@jwt_required()
+def get_stats():
+    """
+    Get precomputed platform statistics (ADMIN ONLY).
+    Query param: days -> number of daily entries to include (default 30).
+    """
+    db = get_db()
+    current_user = get_jwt_identity()
+
+    if not _ensure_admin(db, current_user):
+        return jsonify({"msg": "Admin access required"}), 403
+
+    try:
+        days = min(max(int(request.args.get("days", 30)), 1), 366)
+    except ValueError:
+        return jsonify({"msg": "Invalid days"}), 400
+
+    return Response(
+        json_util.dumps(get_platform_stats(db, days)),
+        mimetype="application/json"
+    )
+
+
+@admin_bp.route("/archive", methods=["GET"])
+@jwt_required()
+def get_archive_runs():
+    """
+    Recent archival passes with collection sizes and query latency before and
+    after each one (ADMIN ONLY). See jobs/archive_data.py.
+    Query param: limit -> number of passes (default 10).
+    """
+    db = get_db()
+    current_user = get_jwt_identity()
+
+    if not _ensure_admin(db, current_user):
+        return jsonify({"msg": "Admin access required"}), 403
+
+    try:
+        limit = min(max(int(request.args.get("limit", 10)), 1), 100)
+    except ValueError:
+        return jsonify({"msg": "Invalid limit"}), 400
+
+    runs = list(db.archive_runs.find({}, {"_id": 0}).sort("started_at", -1).limit(limit))
+    return Response(json_util.dumps(runs), mimetype="application/json")
@@ -0,0 +1,175 @@
+# NOTE: Occupancy and revenue analytics for hosts.
+#
+# Reservations are expanded into per-listing day arrays with NumPy instead of
+# walking every night in Python:
+# - occupancy: +1 at check-in and -1 at checkout in a (listings x days)
+#   difference matrix, then a cumulative sum along the day axis
+# - nightly revenue: the same trick with each stay's nightly rate, used for ADR
+# - payments: amounts are summed into (listing, day) cells with one bincount
+# Daily matrices are folded into day/week/month periods with one matrix product.
+
+import numpy as np
+from cache import GroupedCache
+from archive import archive_name, archive_cutoff
+
+# Statuses that count as an occupied stay
+BOOKED_STATUSES = ['upcoming', 'confirmed', 'past']
+GRANULARITIES = ['day', 'week', 'month']
+
+# Analytics per host, keyed by (from, to, granularity)
+analytics_cache = GroupedCache(ttl_seconds=600, max_groups=2000)
+
+
+def invalidate_host_analytics(host_id):
+    if host_id:
+        analytics_cache.invalidate(str(host_id))
+
+
+def _day_index(dates, from_date, n_days):
+    """Day offsets of datetimes relative to from_date, clipped to [0, n_days]."""
+    start = np.datetime64(from_date, 'D')
+    offsets = (np.array(dates, dtype='datetime64[D]') - start).astype(np.int64)
+    return np.clip(offsets, 0, n_days)
+
+
+def _period_matrix(from_date, n_days, granularity):
+    """
+    One-hot (days x periods) matrix mapping each day to its period, and the
+    period labels (first day of each period as YYYY-MM-DD).
+    """
+    days = np.datetime64(from_date, 'D') + np.arange(n_days)
+    if granularity == 'week':
+        # Weeks start on Monday; 1970-01-01 (day 0) was a Thursday
+        keys = days - ((days.astype(np.int64) + 3) % 7)
+    elif granularity == 'month':
+        keys = days.astype('datetime64[M]').astype('datetime64[D]')
+    else:
+        keys = days
+
+    labels, inverse = np.unique(keys, return_inverse=True)
+    one_hot = np.zeros((n_days, len(labels)))
+    one_hot[np.arange(n_days), inverse] = 1
+    # The first period may start before from_date; label it with from_date
+    labels = np.maximum(labels, days[0])
+    return one_hot, [str(label) for label in labels]
+
+
+def compute_host_analytics(db, host_id, from_date, to_date, granularity='day'):
+    """
+    Per-listing occupancy rate, ADR and revenue for [from_date, to_date).
+
+    Returns:
+        dict with the period labels, one entry per listing and host totals
+    """
+    cache_key = (from_date, to_date, granularity)
+    cached = analytics_cache.get(str(host_id), cache_key)
+    if cached is not None:
+        return cached
+
+    n_days = (to_date - from_date).days
+    listings = list(db.listings.find({'host_id': host_id}, {'title': 1}))
+    row_of = {listing['_id']: row for row, listing in enumerate(listings)}
+    n_listings = len(listings)
+
+    reservation_query = {
+        'host_id': host_id,
+        'status': {'$in': BOOKED_STATUSES},
+        'start_date': {'$lt': to_date},
+        'end_date': {'$gt': from_date}
+    }
+    # Stays that ended before the archive cutoff live in the archive tier
+    collections = [db.reservations]
+    if from_date < archive_cutoff('reservations'):
+        collections.append(db[archive_name('reservations')])
+    reservations = [
+        r for collection in collections
+        for r in collection.find(reservation_query, {'listing_id': 1, 'start_date': 1, 'end_date': 1, 'total_price': 1})
+        if r.get('listing_id') in row_of
+    ]
+    payments = [
+        p for p in db.payments.find(
+            {
+                'host_id': host_id,
+                'status': 'success',
+                'created_at': {'$gte': from_date, '$lt': to_date}
+            },
+            {'listing_id': 1, 'amount': 1, 'created_at': 1}
+        )
+        if p.get('listing_id') in row_of
+    ]
+
+    # Occupancy and nightly revenue via difference arrays (one extra column for checkouts)
+    occupancy_diff = np.zeros((n_listings, n_days + 1))
+    rate_diff = np.zeros((n_listings, n_days + 1))
+    if reservations:
+        rows = np.array([row_of[r['listing_id']] for r in reservations])
+        starts = [r['start_date'] for r in reservations]
+        ends = [r['end_date'] for r in reservations]
+        stay_nights = (np.array(ends, dtype='datetime64[D]') - np.array(starts, dtype='datetime64[D]')).astype(np.int64)
+        prices = np.array([float(r.get('total_price') or 0) for r in reservations])
+        rates = np.divide(prices, stay_nights, out=np.zeros_like(prices), where=stay_nights > 0)
+
+        start_idx = _day_index(starts, from_date, n_days)
+        end_idx = _day_index(ends, from_date, n_days)
+        np.add.at(occupancy_diff, (rows, start_idx), 1)
+        np.add.at(occupancy_diff, (rows, end_idx), -1)
+        np.add.at(rate_diff, (rows, start_idx), rates)
+        np.add.at(rate_diff, (rows, end_idx), -rates)
+
+    occupied = np.minimum(np.cumsum(occupancy_diff, axis=1)[:, :n_days], 1)
+    nightly_revenue = np.cumsum(rate_diff, axis=1)[:, :n_days] * occupied
+
+    # Payments summed per (listing, day) cell in one pass
+    revenue = np.zeros(n_listings * n_days)
+    if payments:
+        cells = (
+            np.array([row_of[p['listing_id']] for p in payments]) * n_days
+            + _day_index([p['created_at'] for p in payments], from_date, n_days - 1)
+        )
+        amounts = np.array([float(p.get('amount') or 0) for p in payments])
+        revenue = np.bincount(cells, weights=amounts, minlength=n_listings * n_days)
+    revenue = revenue.reshape(n_listings, n_days)
+
+    one_hot, periods = _period_matrix(from_date, n_days, granularity)
+    days_per_period = one_hot.sum(axis=0)
+    nights_per_period = occupied @ one_hot
+    stay_revenue_per_period = nightly_revenue @ one_hot
+    revenue_per_period = revenue @ one_hot
+
+    def _ratio(numerator, denominator):
+        return np.round(np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator > 0), 4)
+
+    occupancy_rate = _ratio(nights_per_period, days_per_period)
+    adr = _ratio(stay_revenue_per_period, nights_per_period)
+
+    listing_results = []
+    for row, listing in enumerate(listings):
+        nights = float(occupied[row].sum())
+        listing_results.append({
+            'listing_id': str(listing['_id']),
+            'title': listing.get('title', ''),
+            'occupancy_rate': occupancy_rate[row].tolist(),
+            'adr': np.round(adr[row], 2).tolist(),
+            'revenue': np.round(revenue_per_period[row], 2).tolist(),
+            'totals': {
+                'nights': int(nights),
+                'occupancy_rate': round(nights / n_days, 4) if n_days else 0,
+                'adr': round(float(nightly_revenue[row].sum()) / nights, 2) if nights else 0,
+                'revenue': round(float(revenue[row].sum()), 2)
+            }
+        })
+
+    total_nights = float(occupied.sum())
+    result = {
+        'granularity': granularity,
+        'periods': periods,
+        'listings': listing_results,
+        'totals': {
+            'nights': int(total_nights),
+            'occupancy_rate': round(total_nights / (n_days * n_listings), 4) if n_days and n_listings else 0,
+            'adr': round(float(nightly_revenue.sum()) / total_nights, 2) if total_nights else 0,
+            'revenue': round(float(revenue.sum()), 2)
+        }
+    }
+    analytics_cache.set(str(host_id), cache_key, result)
+    return result
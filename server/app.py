@@ -1,11 +1,11 @@
 import os
-import configparser
 from flask import Flask
 from json import JSONEncoder
 from flask_cors import CORS
 from bson import json_util, ObjectId
 from datetime import datetime, timedelta
 from flask_jwt_extended import JWTManager
+from db import ensure_indexes, config
 
 # Import blueprints
 from routes.reservation import reservation_bp
@@ -18,10 +18,8 @@ from routes.review import review_bp
 from routes.search_and_filter import search_bp
 from routes.health import health_bp
 from routes.payment import payment_bp
-
-CONFIG_PATH = os.path.join(os.path.dirname(__file__), ".ini")
-config = configparser.ConfigParser()
-config.read(CONFIG_PATH)
+from routes.hosts import hosts_bp
+from admin import admin_bp
 
 class MongoJsonEncoder(JSONEncoder):
     def default(self, obj):
@@ -56,9 +54,23 @@ def create_app():
     app.register_blueprint(search_bp)
     app.register_blueprint(health_bp)
     app.register_blueprint(payment_bp)
+    app.register_blueprint(hosts_bp)
+    app.register_blueprint(admin_bp)
     
     app.json_encoder = MongoJsonEncoder
 
+    ensure_indexes()
+
+    if config.getboolean("PROD", "RUN_SCHEDULER", fallback=False):
+        from jobs.reservation_lifecycle import start_lifecycle_scheduler
+        from jobs.reconcile_stats import start_stats_scheduler
+        from jobs.cascade_deletes import start_cascade_scheduler
+        from jobs.archive_data import start_archive_scheduler
+        start_lifecycle_scheduler()
+        start_stats_scheduler()
+        start_cascade_scheduler()
+        start_archive_scheduler()
+
     return app
 
 if __name__ == "__main__":
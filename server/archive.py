@@ -0,0 +1,140 @@
+# NOTE: Archive tier for cold messages and reservations.
+#
+# jobs/archive_data.py moves old documents, unchanged (same _id), from a hot
+# collection to "<name>_archive" so the hot collections and their indexes
+# stay small enough to remain in memory:
+# - messages: created more than MESSAGE_ARCHIVE_MONTHS months ago (30-day months)
+# - reservations: status "past" and ended more than RESERVATION_ARCHIVE_DAYS days ago
+# (both in the [PROD] section of .ini)
+#
+# Read endpoints use the helpers below so archived documents still show up:
+# single lookups fall back to the archive on a miss, and keyset pages merge
+# both tiers, skipping the archive when the page cannot reach it. Archived
+# documents are read-only.
+#
+# Everything in an archive sorts before the cutoff computed from the current
+# settings. After raising a retention setting, move the affected documents
+# back before relying on it.
+
+from datetime import datetime, timedelta, timezone
+from db import config
+from helpers import keyset_page, encode_cursor, parse_timestamp
+
+MESSAGE_ARCHIVE_MONTHS = config.getint('PROD', 'MESSAGE_ARCHIVE_MONTHS', fallback=12)
+RESERVATION_ARCHIVE_DAYS = config.getint('PROD', 'RESERVATION_ARCHIVE_DAYS', fallback=365)
+
+
+def archive_name(name):
+    return f"{name}_archive"
+
+
+def _utc_now():
+    # Dates come back from MongoDB as naive UTC datetimes
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def archive_cutoff(name):
+    """Documents of `name` are archived once their date field is older than this."""
+    if name == 'messages':
+        return _utc_now() - timedelta(days=30 * MESSAGE_ARCHIVE_MONTHS)
+    return _utc_now() - timedelta(days=RESERVATION_ARCHIVE_DAYS)
+
+
+def archive_query(name, cutoff):
+    """Hot documents of `name` that belong in the archive."""
+    if name == 'messages':
+        return {'created_at': {'$lt': cutoff}}
+    return {'status': 'past', 'end_date': {'$lt': cutoff}}
+
+
+# Sort fields whose archived values all lie below the cutoff
+BOUNDED_FIELDS = {
+    'messages': {'created_at'},
+    'reservations': {'start_date', 'end_date'},
+}
+
+
+def _naive(value):
+    if isinstance(value, str):
+        # Not backfilled yet (jobs/backfill_dates.py); compare as a date anyway
+        value = parse_timestamp(value) or value
+    if isinstance(value, datetime) and value.tzinfo:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def find_one_with_archive(db, name, query, projection=None):
+    return db[name].find_one(query, projection) or db[archive_name(name)].find_one(query, projection)
+
+
+def find_with_archive(db, name, query, projection=None, sort=None):
+    """Every matching document, hot first then archived, each part sorted by `sort`."""
+    docs = []
+    for collection in (db[name], db[archive_name(name)]):
+        cursor = collection.find(query, projection)
+        docs += list(cursor.sort(sort) if sort else cursor)
+    return docs
+
+
+def sorted_with_archive(db, name, query, sort_field, projection=None):
+    """Every matching document of both tiers, oldest `sort_field` first."""
+    docs = find_with_archive(db, name, query, projection, sort=[(sort_field, 1), ('_id', 1)])
+    return sorted(docs, key=_sort_key(sort_field))
+
+
+def count_with_archive(db, name, query):
+    return db[name].count_documents(query) + db[archive_name(name)].count_documents(query)
+
+
+def _sort_key(field):
+    # Same order as MongoDB for one field: missing values first, then _id
+    def key(doc):
+        value = _naive(doc.get(field))
+        return (value is not None, value, doc['_id'])
+    return key
+
+
+def paged_with_archive(db, name, query, sort_field, skip, limit, projection=None):
+    """
+    Page/limit listing over both tiers, newest `sort_field` first.
+    Returns (documents, total).
+    """
+    sort = [(sort_field, -1), ('_id', -1)]
+    hot_total = db[name].count_documents(query)
+    archived_total = db[archive_name(name)].count_documents(query)
+    if not archived_total:
+        return list(db[name].find(query, projection).sort(sort).skip(skip).limit(limit)), hot_total
+    # Both tiers can contribute to the page: take enough of each, then merge
+    docs = []
+    for collection in (db[name], db[archive_name(name)]):
+        docs += list(collection.find(query, projection).sort(sort).limit(skip + limit))
+    docs.sort(key=_sort_key(sort_field), reverse=True)
+    return docs[skip:skip + limit], hot_total + archived_total
+
+
+def tiered_keyset_page(db, name, query, params, projection=None):
+    """
+    helpers.keyset_page over a hot collection and its archive together.
+    Returns (documents, next_cursor).
+    """
+    field, direction = params['sort_field'], params['direction']
+    docs, next_cursor = keyset_page(db[name], query, params, projection)
+
+    if field in BOUNDED_FIELDS.get(name, ()):
+        cutoff = archive_cutoff(name)
+        after_value = _naive(params['after'][0]) if params['after'] else None
+        if direction == 1 and after_value is not None and after_value >= cutoff:
+            # Walking forward from a point the archive never reaches
+            return docs, next_cursor
+        if direction == -1 and next_cursor and _naive(docs[-1].get(field)) is not None \
+                and _naive(docs[-1].get(field)) >= cutoff:
+            # The hot page fills up before reaching archived values
+            return docs, next_cursor
+
+    archived, archived_cursor = keyset_page(db[archive_name(name)], query, params, projection)
+    if not archived:
+        return docs, next_cursor
+    merged = sorted(docs + archived, key=_sort_key(field), reverse=direction == -1)
+    has_more = len(merged) > params['limit'] or next_cursor is not None or archived_cursor is not None
+    merged = merged[:params['limit']]
+    return merged, (encode_cursor(merged[-1], field) if has_more else None)
@@ -0,0 +1,163 @@
+# NOTE: Per-listing booking calendar used to prevent double bookings.
+#
+# LISTING_CALENDARS TABLE
+#------------------------------
+# _id: ObjectId -> listing_id (references Listings table)
+# booked: list of {reservation_id: ObjectId, start_date: date, end_date: date}
+#
+# Every reservation that holds its nights has one entry in `booked`. Entries are
+# pushed with a guarded update that only matches when no existing interval
+# overlaps, so two concurrent checkouts for the same nights cannot both succeed.
+# Intervals are half-open: a stay ending on a day does not block a stay starting
+# on that same day.
+
+from pymongo.errors import DuplicateKeyError
+from cache import GroupedCache
+from helpers import format_date
+
+# Reservation statuses that keep their nights blocked
+ACTIVE_STATUSES = ['unpaid', 'pending', 'upcoming', 'confirmed']
+
+# Merged booked ranges per listing, keyed by the requested (from, to) window
+availability_cache = GroupedCache(ttl_seconds=300)
+
+
+def overlap_query(start_date, end_date):
+    """Query fragment matching intervals that overlap [start_date, end_date)."""
+    return {'start_date': {'$lt': end_date}, 'end_date': {'$gt': start_date}}
+
+
+def find_overlapping_reservation(db, listing_id, start_date, end_date):
+    """
+    Indexed range query for an active reservation overlapping the given dates.
+    Also covers reservations created before the calendar existed.
+    """
+    query = {'listing_id': listing_id, 'status': {'$in': ACTIVE_STATUSES}}
+    query.update(overlap_query(start_date, end_date))
+    return db.reservations.find_one(query, {'_id': 1})
+
+
+def hold_dates(db, listing_id, reservation_id, start_date, end_date):
+    """
+    Atomically add an interval to the listing calendar if it overlaps nothing.
+
+    Returns:
+        True if the dates were held, False if they are already booked
+    """
+    guard = {
+        '_id': listing_id,
+        'booked': {'$not': {'$elemMatch': overlap_query(start_date, end_date)}}
+    }
+    push = {'$push': {'booked': {
+        'reservation_id': reservation_id,
+        'start_date': start_date,
+        'end_date': end_date
+    }}}
+
+    try:
+        # Upsert creates the calendar on the first booking. If the calendar
+        # exists and the guard fails, the upsert collides on _id instead.
+        db.listing_calendars.update_one(guard, push, upsert=True)
+        invalidate_availability(listing_id)
+        return True
+    except DuplicateKeyError:
+        pass
+
+    # Either a real overlap or two first bookings racing to create the
+    # calendar; the document exists now, so retry without upsert.
+    result = db.listing_calendars.update_one(guard, push)
+    if result.matched_count:
+        invalidate_availability(listing_id)
+    return result.matched_count == 1
+
+
+def release_dates(db, reservation_id, listing_id=None):
+    """Remove a reservation's interval from its listing calendar."""
+    calendar = db.listing_calendars.find_one_and_update(
+        {'booked.reservation_id': reservation_id},
+        {'$pull': {'booked': {'reservation_id': reservation_id}}},
+        projection={'_id': 1}
+    )
+    if calendar:
+        listing_id = calendar['_id']
+    if listing_id:
+        invalidate_availability(listing_id)
+
+
+def decline_overlapping_requests(db, reservation):
+    """
+    Decline every pending request overlapping an accepted reservation.
+
+    One indexed query finds the conflicting requests and a single update_many
+    declines them; their calendar holds are released as well. Since the
+    calendar guard in hold_dates, overlapping pending requests can only come
+    from legacy data booked before the calendar existed.
+
+    Returns:
+        list of reservation ids this call declined (requests that left
+        "pending" in the meantime are not included)
+    """
+    query = {
+        '_id': {'$ne': reservation['_id']},
+        'listing_id': reservation['listing_id'],
+        'status': 'pending'
+    }
+    query.update(overlap_query(reservation['start_date'], reservation['end_date']))
+    candidate_ids = [r['_id'] for r in db.reservations.find(query, {'_id': 1})]
+    if not candidate_ids:
+        return []
+
+    result = db.reservations.update_many(
+        {'_id': {'$in': candidate_ids}, 'status': 'pending'},
+        {'$set': {'status': 'declined'}}
+    )
+    if not result.modified_count:
+        return []
+    # Only the requests that are declined now; the rest were paid, cancelled or
+    # expired between the read and the update and keep their holds
+    declined_ids = [r['_id'] for r in db.reservations.find(
+        {'_id': {'$in': candidate_ids}, 'status': 'declined'}, {'_id': 1}
+    )]
+    db.listing_calendars.update_one(
+        {'_id': reservation['listing_id']},
+        {'$pull': {'booked': {'reservation_id': {'$in': declined_ids}}}}
+    )
+    invalidate_availability(reservation['listing_id'])
+    return declined_ids
+
+
+def invalidate_availability(listing_id):
+    availability_cache.invalidate(str(listing_id))
+
+
+def get_booked_ranges(db, listing_id, from_date, to_date):
+    """
+    Merged booked intervals of a listing overlapping [from_date, to_date).
+
+    Computed from active reservations with one query on the
+    (listing_id, start_date, end_date) index and cached per listing.
+
+    Returns:
+        list of {'start_date': 'YYYY-MM-DD', 'end_date': 'YYYY-MM-DD'}, where
+        end_date is the checkout day (not blocked itself)
+    """
+    window = (from_date, to_date)
+    ranges = availability_cache.get(str(listing_id), window)
+    if ranges is not None:
+        return ranges
+
+    query = {'listing_id': listing_id, 'status': {'$in': ACTIVE_STATUSES}}
+    query.update(overlap_query(from_date, to_date))
+    cursor = db.reservations.find(query, {'_id': 0, 'start_date': 1, 'end_date': 1}).sort('start_date', 1)
+
+    merged = []
+    for reservation in cursor:
+        start_date, end_date = reservation['start_date'], reservation['end_date']
+        if merged and start_date <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end_date)
+        else:
+            merged.append([start_date, end_date])
+
+    ranges = [{'start_date': format_date(start), 'end_date': format_date(end)} for start, end in merged]
+    availability_cache.set(str(listing_id), window, ranges)
+    return ranges
@@ -0,0 +1,48 @@
+# NOTE: Small in-process cache shared by the route handlers.
+#
+# Entries are grouped (e.g. one group per listing) so a write can invalidate
+# everything derived from the same document with one call. Each gunicorn
+# worker keeps its own cache, so the TTL bounds how long another worker can
+# serve a value that was invalidated elsewhere.
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class GroupedCache:
+    def __init__(self, ttl_seconds=300, max_groups=10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_groups = max_groups
+        self._groups = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, group, key):
+        """Return the cached value or None if missing/expired."""
+        with self._lock:
+            entries = self._groups.get(group)
+            if not entries or key not in entries:
+                return None
+            expires_at, value = entries[key]
+            if expires_at < time.monotonic():
+                del entries[key]
+                return None
+            self._groups.move_to_end(group)
+            return value
+
+    def set(self, group, key, value):
+        with self._lock:
+            entries = self._groups.setdefault(group, {})
+            entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._groups.move_to_end(group)
+            # Evict least recently used groups
+            while len(self._groups) > self.max_groups:
+                self._groups.popitem(last=False)
+
+    def invalidate(self, group):
+        with self._lock:
+            self._groups.pop(group, None)
+
+    def clear(self):
+        with self._lock:
+            self._groups.clear()
@@ -0,0 +1,41 @@
+# NOTE: Deferred cleanup of documents that reference a deleted user or listing.
+#
+# Delete handlers only remove the user/listing itself and enqueue a task here;
+# jobs/cascade_deletes.py processes the queue in batches, so the request stays
+# fast no matter how many reservations, reviews or messages depend on it.
+#
+# CASCADE_TASKS TABLE
+#------------------------------
+# _id: ObjectId -> Primary Key
+# kind: str -> "user" or "listing"
+# target_id: ObjectId -> id of the deleted document
+# username: str -> deleted user's username (messages are keyed by username)
+# host_id: ObjectId -> deleted listing's host (cache invalidation)
+# status: str -> "pending", "done" or "failed" (gave up after CASCADE_MAX_ATTEMPTS)
+# steps_done: list of str -> completed steps, so an interrupted task resumes where it stopped
+# attempts: int -> failed runs so far
+# next_run_at: datetime -> not retried before this time (backoff after a failure)
+# last_error: str -> error of the last failed run
+# created_at: datetime
+# finished_at: datetime
+
+from datetime import datetime, timezone
+
+
+def cascade_task(kind, target_id, **context):
+    now = datetime.now(timezone.utc)
+    return {
+        'kind': kind,
+        'target_id': target_id,
+        **context,
+        'status': 'pending',
+        'steps_done': [],
+        'attempts': 0,
+        'next_run_at': now,
+        'created_at': now
+    }
+
+
+def enqueue_cascade(db, kind, target_id, **context):
+    """Queue the cleanup of everything that references a deleted user or listing."""
+    db.cascade_tasks.insert_one(cascade_task(kind, target_id, **context))
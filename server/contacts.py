@@ -0,0 +1,81 @@
+# NOTE: Precomputed messaging permissions.
+#
+# Two users may message each other when one has a reservation on a listing of
+# the other (any status). Instead of querying reservations for every message,
+# each guest/host pair keeps a reservation counter that is incremented and
+# decremented with the reservations, and each user's contact set is cached
+# in-process, so the permission check is a set lookup.
+#
+# CONTACT_PAIRS TABLE
+#------------------------------
+# _id: str -> "<user_id>|<user_id>" (sorted)
+# user_ids: list of ObjectId -> both users
+# reservations: int -> reservations between the two users, either direction
+#
+# Pairs for reservations made before this table existed are built by
+# jobs/backfill_contacts.py.
+
+from cache import GroupedCache
+from archive import find_one_with_archive
+
+# Contact set per user id, as a frozenset of str(user_id)
+contacts_cache = GroupedCache(ttl_seconds=300, max_groups=20000)
+
+
+def contact_pair_id(user_a, user_b):
+    a, b = sorted([str(user_a), str(user_b)])
+    return f"{a}|{b}"
+
+
+def invalidate_contacts(*user_ids):
+    for user_id in user_ids:
+        if user_id:
+            contacts_cache.invalidate(str(user_id))
+
+
+def add_contact(db, guest_id, host_id, count=1):
+    """Count `count` new reservations between a guest and a host."""
+    if not guest_id or not host_id or guest_id == host_id:
+        return
+    db.contact_pairs.update_one(
+        {'_id': contact_pair_id(guest_id, host_id)},
+        {'$inc': {'reservations': count}, '$setOnInsert': {'user_ids': [guest_id, host_id]}},
+        upsert=True
+    )
+    invalidate_contacts(guest_id, host_id)
+
+
+def remove_contact(db, guest_id, host_id):
+    """Forget one reservation between a guest and a host (after it was deleted)."""
+    if not guest_id or not host_id or guest_id == host_id:
+        return
+    pair_id = contact_pair_id(guest_id, host_id)
+    db.contact_pairs.update_one({'_id': pair_id}, {'$inc': {'reservations': -1}})
+    db.contact_pairs.delete_one({'_id': pair_id, 'reservations': {'$lte': 0}})
+    invalidate_contacts(guest_id, host_id)
+
+
+def get_contacts(db, user_id):
+    """Ids (as str) of the users `user_id` may message."""
+    contacts = contacts_cache.get(str(user_id), 'contacts')
+    if contacts is None:
+        pairs = db.contact_pairs.find({'user_ids': user_id, 'reservations': {'$gt': 0}}, {'user_ids': 1})
+        contacts = frozenset(
+            str(other) for pair in pairs for other in pair['user_ids'] if str(other) != str(user_id)
+        )
+        contacts_cache.set(str(user_id), 'contacts', contacts)
+    return contacts
+
+
+def can_message(db, user_id, other_id):
+    if str(other_id) in get_contacts(db, user_id):
+        return True
+    # Not a known contact: confirm against reservations (archived ones included)
+    # so pairs that are not backfilled yet (or were just created on another
+    # worker) still pass
+    return find_one_with_archive(db, 'reservations', {
+        '$or': [
+            {'user_id': user_id, 'host_id': other_id},
+            {'user_id': other_id, 'host_id': user_id}
+        ]
+    }, {'_id': 1}) is not None
@@ -2,7 +2,8 @@ import configparser
 from pymongo import MongoClient
 import os
 
-CONFIG_PATH = os.path.join(os.path.dirname(__file__), ".ini")
+# ITUBNB_CONFIG points to another config file (e.g. for the test suite)
+CONFIG_PATH = os.environ.get("ITUBNB_CONFIG", os.path.join(os.path.dirname(__file__), ".ini"))
 config = configparser.ConfigParser()
 config.read(CONFIG_PATH)
 
@@ -21,3 +22,89 @@ def db_connection_test():
     except Exception as e:
         print("DB connection error:", e)
         return False
+
+# NOTE: Indexes used by the application queries, keyed by collection.
+# Entries are key lists, or (key list, create_index options) tuples.
+# create_index is a no-op when an identical index already exists.
+INDEXES = {
+    'listings': [
+        [('status', 1), ('_id', 1)],
+        [('host_id', 1)],
+    ],
+    'users': [
+        [('username', 1)],
+        [('email', 1)],
+        [('name', 1)],
+        [('role', 1), ('_id', 1)],
+    ],
+    'reviews': [
+        [('property_id', 1)],
+        [('user_id', 1)],
+        [('reservation_id', 1)],
+    ],
+    'payments': [
+        [('reservation_id', 1)],
+        [('user_id', 1)],
+    ],
+    'reservations': [
+        [('user_id', 1)],
+        [('host_id', 1)],
+        [('listing_id', 1), ('start_date', 1), ('end_date', 1)],
+        [('start_date', 1), ('_id', 1)],
+        [('status', 1), ('start_date', 1), ('_id', 1)],
+    ],
+    'messages': [
+        [('conversation_id', 1), ('created_at', 1), ('_id', 1)],
+        [('sender_username', 1), ('created_at', 1), ('_id', 1)],
+        [('receiver_username', 1), ('created_at', 1), ('_id', 1)],
+    ],
+    'conversations': [
+        [('sender_id', 1)],
+        [('receiver_id', 1)],
+        [('participant_ids', 1), ('last_message_at', -1)],
+        ([('dm_id', 1)], {'unique': True, 'partialFilterExpression': {'dm_id': {'$exists': True}}}),
+    ],
+    'listing_calendars': [
+        [('booked.reservation_id', 1)],
+    ],
+    'cascade_tasks': [
+        [('status', 1), ('created_at', 1)],
+    ],
+    'reservation_events': [
+        [('reservation_id', 1), ('created_at', 1)],
+    ],
+    # Archive tiers (archive.py): the hot indexes used by the read fallbacks
+    'messages_archive': [
+        [('conversation_id', 1), ('created_at', 1), ('_id', 1)],
+        [('sender_username', 1), ('created_at', 1), ('_id', 1)],
+        [('receiver_username', 1), ('created_at', 1), ('_id', 1)],
+    ],
+    'reservations_archive': [
+        [('user_id', 1)],
+        [('host_id', 1)],
+        [('start_date', 1), ('_id', 1)],
+        [('status', 1), ('start_date', 1), ('_id', 1)],
+    ],
+    'archive_runs': [
+        [('started_at', -1)],
+    ],
+    'contact_pairs': [
+        [('user_ids', 1)],
+    ],
+    'sync_changes': [
+        ([('username', 1), ('seq', 1)], {'unique': True}),
+        # TTL of sync.SYNC_RETENTION_DAYS
+        ([('created_at', 1)], {'expireAfterSeconds': 30 * 24 * 3600}),
+    ],
+}
+
+def ensure_indexes():
+    try:
+        for collection, indexes in INDEXES.items():
+            for index in indexes:
+                keys, options = index if isinstance(index, tuple) else (index, {})
+                db[collection].create_index(keys, **options)
+        return True
+    except Exception as e:
+        print("Index creation error:", e)
+        return False
@@ -1,6 +1,10 @@
 import re
-from flask_jwt_extended import get_jwt_identity
+import base64
+from datetime import datetime, timezone
+from bson import json_util
 from bson.objectid import ObjectId
+from stats import increment_stats, status_transition
+from identity import get_current_identity
 
 def serialize_doc(doc): # Helper function to serialize MongoDB documents
     if '_id' in doc:
@@ -25,7 +29,50 @@ def check_reservation_dates(data): # Combined validation for reservation dates
         return False
     if not validate_reservation_dates(data['start_date'], data['end_date']):
         return False
-    return True
+    return parse_date(data['start_date']) is not None and parse_date(data['end_date']) is not None
+
+# NOTE: Reservation dates and message timestamps are stored as BSON dates.
+# The API keeps returning strings, so documents go through the serializers below.
+
+def parse_date(date_str): # Convert a YYYY-MM-DD string to a (UTC) datetime
+    if not isinstance(date_str, str) or not validate_date_format(date_str):
+        return None
+    try:
+        return datetime.strptime(date_str, '%Y-%m-%d')
+    except ValueError:
+        return None
+
+def format_date(value): # Stored date -> YYYY-MM-DD (legacy strings are returned unchanged)
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d')
+    return value
+
+def parse_timestamp(value): # ISO 8601 string -> UTC datetime, None if invalid
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+def format_timestamp(value): # Stored timestamp -> ISO 8601 string in UTC
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.isoformat()
+    return value
+
+def serialize_reservation(reservation):
+    for field in ('start_date', 'end_date'):
+        if field in reservation:
+            reservation[field] = format_date(reservation[field])
+    return reservation
+
+def serialize_message(message):
+    if 'created_at' in message:
+        message['created_at'] = format_timestamp(message['created_at'])
+    return message
 
 # NOTE: General validation function for both listings and reservations
 # TODO: Returns can be adjusted based on specific needs
@@ -33,31 +80,200 @@ def check_reservation_dates(data): # Combined validation for reservation dates
 def check_validation(data, validations): # General validation function
     if data is None:
         return False
+    return first_invalid_field(data, validations) is None
+
+def first_invalid_field(data, validations): # Name of the first field failing validation, or None
     for field, validator in validations.items():
         if field not in data:
             # If field is not in data, check if validator accepts None (optional field)
             if not validator(None):
-                return False
+                return field
         elif not validator(data[field]):
-            return False
-    return True
+            return field
+    return None
+
+# NOTE: Helper function to record reservation status changes (audit trail)
+# RESERVATION_EVENTS TABLE: reservation_id, status, actor, reason, created_at
+# `previous` is the old status (or one old status per reservation) and keeps
+# the platform statistics in sync.
+def record_status_changes(db, reservation_ids, status, actor, reason=None, previous=None):
+    if not reservation_ids:
+        return
+    increment_stats(
+        db,
+        totals=status_transition('reservations_by_status', status, previous, count=len(reservation_ids)),
+        daily={f'reservations.{status}': len(reservation_ids)}
+    )
+    now = datetime.now(timezone.utc)
+    db.reservation_events.insert_many([
+        {
+            'reservation_id': reservation_id,
+            'status': status,
+            'actor': actor,
+            'reason': reason,
+            'created_at': now
+        }
+        for reservation_id in reservation_ids
+    ], ordered=False)
 
 # NOTE: Helper function to check if current user is admin
 def is_admin(db):
-    current_user = get_jwt_identity()
-    user = db.users.find_one({'username': current_user})
-    return user and user.get('role') == 'admin'
+    identity = get_current_identity(db)
+    return bool(identity) and identity['role'] == 'admin'
 
 # NOTE: Helper function to check if current user is host
 def is_host(db):
-    current_user = get_jwt_identity()
-    user = db.users.find_one({'username': current_user})
-    return user and user.get('role') == 'host'
+    identity = get_current_identity(db)
+    return bool(identity) and identity['role'] == 'host'
+
+# NOTE: Helper function to read page/limit query parameters
+def get_pagination(args, default_limit=20, max_limit=100):
+    """
+    Parse `page` (1-based) and `limit` from request args.
+    Returns (page, limit) or None if either is invalid.
+    """
+    try:
+        page = int(args.get('page', 1))
+        limit = int(args.get('limit', default_limit))
+    except (TypeError, ValueError):
+        return None
+    if page < 1 or limit < 1:
+        return None
+    return page, min(limit, max_limit)
+
+# NOTE: Keyset (cursor) pagination helpers
+# Instead of skipping `page * limit` documents, the next page starts after the
+# (sort value, _id) pair of the last returned document, so every page is an
+# index range scan no matter how deep the client pages.
+def encode_cursor(doc, sort_field):
+    values = [doc.get(sort_field), doc['_id']]
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode()).decode()
+
+def decode_cursor(cursor):
+    """Returns the (sort value, _id) pair of a cursor or None if it is malformed."""
+    try:
+        value, _id = json_util.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(_id, ObjectId):
+        return None
+    return value, _id
+
+def get_keyset_params(args, sort_fields, default_sort, default_order='desc', default_limit=20, max_limit=100):
+    """
+    Parse `sort`, `order` (asc/desc), `limit` and `cursor` from request args.
+    `sort_fields` maps public sort names to document fields.
+    Returns a dict of keyset parameters or None if any of them is invalid.
+    """
+    sort = args.get('sort', default_sort)
+    order = args.get('order', default_order)
+    if sort not in sort_fields or order not in ('asc', 'desc'):
+        return None
+    try:
+        limit = int(args.get('limit', default_limit))
+    except (TypeError, ValueError):
+        return None
+    if limit < 1:
+        return None
+    after = None
+    if args.get('cursor'):
+        after = decode_cursor(args['cursor'])
+        if not after:
+            return None
+    return {
+        'sort_field': sort_fields[sort],
+        'direction': 1 if order == 'asc' else -1,
+        'limit': min(limit, max_limit),
+        'after': after
+    }
+
+def keyset_page(collection, query, params, projection=None):
+    """
+    Fetch one page described by get_keyset_params.
+    Returns (documents, next_cursor); next_cursor is None on the last page.
+    """
+    field, direction = params['sort_field'], params['direction']
+    if params['after']:
+        value, last_id = params['after']
+        op = '$gt' if direction == 1 else '$lt'
+        if field == '_id':
+            after = {'_id': {op: last_id}}
+        elif value is None:
+            # Missing values sort before everything else
+            after = {field: None, '_id': {op: last_id}}
+            if direction == 1:
+                after = {'$or': [{field: {'$ne': None}}, after]}
+        else:
+            after = {'$or': [{field: {op: value}}, {field: value, '_id': {op: last_id}}]}
+            if direction == -1:
+                # $lt never matches missing values, which come last in descending order
+                after['$or'].append({field: None})
+        query = {'$and': [query, after]} if query else after
+    sort = [(field, direction)] if field == '_id' else [(field, direction), ('_id', direction)]
+    docs = list(collection.find(query, projection).sort(sort).limit(params['limit'] + 1))
+    next_cursor = None
+    if len(docs) > params['limit']:
+        docs = docs[:params['limit']]
+        next_cursor = encode_cursor(docs[-1], field)
+    return docs, next_cursor
+
+def prefix_match(value):
+    """Anchored, case-sensitive prefix regex; MongoDB can answer it with an index range scan."""
+    return {'$regex': '^' + re.escape(value)}
+
+# NOTE: Admin user browsing (GET /api/users/ and GET /api/admin/users)
+USER_SORT_FIELDS = {'created': '_id', 'username': 'username', 'email': 'email', 'name': 'name'}
+# Password hashes and the embedded reservation list never leave the server in listings
+USER_LIST_PROJECTION = {'password': 0, 'reservations': 0}
+
+def build_user_filter(args):
+    """
+    Query for the admin user list.
+    `q` matches a prefix of username, email or name; `username`, `email` and
+    `name` are per-field prefixes; `role` is an exact match; `ids` is a
+    comma-separated list of user ids (invalid ids are ignored).
+    """
+    query = {}
+    if args.get('ids'):
+        query['_id'] = {'$in': [ObjectId(_id) for _id in args['ids'].split(',') if ObjectId.is_valid(_id)]}
+    for field in ('username', 'email', 'name'):
+        if args.get(field):
+            query[field] = prefix_match(args[field])
+    if args.get('q'):
+        query['$or'] = [{field: prefix_match(args['q'])} for field in ('username', 'email', 'name')]
+    if args.get('role'):
+        query['role'] = args['role']
+    return query
 
 # NOTE: Helper function to convert id string to ObjectId
 def to_object_id(id_str):
     return ObjectId(id_str) if ObjectId.is_valid(id_str) else None
 
+# NOTE: Read-compat shims for the foreign key migration (jobs/normalize_ids.py)
+# Legacy documents store some foreign keys as strings, new ones as ObjectId.
+def id_variants(value):
+    """
+    Build a query value matching a foreign key stored either as ObjectId or as string.
+    Values that are not valid ObjectIds are returned unchanged.
+    """
+    _id = to_object_id(str(value)) if value is not None else None
+    if not _id:
+        return value
+    return {'$in': [_id, str(_id)]}
+
+def id_list_variants(values):
+    """Like id_variants, for an $in lookup over many foreign keys."""
+    object_ids = [to_object_id(str(value)) for value in values]
+    object_ids = [_id for _id in object_ids if _id]
+    return {'$in': object_ids + [str(_id) for _id in object_ids]}
+
+def stringify_ids(doc, fields):
+    """Convert the given ObjectId fields of a document to strings for API responses."""
+    for field in fields:
+        if isinstance(doc.get(field), ObjectId):
+            doc[field] = str(doc[field])
+    return doc
+
 
 # NOTE: Helper function to validate review creation business logic
 def validate_review_creation(db, data, current_user, reservation):
@@ -85,7 +301,7 @@ def validate_review_creation(db, data, current_user, reservation):
         reservation_listing_id = reservation_listing_id['$oid']
     reservation_listing_id = str(reservation_listing_id)
     
-    if reservation_listing_id != data.get('property_id'):
+    if reservation_listing_id != str(data.get('property_id')):
         return False, 'Property ID does not match the reservation'
     
     # Verify property exists
@@ -96,7 +312,7 @@ def validate_review_creation(db, data, current_user, reservation):
             return False, 'Property not found'
     
     # Check if review already exists for this reservation
-    existing_review = db.reviews.find_one({'reservation_id': str(reservation.get('_id'))})
+    existing_review = db.reviews.find_one({'reservation_id': id_variants(reservation.get('_id'))})
     if existing_review:
         return False, 'Review already exists for this reservation'
     
@@ -179,19 +395,19 @@ def update_listing_rating(db, property_id):
     
     Args:
         db: Database connection
-        property_id: String ID of the property/listing
+        property_id: ID of the property/listing (str or ObjectId)
     
     Returns:
         (success, error_message) tuple
     """
     try:
         # Validate property_id
-        property_obj_id = to_object_id(property_id)
+        property_obj_id = to_object_id(str(property_id))
         if not property_obj_id:
             return False, 'Invalid property ID'
         
         # Fetch all reviews for this property
-        reviews = list(db.reviews.find({'property_id': property_id}))
+        reviews = list(db.reviews.find({'property_id': id_variants(property_obj_id)}, {'rating': 1}))
         
         # Calculate stats
         review_count = len(reviews)
@@ -0,0 +1,100 @@
+# NOTE: Identity of the authenticated user, read from the JWT claims.
+#
+# Login tokens carry the user's id, role and role_version as claims, so most
+# requests learn who is calling without querying `users`. Every role change
+# increments users.role_version; a token whose role_version differs from the
+# current one is outdated and the current values are loaded instead. The
+# current role_version is cached per username for ROLE_CHECK_TTL_SECONDS, so
+# a demotion or deletion reaches the other workers within that time.
+#
+# Both accessors are memoized on flask.g: however many helpers ask during a
+# request, the identity is resolved and the user document loaded at most once.
+#
+# USERS TABLE (identity fields)
+#------------------------------
+# role_version: int -> incremented on every role change (missing means 0)
+
+from bson.objectid import ObjectId
+from flask import g, has_app_context
+from flask_jwt_extended import get_jwt, get_jwt_identity
+from cache import GroupedCache
+
+ROLE_CHECK_TTL_SECONDS = 30
+# Cached role_version of deleted accounts
+DELETED = -1
+# Fields of the user document returned by get_current_user
+CURRENT_USER_PROJECTION = {'password': 0}
+
+role_version_cache = GroupedCache(ttl_seconds=ROLE_CHECK_TTL_SECONDS, max_groups=50000)
+
+
+def effective_role(user):
+    # Older admin accounts are flagged with is_admin instead of the role
+    if user.get('is_admin') is True:
+        return 'admin'
+    return user.get('role', 'user')
+
+
+def identity_claims(user):
+    """Additional claims for an access token of `user`."""
+    return {
+        'user_id': str(user['_id']),
+        'role': effective_role(user),
+        'role_version': user.get('role_version', 0)
+    }
+
+
+def invalidate_identity(username):
+    """Call after changing the role of `username` or deleting the account."""
+    if username:
+        role_version_cache.invalidate(username)
+    if has_app_context():
+        # The memoized values of the current request may describe the old role
+        g.pop('current_user', None)
+        g.pop('current_identity', None)
+
+
+def get_current_user(db):
+    """
+    Document of the authenticated user (without the password hash), loaded at
+    most once per request; None if the account no longer exists.
+    """
+    if 'current_user' not in g:
+        g.current_user = db.users.find_one({'username': get_jwt_identity()}, CURRENT_USER_PROJECTION)
+    return g.current_user
+
+
+def get_current_identity(db):
+    """
+    {'_id', 'username', 'role'} of the authenticated user, or None if the
+    account no longer exists. Requires a verified JWT in the current request.
+    """
+    if 'current_identity' not in g:
+        g.current_identity = _resolve_identity(db)
+    return g.current_identity
+
+
+def _current_role_version(db, username):
+    version = role_version_cache.get(username, 'role_version')
+    if version is None:
+        # Shares the memoized load with get_current_user
+        user = get_current_user(db)
+        version = user.get('role_version', 0) if user else DELETED
+        role_version_cache.set(username, 'role_version', version)
+    return version
+
+
+def _resolve_identity(db):
+    username = get_jwt_identity()
+    version = _current_role_version(db, username)
+    if version == DELETED:
+        return None
+    claims = get_jwt()
+    if claims.get('role_version') == version and claims.get('user_id') and claims.get('role'):
+        return {'_id': ObjectId(claims['user_id']), 'username': username, 'role': claims['role']}
+
+    # Token minted before the last role change (or before claims existed)
+    user = get_current_user(db)
+    if not user:
+        return None
+    return {'_id': user['_id'], 'username': username, 'role': effective_role(user)}
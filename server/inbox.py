@@ -0,0 +1,160 @@
+# NOTE: Denormalized conversation summaries for the messaging inbox.
+#
+# Every direct-message pair has one document in `conversations` that carries
+# the participants, the last message and per-participant unread counters. It is
+# updated with a single upsert whenever a message is sent, so listing the inbox
+# is one indexed query sorted by last_message_at.
+#
+# CONVERSATIONS TABLE (summary fields)
+#------------------------------
+# dm_id: str -> "dm:<username>|<username>" (same value as messages.conversation_id), unique
+# participant_ids: list of ObjectId -> both users
+# participants: list of {user_id, username, name}
+# last_message: {_id, content, sender_username, created_at}
+# last_message_at: datetime
+# unread: dict -> {str(user_id): number of unread messages}
+# sender_id, receiver_id, created_at: set when the conversation is created
+#
+# Conversations created before these fields existed are migrated by
+# jobs/backfill_conversations.py.
+
+from datetime import datetime, timezone
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError, BulkWriteError
+from helpers import format_timestamp
+from archive import archive_name
+
+
+def dm_conversation_id(user_a, user_b):
+    a, b = sorted([str(user_a), str(user_b)])
+    return f"dm:{a}|{b}"
+
+
+def participant(user):
+    return {'user_id': user['_id'], 'username': user['username'], 'name': user.get('name', user['username'])}
+
+
+def _upsert_summary(db, dm_id, update):
+    try:
+        return db.conversations.find_one_and_update(
+            {'dm_id': dm_id}, update, upsert=True, return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # Two first messages raced to create the summary; it exists now
+        return db.conversations.find_one_and_update({'dm_id': dm_id}, update, return_document=ReturnDocument.AFTER)
+
+
+def conversation_defaults(sender, receiver):
+    """Fields of a new conversation document between two user documents."""
+    return {
+        'sender_id': sender['_id'],
+        'receiver_id': receiver['_id'],
+        'participant_ids': [sender['_id'], receiver['_id']],
+        'participants': [participant(sender), participant(receiver)],
+        'created_at': datetime.now(timezone.utc)
+    }
+
+
+def ensure_conversation(db, sender, receiver):
+    """Get or create the conversation between two user documents."""
+    dm_id = dm_conversation_id(sender['username'], receiver['username'])
+    return _upsert_summary(db, dm_id, {'$setOnInsert': conversation_defaults(sender, receiver)})
+
+
+def _message_summary_update(sender, receiver, message):
+    return {
+        '$set': {
+            'last_message': {
+                '_id': message['_id'],
+                'content': message['content'],
+                'sender_username': sender['username'],
+                'created_at': message['created_at']
+            },
+            'last_message_at': message['created_at']
+        },
+        '$inc': {f"unread.{receiver['_id']}": 1},
+        '$setOnInsert': conversation_defaults(sender, receiver)
+    }
+
+
+def record_message(db, sender, receiver, message):
+    """Update the conversation summary for a message that was just inserted."""
+    return _upsert_summary(db, message['conversation_id'], _message_summary_update(sender, receiver, message))
+
+
+def record_messages(db, sender, deliveries):
+    """
+    Update the summaries for messages from one sender, inserted together.
+    `deliveries` is a list of (receiver, message) pairs with distinct receivers.
+    Returns {dm_id: conversation _id}.
+    """
+    updates = [
+        (message['conversation_id'], _message_summary_update(sender, receiver, message))
+        for receiver, message in deliveries
+    ]
+    if not updates:
+        return {}
+    try:
+        db.conversations.bulk_write(
+            [UpdateOne({'dm_id': dm_id}, update, upsert=True) for dm_id, update in updates],
+            ordered=False
+        )
+    except BulkWriteError as e:
+        errors = e.details['writeErrors']
+        if any(error.get('code') != 11000 for error in errors):
+            raise
+        # Summaries created concurrently by a first message; they exist now
+        for error in errors:
+            dm_id, update = updates[error['index']]
+            db.conversations.update_one({'dm_id': dm_id}, update)
+    dm_ids = [dm_id for dm_id, _ in updates]
+    return {c['dm_id']: c['_id'] for c in db.conversations.find({'dm_id': {'$in': dm_ids}}, {'dm_id': 1})}
+
+
+def _update_summary(db, dm_id, update):
+    """Update an existing summary; returns its _id, or None if there is none."""
+    conversation = db.conversations.find_one_and_update({'dm_id': dm_id}, update, projection={'_id': 1})
+    return conversation['_id'] if conversation else None
+
+
+def refresh_last_message(db, dm_id):
+    """Recompute last_message after a message was edited or deleted."""
+    last = (db.messages.find_one({'conversation_id': dm_id}, sort=[('created_at', -1)])
+            or db[archive_name('messages')].find_one({'conversation_id': dm_id}, sort=[('created_at', -1)]))
+    if last:
+        update = {'$set': {
+            'last_message': {
+                '_id': last['_id'],
+                'content': last['content'],
+                'sender_username': last.get('sender_username'),
+                'created_at': last['created_at']
+            },
+            'last_message_at': last['created_at']
+        }}
+    else:
+        update = {'$unset': {'last_message': '', 'last_message_at': ''}}
+    return _update_summary(db, dm_id, update)
+
+
+def mark_conversation_read(db, dm_id, user_id):
+    return _update_summary(db, dm_id, {'$set': {f"unread.{user_id}": 0}})
+
+
+def serialize_inbox_entry(conversation, user_id):
+    """Inbox row as seen by `user_id`: the other participant plus the last message."""
+    other = next(
+        (p for p in conversation.get('participants', []) if p['user_id'] != user_id),
+        {'username': None, 'name': None}
+    )
+    last_message = conversation.get('last_message')
+    return {
+        'conversation_id': str(conversation['_id']),
+        'username': other['username'],
+        'name': other['name'],
+        'last_message': {
+            'content': last_message['content'],
+            'created_at': format_timestamp(last_message['created_at']),
+            'sender_username': last_message['sender_username']
+        } if last_message else None,
+        'unread_count': conversation.get('unread', {}).get(str(user_id), 0)
+    }
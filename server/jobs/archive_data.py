@@ -0,0 +1,142 @@
+# NOTE: Moves cold messages and reservations to the archive tier (archive.py)
+#
+# Usage (from the server/ directory):
+#   python -m jobs.archive_data             -> single pass
+#   python -m jobs.archive_data --dry-run   -> count documents due for archiving
+#   python -m jobs.archive_data --worker    -> run periodically
+#
+# Also runs on a background thread when RUN_SCHEDULER is enabled
+# (ARCHIVE_INTERVAL_SECONDS in the [PROD] section of .ini).
+#
+# Documents are copied to the archive before they are deleted from the hot
+# collection; after a crash the copied batch is found again and the duplicate
+# inserts are ignored, so a pass can be interrupted at any time.
+#
+# Each pass records the size of every collection and the latency of a typical
+# hot query before and after moving documents (ARCHIVE_RUNS, shown by
+# GET /api/admin/archive).
+#
+# ARCHIVE_RUNS TABLE
+#------------------------------
+# started_at, finished_at: datetime
+# tiers: dict -> {name: {moved, before: metrics, after: metrics}}
+#   metrics: {count, size_bytes, index_bytes, archive_count, probe_ms}
+
+import argparse
+import time
+from datetime import datetime, timezone
+from pymongo.errors import BulkWriteError, OperationFailure
+from db import get_db, config
+from archive import archive_name, archive_cutoff, archive_query
+from jobs.scheduler import run_periodically, start_in_background
+
+JOB_NAME = 'archive_data'
+BATCH_SIZE = 1000
+INTERVAL_SECONDS = config.getint('PROD', 'ARCHIVE_INTERVAL_SECONDS', fallback=24 * 3600)
+TIERS = ['messages', 'reservations']
+PROBE_LIMIT = 50
+
+
+def _probe_query(db, name):
+    """A typical hot read: the latest page of the most recently active conversation/user."""
+    if name == 'messages':
+        latest = db.messages.find_one({}, {'conversation_id': 1}, sort=[('_id', -1)])
+        if latest:
+            return db.messages.find({'conversation_id': latest.get('conversation_id')}).sort('created_at', -1)
+    else:
+        latest = db.reservations.find_one({}, {'user_id': 1}, sort=[('_id', -1)])
+        if latest:
+            return db.reservations.find({'user_id': latest.get('user_id')}).sort('start_date', -1)
+    return None
+
+
+def collection_metrics(db, name):
+    metrics = {
+        'count': db[name].estimated_document_count(),
+        'archive_count': db[archive_name(name)].estimated_document_count(),
+        'size_bytes': None,
+        'index_bytes': None,
+        'probe_ms': None
+    }
+    try:
+        stats = db.command('collStats', name)
+        metrics['size_bytes'] = stats.get('size')
+        metrics['index_bytes'] = stats.get('totalIndexSize')
+    except OperationFailure:
+        pass  # Collection does not exist yet
+    cursor = _probe_query(db, name)
+    if cursor is not None:
+        started = time.perf_counter()
+        list(cursor.limit(PROBE_LIMIT))
+        metrics['probe_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    return metrics
+
+
+def archive_collection(db, name, batch_size=BATCH_SIZE):
+    """Move every document due for archiving. Returns the number moved."""
+    query = archive_query(name, archive_cutoff(name))
+    hot, archive = db[name], db[archive_name(name)]
+    moved = 0
+    while True:
+        batch = list(hot.find(query).sort('_id', 1).limit(batch_size))
+        if not batch:
+            return moved
+        try:
+            archive.insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            # Copied by an interrupted pass
+            if any(error.get('code') != 11000 for error in e.details['writeErrors']):
+                raise
+        hot.delete_many({'_id': {'$in': [doc['_id'] for doc in batch]}})
+        moved += len(batch)
+
+
+def archive_data(db, batch_size=BATCH_SIZE):
+    run = {'started_at': datetime.now(timezone.utc), 'tiers': {}}
+    for name in TIERS:
+        before = collection_metrics(db, name)
+        moved = archive_collection(db, name, batch_size)
+        run['tiers'][name] = {'moved': moved, 'before': before, 'after': collection_metrics(db, name)}
+    run['finished_at'] = datetime.now(timezone.utc)
+    db.archive_runs.insert_one(run)
+    return run
+
+
+def start_archive_scheduler(interval_seconds=INTERVAL_SECONDS):
+    """Run the archival on a background thread of the web process."""
+    return start_in_background(get_db(), JOB_NAME, archive_data, interval_seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Move old messages and past reservations to archive collections.')
+    parser.add_argument('--dry-run', action='store_true', help='Only count documents due for archiving')
+    parser.add_argument('--worker', action='store_true', help='Keep running every --interval seconds')
+    parser.add_argument('--interval', type=int, default=INTERVAL_SECONDS, help='Seconds between passes')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Documents per batch')
+    args = parser.parse_args()
+
+    db = get_db()
+    if args.dry_run:
+        for name in TIERS:
+            due = db[name].count_documents(archive_query(name, archive_cutoff(name)))
+            print(f"{name}: {due} document(s) due for archiving")
+        return
+
+    def job(db):
+        run = archive_data(db, args.batch_size)
+        for name, tier in run['tiers'].items():
+            before, after = tier['before'], tier['after']
+            print(f"{name}: {tier['moved']} archived; "
+                  f"count {before['count']} -> {after['count']}, "
+                  f"size {before['size_bytes']} -> {after['size_bytes']} bytes, "
+                  f"indexes {before['index_bytes']} -> {after['index_bytes']} bytes, "
+                  f"probe {before['probe_ms']} -> {after['probe_ms']} ms")
+
+    if args.worker:
+        run_periodically(db, JOB_NAME, job, args.interval)
+    else:
+        job(db)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+# NOTE: Rebuild of the messaging contact pairs (contacts.py) from reservations
+#
+# Usage (from the server/ directory):
+#   python -m jobs.backfill_contacts             -> rebuild every pair
+#   python -m jobs.backfill_contacts --dry-run   -> count pairs that differ
+#
+# Counts reservations per guest/host pair with one aggregation and writes the
+# pairs whose counter differs; pairs without reservations are removed. Running
+# it again only touches what still differs. Web workers pick up the new pairs
+# when their contact cache expires (contacts_cache TTL).
+
+import argparse
+from pymongo import UpdateOne, DeleteOne
+from db import get_db, ensure_indexes
+from contacts import contact_pair_id
+from archive import archive_name
+
+BATCH_SIZE = 1000
+
+
+def count_pairs(db):
+    """{pair_id: (user_ids, reservations)} computed from reservations, archived ones included."""
+    pipeline = [
+        {'$match': {'user_id': {'$ne': None}, 'host_id': {'$ne': None}}},
+        {'$group': {'_id': {'user_id': '$user_id', 'host_id': '$host_id'}, 'count': {'$sum': 1}}}
+    ]
+    pairs = {}
+    rows = [row for name in ('reservations', archive_name('reservations'))
+            for row in db[name].aggregate(pipeline, allowDiskUse=True)]
+    for row in rows:
+        guest_id, host_id = row['_id']['user_id'], row['_id']['host_id']
+        if str(guest_id) == str(host_id):
+            continue
+        pair_id = contact_pair_id(guest_id, host_id)
+        # Both users may have booked each other's listings
+        _, count = pairs.get(pair_id, (None, 0))
+        pairs[pair_id] = ([guest_id, host_id], count + row['count'])
+    return pairs
+
+
+def diff_pairs(db, pairs):
+    """Operations that bring contact_pairs in line with `pairs`."""
+    operations = []
+    existing = set()
+    for pair in db.contact_pairs.find({}, {'reservations': 1}):
+        existing.add(pair['_id'])
+        if pair['_id'] not in pairs:
+            operations.append(DeleteOne({'_id': pair['_id']}))
+        elif pair.get('reservations') != pairs[pair['_id']][1]:
+            operations.append(UpdateOne({'_id': pair['_id']}, {'$set': {'reservations': pairs[pair['_id']][1]}}))
+    for pair_id, (user_ids, count) in pairs.items():
+        if pair_id not in existing:
+            operations.append(UpdateOne(
+                {'_id': pair_id},
+                {'$set': {'reservations': count}, '$setOnInsert': {'user_ids': user_ids}},
+                upsert=True
+            ))
+    return operations
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild messaging contact pairs from reservations.')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Writes per batch')
+    parser.add_argument('--dry-run', action='store_true', help='Only count pairs that differ')
+    args = parser.parse_args()
+
+    db = get_db()
+    operations = diff_pairs(db, count_pairs(db))
+    if args.dry_run:
+        print(f"{len(operations)} contact pair(s) differ from reservations")
+        return
+
+    ensure_indexes()
+    for start in range(0, len(operations), args.batch_size):
+        db.contact_pairs.bulk_write(operations[start:start + args.batch_size], ordered=False)
+    print(f"{len(operations)} contact pair(s) written")
+
+
+if __name__ == '__main__':
+    main()
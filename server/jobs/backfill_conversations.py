@@ -0,0 +1,149 @@
+# NOTE: Backfill of the denormalized conversation summaries (inbox.py)
+#
+# Usage (from the server/ directory):
+#   python -m jobs.backfill_conversations             -> migrate and rebuild summaries
+#   python -m jobs.backfill_conversations --dry-run   -> count conversations left to migrate
+#
+# 1. Conversations created before the summaries existed get dm_id and their
+#    participants; a legacy duplicate of an existing summary is removed.
+# 2. last_message/last_message_at are rebuilt from the messages collection,
+#    creating summaries for pairs that exchanged messages without one.
+# Unread counters start at zero. Both steps only touch what still differs, so
+# the job can be interrupted and started again at any time. A summary that
+# already has a newer last message (sent while the job was running) is kept.
+
+import argparse
+from pymongo import UpdateOne
+from db import get_db, ensure_indexes
+from inbox import dm_conversation_id, participant
+
+BATCH_SIZE = 1000
+
+
+def migrate_legacy_conversations(db, batch_size=BATCH_SIZE):
+    """Returns (migrated, removed duplicates, skipped) counts."""
+    migrated = removed = skipped = 0
+    last_id = None
+    while True:
+        query = {'dm_id': {'$exists': False}}
+        if last_id is not None:
+            query['_id'] = {'$gt': last_id}
+        batch = list(db.conversations.find(query, {'sender_id': 1, 'receiver_id': 1}).sort('_id', 1).limit(batch_size))
+        if not batch:
+            break
+        last_id = batch[-1]['_id']
+
+        user_ids = {c.get('sender_id') for c in batch} | {c.get('receiver_id') for c in batch}
+        users = {u['_id']: u for u in db.users.find({'_id': {'$in': list(user_ids)}}, {'username': 1, 'name': 1})}
+
+        for conversation in batch:
+            sender = users.get(conversation.get('sender_id'))
+            receiver = users.get(conversation.get('receiver_id'))
+            if not sender or not receiver:
+                # Deleted users are handled by jobs/cascade_deletes.py
+                skipped += 1
+                continue
+            dm_id = dm_conversation_id(sender['username'], receiver['username'])
+            if db.conversations.find_one({'dm_id': dm_id}, {'_id': 1}):
+                db.conversations.delete_one({'_id': conversation['_id']})
+                removed += 1
+                continue
+            db.conversations.update_one({'_id': conversation['_id'], 'dm_id': {'$exists': False}}, {'$set': {
+                'dm_id': dm_id,
+                'participant_ids': [sender['_id'], receiver['_id']],
+                'participants': [participant(sender), participant(receiver)]
+            }})
+            migrated += 1
+
+    return migrated, removed, skipped
+
+
+def rebuild_last_messages(db, batch_size=BATCH_SIZE):
+    """
+    Returns the number of summaries written. last_message is only set where it
+    is missing or older than the newest message, as the aggregation is a
+    snapshot and record_message may have written a newer one since.
+    """
+    pipeline = [
+        {'$match': {'conversation_id': {'$regex': '^dm:'}}},
+        {'$sort': {'conversation_id': 1, 'created_at': -1}},
+        {'$group': {
+            '_id': '$conversation_id',
+            'message_id': {'$first': '$_id'},
+            'content': {'$first': '$content'},
+            'sender_username': {'$first': '$sender_username'},
+            'receiver_username': {'$first': '$receiver_username'},
+            'created_at': {'$first': '$created_at'}
+        }}
+    ]
+    written = 0
+    batch = []
+
+    def flush():
+        nonlocal written
+        usernames = {row['sender_username'] for row in batch} | {row['receiver_username'] for row in batch}
+        users = {u['username']: u for u in db.users.find({'username': {'$in': list(usernames)}}, {'username': 1, 'name': 1})}
+        creates, updates = [], []
+        for row in batch:
+            sender = users.get(row['sender_username'])
+            receiver = users.get(row['receiver_username'])
+            if not sender or not receiver:
+                continue
+            # Created first and updated separately: an upsert with the
+            # last_message_at guard would insert a duplicate dm_id when the
+            # summary is newer
+            creates.append(UpdateOne({'dm_id': row['_id']}, {'$setOnInsert': {
+                'sender_id': sender['_id'],
+                'receiver_id': receiver['_id'],
+                'participant_ids': [sender['_id'], receiver['_id']],
+                'participants': [participant(sender), participant(receiver)],
+                'created_at': row['created_at']
+            }}, upsert=True))
+            updates.append(UpdateOne({
+                'dm_id': row['_id'],
+                '$or': [{'last_message_at': None}, {'last_message_at': {'$lt': row['created_at']}}]
+            }, {'$set': {
+                'last_message': {
+                    '_id': row['message_id'],
+                    'content': row['content'],
+                    'sender_username': row['sender_username'],
+                    'created_at': row['created_at']
+                },
+                'last_message_at': row['created_at']
+            }}))
+        if creates:
+            db.conversations.bulk_write(creates, ordered=False)
+            written += db.conversations.bulk_write(updates, ordered=False).modified_count
+        batch.clear()
+
+    for row in db.messages.aggregate(pipeline, allowDiskUse=True):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill denormalized conversation summaries.')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Documents per batch')
+    parser.add_argument('--dry-run', action='store_true', help='Only count conversations left to migrate')
+    args = parser.parse_args()
+
+    db = get_db()
+    if args.dry_run:
+        left = db.conversations.count_documents({'dm_id': {'$exists': False}})
+        print(f"{left} conversation(s) without a summary")
+        return
+
+    # The unique dm_id index must exist before summaries are written
+    ensure_indexes()
+    migrated, removed, skipped = migrate_legacy_conversations(db, args.batch_size)
+    print(f"{migrated} conversation(s) migrated, {removed} duplicate(s) removed, {skipped} with deleted users skipped")
+    written = rebuild_last_messages(db, args.batch_size)
+    print(f"{written} conversation summary(ies) updated from messages")
+
+
+if __name__ == '__main__':
+    main()
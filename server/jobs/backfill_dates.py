@@ -0,0 +1,87 @@
+# NOTE: Backfill converting string dates to BSON dates
+#
+# Usage (from the server/ directory):
+#   python -m jobs.backfill_dates             -> convert every field
+#   python -m jobs.backfill_dates --dry-run   -> count documents left to convert
+#
+# Reservations used to store start_date/end_date as "YYYY-MM-DD" strings and
+# messages/conversations stored created_at as ISO strings. Only string values
+# are selected, so the job can be interrupted and started again at any time.
+# Values that cannot be parsed are left untouched and reported.
+
+import argparse
+from pymongo import UpdateOne
+from db import get_db, ensure_indexes
+from helpers import parse_date, parse_timestamp
+
+BATCH_SIZE = 1000
+
+
+# (collection, field, parser) triples to backfill
+DATE_FIELDS = [
+    ('reservations', 'start_date', parse_date),
+    ('reservations', 'end_date', parse_date),
+    ('messages', 'created_at', parse_timestamp),
+    ('conversations', 'created_at', parse_timestamp),
+]
+
+
+def backfill_field(db, collection, field, parser, batch_size=BATCH_SIZE):
+    """
+    Convert string values of `collection.field` to dates in _id-ordered batches.
+
+    Returns:
+        (converted, skipped) counts
+    """
+    converted = skipped = 0
+    last_id = None
+    while True:
+        query = {field: {'$type': 'string'}}
+        if last_id is not None:
+            query['_id'] = {'$gt': last_id}
+        batch = list(db[collection].find(query, {field: 1}).sort('_id', 1).limit(batch_size))
+        if not batch:
+            break
+
+        operations = []
+        for doc in batch:
+            value = parser(doc[field])
+            if value is None:
+                skipped += 1
+                continue
+            # Guard on the old value so concurrent writers are never overwritten
+            operations.append(UpdateOne(
+                {'_id': doc['_id'], field: doc[field]},
+                {'$set': {field: value}}
+            ))
+
+        if operations:
+            result = db[collection].bulk_write(operations, ordered=False)
+            converted += result.modified_count
+
+        last_id = batch[-1]['_id']
+
+    return converted, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert string dates to BSON dates.')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Documents per batch')
+    parser.add_argument('--dry-run', action='store_true', help='Only count documents left to convert')
+    args = parser.parse_args()
+
+    db = get_db()
+    for collection, field, field_parser in DATE_FIELDS:
+        if args.dry_run:
+            left = db[collection].count_documents({field: {'$type': 'string'}})
+            print(f"{collection}.{field}: {left} string value(s) left")
+            continue
+        converted, skipped = backfill_field(db, collection, field, field_parser, batch_size=args.batch_size)
+        print(f"{collection}.{field}: {converted} converted, {skipped} unparseable value(s) skipped")
+
+    if not args.dry_run:
+        ensure_indexes()
+
+
+if __name__ == '__main__':
+    main()
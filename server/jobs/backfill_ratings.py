@@ -0,0 +1,100 @@
+# NOTE: Batch job to recompute average_rating and review_count for every listing
+#
+# Usage (from the server/ directory):
+#   python -m jobs.backfill_ratings               -> fix stale listings
+#   python -m jobs.backfill_ratings --check-only  -> only report stale listings
+
+import argparse
+from pymongo import UpdateOne
+from db import get_db
+
+BATCH_SIZE = 1000
+
+
+def aggregate_review_stats(db):
+    """
+    Compute rating stats for all listings with one $group over reviews.
+
+    Returns:
+        dict mapping str(property_id) -> (average_rating, review_count)
+    """
+    pipeline = [
+        {'$group': {
+            '_id': '$property_id',
+            'total_rating': {'$sum': '$rating'},
+            'review_count': {'$sum': 1}
+        }}
+    ]
+    stats = {}
+    for row in db.reviews.aggregate(pipeline, allowDiskUse=True):
+        if row['_id'] is None:
+            continue
+        key = str(row['_id'])
+        # property_id may be stored as str or ObjectId, merge both spellings
+        total, count = stats.get(key, (0, 0))
+        stats[key] = (total + row['total_rating'], count + row['review_count'])
+
+    return {
+        key: (round(total / count, 2) if count else 0, count)
+        for key, (total, count) in stats.items()
+    }
+
+
+def find_stale_listings(db, stats):
+    """
+    Yield (listing_id, expected_average, expected_count) for every listing
+    whose stored stats differ from the aggregated ones.
+    """
+    cursor = db.listings.find({}, {'average_rating': 1, 'review_count': 1})
+    for listing in cursor:
+        average_rating, review_count = stats.get(str(listing['_id']), (0, 0))
+        if listing.get('average_rating') != average_rating or listing.get('review_count') != review_count:
+            yield listing['_id'], average_rating, review_count
+
+
+def backfill_ratings(db, check_only=False, batch_size=BATCH_SIZE):
+    """
+    Recompute ratings for all listings and write back the stale ones with
+    unordered bulk writes.
+
+    Returns:
+        list of corrected (or, in check-only mode, stale) listing ids as strings
+    """
+    stats = aggregate_review_stats(db)
+
+    corrected = []
+    operations = []
+    for listing_id, average_rating, review_count in find_stale_listings(db, stats):
+        corrected.append(str(listing_id))
+        if check_only:
+            continue
+        operations.append(UpdateOne(
+            {'_id': listing_id},
+            {'$set': {'average_rating': average_rating, 'review_count': review_count}}
+        ))
+        if len(operations) >= batch_size:
+            db.listings.bulk_write(operations, ordered=False)
+            operations = []
+
+    if operations:
+        db.listings.bulk_write(operations, ordered=False)
+
+    return corrected
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recompute listing ratings from reviews.')
+    parser.add_argument('--check-only', action='store_true', help='Report stale listings without writing')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Updates per bulk_write call')
+    args = parser.parse_args()
+
+    corrected = backfill_ratings(get_db(), check_only=args.check_only, batch_size=args.batch_size)
+
+    for listing_id in corrected:
+        print(listing_id)
+    action = 'stale' if args.check_only else 'corrected'
+    print(f"{len(corrected)} listing(s) {action}")
+
+
+if __name__ == '__main__':
+    main()
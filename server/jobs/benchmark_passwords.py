@@ -0,0 +1,64 @@
+# NOTE: Login throughput benchmark for the password hashing settings (passwords.py)
+#
+# Usage (from the server/ directory):
+#   python -m jobs.benchmark_passwords                           -> configured method
+#   python -m jobs.benchmark_passwords --method pbkdf2:sha256:600000 --method scrypt:16384:8:1
+#
+# Verifies a password the way login does, from --concurrency threads (at most
+# PASSWORD_HASH_MAX_PENDING, what one web worker accepts), once in the request
+# thread (the former behaviour) and once through the process pool, and reports
+# hashes per second in total and per core. Run it on the web hosts to pick a
+# cost the login rate can afford.
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+import passwords
+
+HASHES = 200
+
+
+def _measure(verify, password_hash, hashes, concurrency):
+    """Hashes per second of `verify` called `hashes` times from `concurrency` threads."""
+    with ThreadPoolExecutor(concurrency) as threads:
+        # Warm-up: starts the pool processes outside the measurement
+        list(threads.map(lambda _: verify(password_hash, 'benchmark'), range(concurrency)))
+        started = time.perf_counter()
+        list(threads.map(lambda _: verify(password_hash, 'benchmark'), range(hashes)))
+        return hashes / (time.perf_counter() - started)
+
+
+def benchmark(method, hashes=HASHES, concurrency=passwords.PASSWORD_HASH_MAX_PENDING):
+    password_hash = generate_password_hash('benchmark', method)
+    return {
+        'request_thread': _measure(check_password_hash, password_hash, hashes, concurrency),
+        'pool': _measure(passwords.verify_password, password_hash, hashes, concurrency)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure password hashes per second per core.')
+    parser.add_argument('--method', action='append', help='werkzeug hash method (repeatable)')
+    parser.add_argument('--hashes', type=int, default=HASHES, help='Verifications per measurement')
+    parser.add_argument('--concurrency', type=int, default=passwords.PASSWORD_HASH_MAX_PENDING,
+                        help='Concurrent logins')
+    args = parser.parse_args()
+
+    concurrency = max(1, min(args.concurrency, passwords.PASSWORD_HASH_MAX_PENDING))
+    cores = os.cpu_count() or 1
+    # The request thread holds one core; the pool uses at most one per worker process
+    cores_used = {'request_thread': 1, 'pool': max(1, min(passwords.PASSWORD_HASH_WORKERS, cores))}
+    print(f"{cores} core(s), {passwords.PASSWORD_HASH_WORKERS} pool worker(s), concurrency {concurrency}")
+    try:
+        for method in args.method or [passwords.PASSWORD_HASH_METHOD]:
+            result = benchmark(method, args.hashes, concurrency)
+            for mode, rate in result.items():
+                print(f"{method} [{mode}]: {rate:.1f} hashes/s, {rate / cores_used[mode]:.1f} hashes/s per core")
+    finally:
+        passwords.shutdown_pool()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+# NOTE: Cascade cleanup after user and listing deletions (queue in cascade.py)
+#
+# Usage (from the server/ directory):
+#   python -m jobs.cascade_deletes           -> run as a worker process
+#   python -m jobs.cascade_deletes --once    -> drain the queue and exit
+#
+# Also runs on a background thread when RUN_SCHEDULER is enabled
+# (CASCADE_INTERVAL_SECONDS in the [PROD] section of .ini).
+#
+# Deleted listing:
+# - active reservations are cancelled and every reservation is tombstoned (listing_deleted),
+#   archived ones included
+# - its reviews and its booking calendar are deleted
+# Deleted user:
+# - their listings are deleted (each one queues its own listing task)
+# - their active reservations are cancelled (nights released), all are tombstoned (guest_deleted)
+# - their reviews, messages, conversations, messaging contacts and reset codes are deleted
+#   (archived messages and reservations included)
+# - payments are kept for accounting and tombstoned (user_deleted)
+#
+# Every step works in batches on documents that still need it, so re-running a
+# step after a crash is harmless; finished steps are recorded on the task.
+# A task that raises is retried later with exponential backoff
+# (CASCADE_RETRY_SECONDS, doubling up to CASCADE_MAX_RETRY_SECONDS) while the
+# rest of the queue moves on; after CASCADE_MAX_ATTEMPTS failures it is set
+# aside as "failed" with its last error, to be fixed and re-queued by hand.
+
+import argparse
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from db import get_db, config
+from helpers import record_status_changes, update_listing_rating, id_variants
+from availability import ACTIVE_STATUSES, invalidate_availability
+from analytics import invalidate_host_analytics
+from stats import increment_stats
+from cascade import cascade_task
+from contacts import invalidate_contacts
+from archive import archive_name
+from jobs.scheduler import run_periodically, start_in_background
+
+JOB_NAME = 'cascade_deletes'
+BATCH_SIZE = 1000
+INTERVAL_SECONDS = config.getint('PROD', 'CASCADE_INTERVAL_SECONDS', fallback=30)
+MAX_ATTEMPTS = config.getint('PROD', 'CASCADE_MAX_ATTEMPTS', fallback=5)
+RETRY_SECONDS = config.getint('PROD', 'CASCADE_RETRY_SECONDS', fallback=60)
+MAX_RETRY_SECONDS = config.getint('PROD', 'CASCADE_MAX_RETRY_SECONDS', fallback=3600)
+
+
+def _in_batches(collection, query, handle, batch_size, projection=None):
+    """
+    Call handle(batch) until `query` matches nothing.
+    `handle` must make the documents stop matching (delete or tombstone them).
+    """
+    while True:
+        batch = list(collection.find(query, projection or {'_id': 1}).limit(batch_size))
+        if not batch:
+            return
+        handle(batch)
+
+
+def _cancel_reservations(db, query, reason, batch_size):
+    def cancel(batch):
+        ids = [r['_id'] for r in batch]
+        # Still active only: a reservation that expired or finished meanwhile keeps its status
+        db.reservations.update_many(
+            {'_id': {'$in': ids}, 'status': {'$in': ACTIVE_STATUSES}},
+            {'$set': {'status': 'cancelled'}}
+        )
+        # and only the ones this update changed are released and recorded
+        changed = {r['_id'] for r in db.reservations.find({'_id': {'$in': ids}, 'status': 'cancelled'}, {'_id': 1})}
+        cancelled = [r for r in batch if r['_id'] in changed]
+        if not cancelled:
+            return
+        cancelled_ids = [r['_id'] for r in cancelled]
+        db.listing_calendars.update_many(
+            {'booked.reservation_id': {'$in': cancelled_ids}},
+            {'$pull': {'booked': {'reservation_id': {'$in': cancelled_ids}}}}
+        )
+        record_status_changes(db, cancelled_ids, 'cancelled', JOB_NAME, reason=reason,
+                              previous=[r.get('status') for r in cancelled])
+        for listing_id in {r.get('listing_id') for r in cancelled}:
+            invalidate_availability(listing_id)
+        for host_id in {r.get('host_id') for r in cancelled}:
+            invalidate_host_analytics(host_id)
+
+    active = {**query, 'status': {'$in': ACTIVE_STATUSES}}
+    _in_batches(db.reservations, active, cancel, batch_size,
+                {'status': 1, 'listing_id': 1, 'host_id': 1})
+
+
+def _tombstone(collection, query, flag, batch_size):
+    def mark(batch):
+        collection.update_many({'_id': {'$in': [d['_id'] for d in batch]}}, {'$set': {flag: True}})
+
+    _in_batches(collection, {**query, flag: {'$ne': True}}, mark, batch_size)
+
+
+def _delete(collection, query, batch_size):
+    _in_batches(collection, query,
+                lambda batch: collection.delete_many({'_id': {'$in': [d['_id'] for d in batch]}}),
+                batch_size)
+
+
+def _delete_reviews(db, query, batch_size):
+    def delete(batch):
+        db.reviews.delete_many({'_id': {'$in': [r['_id'] for r in batch]}})
+        increment_stats(db, {
+            'reviews.count': -len(batch),
+            'reviews.rating_sum': -sum(r.get('rating', 0) for r in batch)
+        })
+        affected.update(str(r.get('property_id')) for r in batch)
+
+    affected = set()
+    _in_batches(db.reviews, query, delete, batch_size, {'rating': 1, 'property_id': 1})
+    return affected
+
+
+def _delete_contacts(db, user_id, batch_size):
+    def delete(batch):
+        db.contact_pairs.delete_many({'_id': {'$in': [p['_id'] for p in batch]}})
+        invalidate_contacts(*{other for p in batch for other in p.get('user_ids', [])})
+
+    _in_batches(db.contact_pairs, {'user_ids': user_id}, delete, batch_size, {'user_ids': 1})
+
+
+def _delete_host_listings(db, host_id, batch_size):
+    def delete(batch):
+        ids = [l['_id'] for l in batch]
+        # Queue the listing tasks first: if we stop in between, the batch is
+        # picked up again and the duplicate listing tasks are no-ops
+        db.cascade_tasks.insert_many([
+            cascade_task('listing', _id, host_id=host_id) for _id in ids
+        ])
+        db.listings.delete_many({'_id': {'$in': ids}})
+        increment_stats(db, {
+            f"listings_by_status.{status}": -count
+            for status, count in Counter(l.get('status') for l in batch).items()
+        })
+
+    _in_batches(db.listings, {'host_id': id_variants(host_id)}, delete, batch_size, {'status': 1})
+
+
+def listing_steps(db, task, batch_size):
+    listing_id = task['target_id']
+    query = {'listing_id': id_variants(listing_id)}
+    return [
+        ('cancel_reservations', lambda: _cancel_reservations(db, query, 'Listing deleted', batch_size)),
+        ('tombstone_reservations', lambda: _tombstone(db.reservations, query, 'listing_deleted', batch_size)),
+        ('tombstone_archived_reservations', lambda: _tombstone(
+            db[archive_name('reservations')], query, 'listing_deleted', batch_size)),
+        ('delete_reviews', lambda: _delete_reviews(db, {'property_id': id_variants(listing_id)}, batch_size)),
+        ('delete_calendar', lambda: db.listing_calendars.delete_one({'_id': listing_id})),
+        ('invalidate_caches', lambda: (invalidate_availability(listing_id),
+                                       invalidate_host_analytics(task.get('host_id')))),
+    ]
+
+
+def user_steps(db, task, batch_size):
+    user_id = task['target_id']
+    username = task.get('username')
+
+    def delete_reviews():
+        for property_id in _delete_reviews(db, {'user_id': id_variants(user_id)}, batch_size):
+            update_listing_rating(db, property_id)
+
+    steps = [
+        ('delete_listings', lambda: _delete_host_listings(db, user_id, batch_size)),
+        ('cancel_reservations', lambda: _cancel_reservations(
+            db, {'user_id': id_variants(user_id)}, 'Guest account deleted', batch_size)),
+        ('tombstone_reservations', lambda: _tombstone(
+            db.reservations, {'user_id': id_variants(user_id)}, 'guest_deleted', batch_size)),
+        ('tombstone_archived_reservations', lambda: _tombstone(
+            db[archive_name('reservations')], {'user_id': id_variants(user_id)}, 'guest_deleted', batch_size)),
+        ('delete_reviews', delete_reviews),
+        ('delete_conversations', lambda: _delete(
+            db.conversations,
+            {'$or': [{'participant_ids': user_id}, {'sender_id': user_id}, {'receiver_id': user_id}]},
+            batch_size)),
+        ('delete_contacts', lambda: _delete_contacts(db, user_id, batch_size)),
+        ('tombstone_payments', lambda: _tombstone(
+            db.payments, {'user_id': id_variants(user_id)}, 'user_deleted', batch_size)),
+    ]
+    if username:
+        steps += [
+            ('delete_messages', lambda: _delete(
+                db.messages, {'$or': [{'sender_username': username}, {'receiver_username': username}]}, batch_size)),
+            ('delete_archived_messages', lambda: _delete(
+                db[archive_name('messages')],
+                {'$or': [{'sender_username': username}, {'receiver_username': username}]}, batch_size)),
+            ('delete_reset_codes', lambda: db.password_reset_codes.delete_many({'username': username})),
+        ]
+    return steps
+
+
+STEPS = {'listing': listing_steps, 'user': user_steps}
+
+
+def run_task(db, task, batch_size=BATCH_SIZE):
+    for name, step in STEPS[task['kind']](db, task, batch_size):
+        if name in task.get('steps_done', []):
+            continue
+        step()
+        db.cascade_tasks.update_one({'_id': task['_id']}, {'$addToSet': {'steps_done': name}})
+    db.cascade_tasks.update_one(
+        {'_id': task['_id']},
+        {'$set': {'status': 'done', 'finished_at': datetime.now(timezone.utc)}}
+    )
+
+
+def retry_delay(attempts):
+    """Backoff before the next run of a task that failed `attempts` times."""
+    return timedelta(seconds=min(RETRY_SECONDS * 2 ** (attempts - 1), MAX_RETRY_SECONDS))
+
+
+def _record_failure(db, task, error):
+    attempts = task.get('attempts', 0) + 1
+    update = {'attempts': attempts, 'last_error': f"{type(error).__name__}: {error}"}
+    if attempts >= MAX_ATTEMPTS:
+        update['status'] = 'failed'
+        print(f"{JOB_NAME}: task {task['_id']} failed {attempts} times, set aside:", error)
+    else:
+        update['next_run_at'] = datetime.now(timezone.utc) + retry_delay(attempts)
+        print(f"{JOB_NAME}: task {task['_id']} failed (attempt {attempts}), retrying later:", error)
+    db.cascade_tasks.update_one({'_id': task['_id']}, {'$set': update})
+
+
+def process_cascade_tasks(db, batch_size=BATCH_SIZE):
+    """
+    Run due pending tasks oldest first, including the ones queued while draining.
+    A failing task is rescheduled (or set aside) instead of blocking the queue.
+    """
+    processed = 0
+    while True:
+        # Tasks queued before next_run_at existed have none and are always due
+        task = db.cascade_tasks.find_one(
+            {'status': 'pending', 'next_run_at': {'$not': {'$gt': datetime.now(timezone.utc)}}},
+            sort=[('created_at', 1)]
+        )
+        if not task:
+            return processed
+        try:
+            run_task(db, task, batch_size)
+        except Exception as e:
+            _record_failure(db, task, e)
+            continue
+        processed += 1
+
+
+def start_cascade_scheduler(interval_seconds=INTERVAL_SECONDS):
+    """Run the cascade worker on a background thread of the web process."""
+    return start_in_background(get_db(), JOB_NAME, process_cascade_tasks, interval_seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Clean up documents referencing deleted users and listings.')
+    parser.add_argument('--once', action='store_true', help='Drain the queue once and exit')
+    parser.add_argument('--interval', type=int, default=INTERVAL_SECONDS, help='Seconds between passes')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Documents per batch')
+    args = parser.parse_args()
+
+    def job(db):
+        processed = process_cascade_tasks(db, args.batch_size)
+        if processed:
+            print(f"{processed} cascade task(s) processed")
+
+    if args.once:
+        job(get_db())
+    else:
+        run_periodically(get_db(), JOB_NAME, job, args.interval)
+
+
+if __name__ == '__main__':
+    main()
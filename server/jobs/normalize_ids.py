@@ -0,0 +1,123 @@
+# NOTE: Migration converting string foreign keys to ObjectId
+#
+# Usage (from the server/ directory):
+#   python -m jobs.normalize_ids                    -> migrate every field
+#   python -m jobs.normalize_ids --field reviews.user_id
+#   python -m jobs.normalize_ids --dry-run          -> count documents left to convert
+#   python -m jobs.normalize_ids --reset            -> forget saved checkpoints
+#
+# The job is resumable: progress is checkpointed per field in the `migrations`
+# collection, and converted documents no longer match the string filter, so an
+# interrupted run can simply be started again. Values that are not valid
+# ObjectIds are left untouched.
+#
+# Until the migration has completed, handlers read these fields through
+# helpers.id_variants() so both representations are matched.
+
+import argparse
+from pymongo import UpdateOne
+from db import get_db, ensure_indexes
+from helpers import to_object_id
+
+BATCH_SIZE = 1000
+
+# (collection, field) pairs holding foreign keys that must be ObjectIds
+FOREIGN_KEYS = [
+    ('reviews', 'property_id'),
+    ('reviews', 'user_id'),
+    ('reviews', 'reservation_id'),
+    ('payments', 'reservation_id'),
+    ('payments', 'user_id'),
+    ('payments', 'host_id'),
+    ('payments', 'listing_id'),
+    ('reservations', 'user_id'),
+    ('reservations', 'host_id'),
+    ('reservations', 'listing_id'),
+    ('listings', 'host_id'),
+]
+
+
+def _checkpoint_id(collection, field):
+    return f"normalize_ids:{collection}.{field}"
+
+
+def normalize_field(db, collection, field, batch_size=BATCH_SIZE, dry_run=False):
+    """
+    Convert string values of `collection.field` to ObjectId in _id-ordered batches.
+
+    Returns:
+        (converted, skipped) counts for this run
+    """
+    if dry_run:
+        return db[collection].count_documents({field: {'$type': 'string'}}), 0
+
+    checkpoint_id = _checkpoint_id(collection, field)
+    checkpoint = db.migrations.find_one({'_id': checkpoint_id}) or {}
+    last_id = checkpoint.get('last_id')
+
+    converted = skipped = 0
+    while True:
+        query = {field: {'$type': 'string'}}
+        if last_id is not None:
+            query['_id'] = {'$gt': last_id}
+        batch = list(db[collection].find(query, {field: 1}).sort('_id', 1).limit(batch_size))
+        if not batch:
+            break
+
+        operations = []
+        for doc in batch:
+            value = to_object_id(doc[field])
+            if value is None:
+                skipped += 1
+                continue
+            # Guard on the old value so concurrent writers are never overwritten
+            operations.append(UpdateOne(
+                {'_id': doc['_id'], field: doc[field]},
+                {'$set': {field: value}}
+            ))
+
+        if operations:
+            result = db[collection].bulk_write(operations, ordered=False)
+            converted += result.modified_count
+
+        last_id = batch[-1]['_id']
+        db.migrations.update_one(
+            {'_id': checkpoint_id},
+            {'$set': {'last_id': last_id}},
+            upsert=True
+        )
+
+    return converted, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Normalize string foreign keys to ObjectId.')
+    parser.add_argument('--field', action='append', help='Only migrate collection.field (repeatable)')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Documents per batch')
+    parser.add_argument('--dry-run', action='store_true', help='Only count documents left to convert')
+    parser.add_argument('--reset', action='store_true', help='Delete saved checkpoints before running')
+    args = parser.parse_args()
+
+    db = get_db()
+    targets = FOREIGN_KEYS
+    if args.field:
+        targets = [(c, f) for c, f in FOREIGN_KEYS if f"{c}.{f}" in args.field]
+
+    if args.reset:
+        db.migrations.delete_many({'_id': {'$in': [_checkpoint_id(c, f) for c, f in targets]}})
+
+    for collection, field in targets:
+        converted, skipped = normalize_field(
+            db, collection, field, batch_size=args.batch_size, dry_run=args.dry_run
+        )
+        if args.dry_run:
+            print(f"{collection}.{field}: {converted} string value(s) left")
+        else:
+            print(f"{collection}.{field}: {converted} converted, {skipped} invalid value(s) skipped")
+
+    if not args.dry_run:
+        ensure_indexes()
+
+
+if __name__ == '__main__':
+    main()
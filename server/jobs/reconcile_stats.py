@@ -0,0 +1,127 @@
+# NOTE: Full recomputation of the materialized platform statistics (stats.py)
+#
+# Usage (from the server/ directory):
+#   python -m jobs.reconcile_stats             -> single pass
+#   python -m jobs.reconcile_stats --worker    -> run periodically
+#
+# Also runs on a background thread when RUN_SCHEDULER is enabled
+# (STATS_RECONCILE_INTERVAL_SECONDS in the [PROD] section of .ini).
+
+import argparse
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from bson.objectid import ObjectId
+from pymongo import ReplaceOne
+from db import get_db, config
+from stats import STATS_ID
+from archive import archive_name
+from jobs.scheduler import run_periodically, start_in_background
+
+JOB_NAME = 'reconcile_stats'
+INTERVAL_SECONDS = config.getint('PROD', 'STATS_RECONCILE_INTERVAL_SECONDS', fallback=3600)
+DAILY_WINDOW_DAYS = 90
+
+
+def _count_by(collection, field):
+    return {
+        row['_id']: row['count']
+        for row in collection.aggregate([{'$group': {'_id': f'${field}', 'count': {'$sum': 1}}}])
+        if row['_id'] is not None
+    }
+
+
+def _count_with_archive(db, name, field):
+    counts = Counter(_count_by(db[name], field))
+    counts.update(_count_by(db[archive_name(name)], field))
+    return dict(counts)
+
+
+def _daily_counts(collection, match, date_expr, group_fields):
+    """Group documents by UTC day of `date_expr`, summing `group_fields` expressions."""
+    pipeline = [
+        {'$match': match},
+        {'$group': {
+            '_id': {'$dateToString': {'format': '%Y-%m-%d', 'date': date_expr}},
+            **group_fields
+        }}
+    ]
+    return {row.pop('_id'): row for row in collection.aggregate(pipeline)}
+
+
+def reconcile_stats(db, daily_window_days=DAILY_WINDOW_DAYS):
+    now = datetime.now(timezone.utc)
+    since = now - timedelta(days=daily_window_days)
+
+    payments = next(db.payments.aggregate([
+        {'$match': {'status': 'success'}},
+        {'$group': {'_id': None, 'count': {'$sum': 1}, 'gmv': {'$sum': '$amount'}}}
+    ]), {'count': 0, 'gmv': 0})
+    reviews = next(db.reviews.aggregate([
+        {'$group': {'_id': None, 'count': {'$sum': 1}, 'rating_sum': {'$sum': '$rating'}}}
+    ]), {'count': 0, 'rating_sum': 0})
+
+    db.platform_stats.replace_one({'_id': STATS_ID}, {
+        'users_by_role': _count_by(db.users, 'role'),
+        'listings_by_status': _count_by(db.listings, 'status'),
+        'reservations_by_status': _count_with_archive(db, 'reservations', 'status'),
+        'payments': {'count': payments['count'], 'gmv': payments['gmv']},
+        'reviews': {'count': reviews['count'], 'rating_sum': reviews['rating_sum']},
+        'reconciled_at': now
+    }, upsert=True)
+
+    # Daily documents inside the window are rebuilt from the source collections
+    daily = {}
+    events = db.reservation_events.aggregate([
+        {'$match': {'created_at': {'$gte': since}}},
+        {'$group': {
+            '_id': {
+                'day': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$created_at'}},
+                'status': '$status'
+            },
+            'count': {'$sum': 1}
+        }}
+    ])
+    for row in events:
+        day = daily.setdefault(row['_id']['day'], {})
+        day.setdefault('reservations', {})[row['_id']['status']] = row['count']
+    for day, row in _daily_counts(
+        db.payments, {'status': 'success', 'created_at': {'$gte': since}}, '$created_at',
+        {'count': {'$sum': 1}, 'gmv': {'$sum': '$amount'}}
+    ).items():
+        daily.setdefault(day, {})['payments'] = row
+    for day, row in _daily_counts(
+        db.reviews, {'created_at': {'$gte': since}}, '$created_at', {'count': {'$sum': 1}}
+    ).items():
+        daily.setdefault(day, {})['reviews'] = row
+    # Users and listings have no created_at; the _id timestamp is the creation time
+    since_id = {'_id': {'$gte': ObjectId.from_datetime(since)}}
+    for day, row in _daily_counts(db.users, since_id, {'$toDate': '$_id'}, {'registered': {'$sum': 1}}).items():
+        daily.setdefault(day, {})['users'] = row
+    for day, row in _daily_counts(db.listings, since_id, {'$toDate': '$_id'}, {'created': {'$sum': 1}}).items():
+        daily.setdefault(day, {})['listings'] = row
+
+    operations = [ReplaceOne({'_id': day}, doc, upsert=True) for day, doc in daily.items()]
+    if operations:
+        db.platform_stats_daily.bulk_write(operations, ordered=False)
+
+
+def start_stats_scheduler(interval_seconds=INTERVAL_SECONDS):
+    """Run the reconciliation on a background thread of the web process."""
+    return start_in_background(get_db(), JOB_NAME, reconcile_stats, interval_seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recompute the materialized platform statistics.')
+    parser.add_argument('--worker', action='store_true', help='Keep running every --interval seconds')
+    parser.add_argument('--interval', type=int, default=INTERVAL_SECONDS, help='Seconds between passes')
+    args = parser.parse_args()
+
+    if args.worker:
+        run_periodically(get_db(), JOB_NAME, reconcile_stats, args.interval)
+    else:
+        reconcile_stats(get_db())
+        print("Platform statistics reconciled")
+
+
+if __name__ == '__main__':
+    main()
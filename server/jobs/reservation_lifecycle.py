@@ -0,0 +1,131 @@
+# NOTE: Periodic reservation status transitions
+#
+# Usage (from the server/ directory):
+#   python -m jobs.reservation_lifecycle          -> run as a worker process
+#   python -m jobs.reservation_lifecycle --once   -> run a single pass
+#
+# Or set RUN_SCHEDULER = true in the [PROD] section of .ini to run it on a
+# background thread of the web app. UNPAID_HOLD_MINUTES and
+# LIFECYCLE_INTERVAL_SECONDS in the same section configure the job.
+#
+# Transitions:
+# - upcoming/confirmed reservations whose end_date has passed -> past
+# - unpaid reservations older than the hold window -> expired (nights released)
+# Past intervals are also pruned from the listing calendars.
+
+import argparse
+from datetime import datetime, timedelta, timezone
+from bson.objectid import ObjectId
+from db import get_db, config
+from helpers import record_status_changes
+from availability import invalidate_availability
+from jobs.scheduler import run_periodically, start_in_background
+
+JOB_NAME = 'reservation_lifecycle'
+BATCH_SIZE = 1000
+UNPAID_HOLD_MINUTES = config.getint('PROD', 'UNPAID_HOLD_MINUTES', fallback=30)
+INTERVAL_SECONDS = config.getint('PROD', 'LIFECYCLE_INTERVAL_SECONDS', fallback=300)
+
+
+def _set_status_in_batches(db, query, status, batch_size=BATCH_SIZE):
+    """
+    Set `status` on every reservation matching `query` with one update_many per batch.
+
+    Returns:
+        (list of updated reservation ids, their previous statuses, set of affected listing ids)
+    """
+    updated_ids = []
+    previous = []
+    listing_ids = set()
+    while True:
+        batch = list(db.reservations.find(query, {'listing_id': 1, 'status': 1}).limit(batch_size))
+        if not batch:
+            break
+        ids = [r['_id'] for r in batch]
+        # Re-apply the query so documents changed in between are not overwritten
+        db.reservations.update_many({'_id': {'$in': ids}, **query}, {'$set': {'status': status}})
+        # and report only the ones this update changed (e.g. not a hold paid meanwhile)
+        changed = {r['_id'] for r in db.reservations.find({'_id': {'$in': ids}, 'status': status}, {'_id': 1})}
+        for reservation in batch:
+            if reservation['_id'] in changed:
+                updated_ids.append(reservation['_id'])
+                previous.append(reservation.get('status'))
+                if reservation.get('listing_id'):
+                    listing_ids.add(reservation['listing_id'])
+        if len(batch) < batch_size:
+            break
+    return updated_ids, previous, listing_ids
+
+
+def mark_past_reservations(db, today, batch_size=BATCH_SIZE):
+    query = {'status': {'$in': ['upcoming', 'confirmed']}, 'end_date': {'$lt': today}}
+    return _set_status_in_batches(db, query, 'past', batch_size)
+
+
+def expire_unpaid_reservations(db, cutoff, batch_size=BATCH_SIZE):
+    # The _id timestamp is the creation time, which also covers old documents
+    query = {'status': 'unpaid', '_id': {'$lt': ObjectId.from_datetime(cutoff)}}
+    expired_ids, previous, listing_ids = _set_status_in_batches(db, query, 'expired', batch_size)
+    for start in range(0, len(expired_ids), batch_size):
+        ids = expired_ids[start:start + batch_size]
+        db.listing_calendars.update_many(
+            {'booked.reservation_id': {'$in': ids}},
+            {'$pull': {'booked': {'reservation_id': {'$in': ids}}}}
+        )
+    return expired_ids, previous, listing_ids
+
+
+def prune_calendars(db, today):
+    """Drop intervals that ended before today; they can no longer conflict."""
+    db.listing_calendars.update_many(
+        {'booked.end_date': {'$lte': today}},
+        {'$pull': {'booked': {'end_date': {'$lte': today}}}}
+    )
+
+
+def run_lifecycle(db, unpaid_hold_minutes=UNPAID_HOLD_MINUTES, batch_size=BATCH_SIZE):
+    now = datetime.now(timezone.utc)
+    # Reservation dates are stored as naive UTC midnights
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+
+    past_ids, past_previous, past_listings = mark_past_reservations(db, today, batch_size)
+    expired_ids, expired_previous, expired_listings = expire_unpaid_reservations(
+        db, now - timedelta(minutes=unpaid_hold_minutes), batch_size
+    )
+    prune_calendars(db, today)
+
+    record_status_changes(db, past_ids, 'past', JOB_NAME, previous=past_previous)
+    record_status_changes(db, expired_ids, 'expired', JOB_NAME, reason='Unpaid hold expired', previous=expired_previous)
+
+    for listing_id in past_listings | expired_listings:
+        invalidate_availability(listing_id)
+
+    return {'past': len(past_ids), 'expired': len(expired_ids)}
+
+
+def start_lifecycle_scheduler(interval_seconds=INTERVAL_SECONDS):
+    """Run the lifecycle job on a background thread of the web process."""
+    return start_in_background(get_db(), JOB_NAME, run_lifecycle, interval_seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply reservation status transitions.')
+    parser.add_argument('--once', action='store_true', help='Run a single pass and exit')
+    parser.add_argument('--interval', type=int, default=INTERVAL_SECONDS, help='Seconds between passes')
+    parser.add_argument('--unpaid-hold-minutes', type=int, default=UNPAID_HOLD_MINUTES,
+                        help='Minutes before an unpaid reservation expires')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Reservations per update_many')
+    args = parser.parse_args()
+
+    def job(db):
+        counts = run_lifecycle(db, args.unpaid_hold_minutes, args.batch_size)
+        print(f"{counts['past']} reservation(s) marked past, {counts['expired']} unpaid hold(s) expired")
+
+    if args.once:
+        job(get_db())
+    else:
+        run_periodically(get_db(), JOB_NAME, job, args.interval)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+# NOTE: Helpers for periodic background jobs.
+#
+# A job can run inside the web process (start_in_background) or as its own
+# worker process (run_periodically). Either way it only runs while holding a
+# lease in the `job_leases` collection, so with several gunicorn workers or
+# worker processes only one of them executes the job at a time.
+#
+# JOB_LEASES TABLE
+#------------------------------
+# _id: str -> job name
+# owner: str -> host:pid:token of the current holder
+# expires_at: datetime -> lease expiry, renewed on every run by the holder
+
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from pymongo.errors import DuplicateKeyError
+
+
+class LeaseLock:
+    def __init__(self, db, name, lease_seconds=60):
+        self.db = db
+        self.name = name
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def acquire(self):
+        """Take or renew the lease. Returns False if another owner holds it."""
+        now = datetime.now(timezone.utc)
+        try:
+            self.db.job_leases.find_one_and_update(
+                {'_id': self.name, '$or': [{'expires_at': {'$lt': now}}, {'owner': self.owner}]},
+                {'$set': {'owner': self.owner, 'expires_at': now + timedelta(seconds=self.lease_seconds)}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            # The lease document exists and is held by someone else
+            return False
+
+    def release(self):
+        self.db.job_leases.update_one(
+            {'_id': self.name, 'owner': self.owner},
+            {'$set': {'expires_at': datetime.now(timezone.utc)}}
+        )
+
+
+def run_periodically(db, name, job, interval_seconds, stop_event=None):
+    """Call job(db) every interval_seconds while holding the lease `name`."""
+    lock = LeaseLock(db, name, lease_seconds=max(interval_seconds * 2, 60))
+    stop_event = stop_event or threading.Event()
+    try:
+        while not stop_event.is_set():
+            try:
+                if lock.acquire():
+                    job(db)
+            except Exception as e:
+                print(f"{name} job error:", e)
+            stop_event.wait(interval_seconds)
+    finally:
+        lock.release()
+
+
+def start_in_background(db, name, job, interval_seconds):
+    """Run a periodic job on a daemon thread of the current process."""
+    stop_event = threading.Event()
+    thread = threading.Thread(
+        target=run_periodically,
+        args=(db, name, job, interval_seconds, stop_event),
+        name=name,
+        daemon=True
+    )
+    thread.start()
+    return stop_event
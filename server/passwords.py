@@ -0,0 +1,114 @@
+# NOTE: Password hashing off the request thread.
+#
+# Key derivation is deliberately CPU-heavy; run on the request thread it holds
+# the GIL and caps the logins a worker can serve. Hashes are computed in a
+# process pool instead (created on first use, per web worker), so the request
+# thread only waits for the result. Settings in the [PROD] section of .ini:
+# - PASSWORD_HASH_METHOD: werkzeug method with its cost, e.g. scrypt:32768:8:1
+#   or pbkdf2:sha256:1000000 (omitted parameters take werkzeug's defaults).
+#   Stored hashes made with other parameters are replaced on the next
+#   successful login.
+# - PASSWORD_HASH_WORKERS: processes per web worker; 0 hashes in the request
+#   thread as before. Defaults to the cores divided among the web workers
+#   (WEB_CONCURRENCY, as read by gunicorn), or 2 if that is not set
+# - PASSWORD_HASH_MAX_PENDING: hashes queued or running per web worker; past
+#   this, requests fail fast with PasswordHashBusy (503) instead of piling up
+#
+# Throughput of the configured method: python -m jobs.benchmark_passwords
+
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+from db import config
+
+
+def _default_workers():
+    web_workers = int(os.environ.get('WEB_CONCURRENCY', 0))
+    if web_workers > 0:
+        return max(1, (os.cpu_count() or 1) // web_workers)
+    return 2
+
+
+PASSWORD_HASH_METHOD = config.get('PROD', 'PASSWORD_HASH_METHOD', fallback='scrypt:32768:8:1')
+PASSWORD_HASH_WORKERS = config.getint('PROD', 'PASSWORD_HASH_WORKERS', fallback=_default_workers())
+PASSWORD_HASH_MAX_PENDING = config.getint('PROD', 'PASSWORD_HASH_MAX_PENDING',
+                                          fallback=4 * max(PASSWORD_HASH_WORKERS, 1))
+# Seconds clients are asked to wait when the pool is saturated
+RETRY_AFTER_SECONDS = 1
+
+
+class PasswordHashBusy(Exception):
+    """Too many password hashes pending in this worker."""
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(PASSWORD_HASH_MAX_PENDING)
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a threaded web worker can copy held locks (e.g. pymongo's)
+            _pool = ProcessPoolExecutor(PASSWORD_HASH_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _run(function, *args):
+    if PASSWORD_HASH_WORKERS <= 0:
+        return function(*args)
+    if not _pending.acquire(blocking=False):
+        raise PasswordHashBusy()
+    try:
+        return _get_pool().submit(function, *args).result()
+    finally:
+        _pending.release()
+
+
+def hash_password(password, method=None):
+    return _run(generate_password_hash, password, method or PASSWORD_HASH_METHOD)
+
+
+def verify_password(password_hash, password):
+    if not password_hash:
+        return False
+    return _run(check_password_hash, password_hash, password)
+
+
+def hash_parameters(method):
+    """
+    (name, parameters...) of a werkzeug method string such as "scrypt:32768:8:1",
+    with omitted parameters filled in the way werkzeug fills them.
+    """
+    name, *args = [part.strip() for part in method.strip().split(':')]
+    name = name.lower()
+    try:
+        if name == 'scrypt':
+            n, r, p = map(int, args) if args else (2 ** 15, 8, 1)
+            return (name, n, r, p)
+        if name == 'pbkdf2':
+            hash_name = args[0].lower() if args else 'sha256'
+            iterations = int(args[1]) if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS
+            return (name, hash_name, iterations)
+    except ValueError:
+        pass
+    return (name, *args)
+
+
+_CONFIGURED_PARAMETERS = hash_parameters(PASSWORD_HASH_METHOD)
+
+
+def needs_rehash(password_hash):
+    """True if `password_hash` was made with other parameters than PASSWORD_HASH_METHOD."""
+    return hash_parameters(password_hash.split('$', 1)[0]) != _CONFIGURED_PARAMETERS
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
@@ -0,0 +1,206 @@
+# NOTE: Publish/subscribe hub used to push events to open client streams (SSE).
+#
+# Route handlers publish to a channel (e.g. "user:<username>") and every stream
+# subscribed to that channel receives the event, whichever worker it runs on.
+# The transport between workers is pluggable (PUBSUB_BACKEND in the [PROD]
+# section of .ini):
+# - local: in-process only; enough for a single worker or development
+# - mongo: events go through a capped collection that every worker tails, so
+#          several gunicorn workers or hosts share one hub without a new broker
+#
+# Every open stream holds a worker thread (or greenlet) for as long as the
+# client stays connected. Run gunicorn with a threaded or async worker class
+# (gthread with more threads than PUBSUB_MAX_STREAMS, or gevent); with the
+# default sync worker one stream blocks the whole worker.
+# PUBSUB_MAX_STREAMS caps the open streams per web worker so they cannot take
+# every thread; past it, new streams are refused with TooManyStreams (503) and
+# clients retry later. 0 disables the cap (e.g. with gevent).
+#
+# PUBSUB_EVENTS TABLE (capped)
+#------------------------------
+# _id: ObjectId -> event identity; ids from different workers are not in
+#      insertion order, so tailing resumes from the natural order instead
+# channel: str
+# event: dict -> {id, type, data} as published
+
+import queue
+import threading
+import time
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid, PyMongoError
+from db import get_db, config
+
+SUBSCRIPTION_QUEUE_SIZE = 100
+CAPPED_COLLECTION_BYTES = 16 * 1024 * 1024
+PUBSUB_MAX_STREAMS = config.getint('PROD', 'PUBSUB_MAX_STREAMS', fallback=24)
+# Seconds clients are asked to wait when every stream slot is taken
+RETRY_AFTER_SECONDS = 30
+
+
+class TooManyStreams(Exception):
+    """Too many open streams in this worker."""
+
+
+class Subscription:
+    """Events of one channel for one open stream."""
+
+    def __init__(self, hub, channel):
+        self.hub = hub
+        self.channel = channel
+        self.queue = queue.Queue(maxsize=SUBSCRIPTION_QUEUE_SIZE)
+        # Set when the client fell too far behind; the stream should end so the
+        # client reconnects and catches up from the database
+        self.overflowed = False
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        """Next event, or None if nothing arrived within `timeout` seconds."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class LocalBackend:
+    """Delivers events to subscribers of the current process only."""
+
+    def start(self, dispatch):
+        self.dispatch = dispatch
+
+    def publish(self, channel, event):
+        self.dispatch(channel, event)
+
+
+class MongoBackend:
+    """Shares events between processes through a tailable cursor on a capped collection."""
+
+    def __init__(self, db, collection='pubsub_events', size_bytes=CAPPED_COLLECTION_BYTES):
+        self.db = db
+        self.name = collection
+        self.size_bytes = size_bytes
+
+    def start(self, dispatch):
+        self.dispatch = dispatch
+        try:
+            self.db.create_collection(self.name, capped=True, size=self.size_bytes)
+        except CollectionInvalid:
+            pass  # Created by another worker
+        self.collection = self.db[self.name]
+        thread = threading.Thread(target=self._tail, name='pubsub-tail', daemon=True)
+        thread.start()
+
+    def publish(self, channel, event):
+        self.collection.insert_one({'channel': channel, 'event': event})
+
+    def _tail(self):
+        # Only events published after this worker started are delivered
+        last = next(self.collection.find({}, {'_id': 1}).sort('$natural', -1).limit(1), None)
+        last_id = last['_id'] if last else None
+        while True:
+            try:
+                last_id = self._tail_after(last_id)
+            except PyMongoError as e:
+                print("Pub/sub tail error:", e)
+            # The cursor dies when the collection is empty or after an error
+            time.sleep(1)
+
+    def _tail_after(self, last_id):
+        """
+        Dispatch the events after `last_id` in natural (insertion) order until
+        the cursor dies; returns the id of the last event dispatched.
+
+        A tail starts at the oldest event and skips up to `last_id`. When the
+        existing events run out without reaching it, it was overwritten, so
+        every event skipped so far is newer and gets dispatched.
+        """
+        skipped = [] if last_id else None
+        cursor = self.collection.find({}, cursor_type=CursorType.TAILABLE_AWAIT)
+        while cursor.alive:
+            for doc in cursor:
+                if skipped is not None:
+                    if doc['_id'] == last_id:
+                        skipped = None
+                    else:
+                        skipped.append(doc['_id'])
+                    continue
+                last_id = doc['_id']
+                self.dispatch(doc['channel'], doc['event'])
+            if skipped is not None:
+                # Caught up without meeting `last_id`
+                for doc in self.collection.find({'_id': {'$in': skipped}}).sort('$natural', 1):
+                    last_id = doc['_id']
+                    self.dispatch(doc['channel'], doc['event'])
+                skipped = None
+        return last_id
+
+
+class PubSubHub:
+    def __init__(self, backend, max_subscriptions=0):
+        self.backend = backend
+        self.max_subscriptions = max_subscriptions
+        self.subscriptions = {}
+        self.count = 0
+        self.lock = threading.Lock()
+        self.started = False
+
+    def _ensure_started(self):
+        with self.lock:
+            if not self.started:
+                self.backend.start(self._dispatch)
+                self.started = True
+
+    def subscribe(self, channel):
+        self._ensure_started()
+        subscription = Subscription(self, channel)
+        with self.lock:
+            if self.max_subscriptions and self.count >= self.max_subscriptions:
+                raise TooManyStreams()
+            self.subscriptions.setdefault(channel, set()).add(subscription)
+            self.count += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            channel_subscriptions = self.subscriptions.get(subscription.channel)
+            if channel_subscriptions and subscription in channel_subscriptions:
+                channel_subscriptions.discard(subscription)
+                self.count -= 1
+                if not channel_subscriptions:
+                    del self.subscriptions[subscription.channel]
+
+    def publish(self, channel, event_type, data, event_id=None):
+        """
+        Publish an event to every subscriber of `channel`.
+        `data` must be a JSON string; `event_id` lets clients resume after it.
+        """
+        self._ensure_started()
+        self.backend.publish(channel, {'id': event_id, 'type': event_type, 'data': data})
+
+    def _dispatch(self, channel, event):
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.put(event)
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_hub():
+    """The process-wide hub, built from PUBSUB_BACKEND on first use."""
+    global _hub
+    with _hub_lock:
+        if _hub is None:
+            backend_name = config.get('PROD', 'PUBSUB_BACKEND', fallback='local')
+            backend = MongoBackend(get_db()) if backend_name == 'mongo' else LocalBackend()
+            _hub = PubSubHub(backend, max_subscriptions=PUBSUB_MAX_STREAMS)
+        return _hub
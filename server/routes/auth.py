@@ -1,12 +1,20 @@
 from flask import Blueprint, request, jsonify
 from db import get_db
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_jwt_extended import create_access_token
 from validations import register_validations, login_validations, password_change_validations
 from helpers import check_validation
+from stats import increment_stats
+from identity import identity_claims, effective_role
+from passwords import hash_password, verify_password, needs_rehash, PasswordHashBusy, RETRY_AFTER_SECONDS
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
+@auth_bp.errorhandler(PasswordHashBusy)
+def password_hash_busy(error):
+    response = jsonify({'error': 'Too many requests, please try again'})
+    response.headers['Retry-After'] = str(RETRY_AFTER_SECONDS)
+    return response, 503
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     db = get_db()
@@ -25,8 +33,9 @@ def register():
     if db.users.find_one({'username': username}):
         return jsonify({'error': 'Username already exists'}), 400
     
-    hashed_password = generate_password_hash(password)
+    hashed_password = hash_password(password)
     db.users.insert_one({'name': name, 'email': email, 'username': username, 'password': hashed_password, 'role': "user", 'reservations': []})
+    increment_stats(db, {'users_by_role.user': 1}, {'users.registered': 1})
     return jsonify({'message': 'User registered successfully'}), 201
 
 @auth_bp.route('/login', methods=['POST'])
@@ -41,11 +50,19 @@ def login():
     password = data.get('password')
 
     user = db.users.find_one({'username': username})
-    if user and check_password_hash(user['password'], password):
-        access_token = create_access_token(identity=username) # NOTE: identity is selected as username. 
+    if user and verify_password(user.get('password'), password):
+        if needs_rehash(user['password']):
+            # Hashed with older parameters; skipped if the password changed meanwhile
+            try:
+                db.users.update_one({'_id': user['_id'], 'password': user['password']},
+                                    {'$set': {'password': hash_password(password)}})
+            except PasswordHashBusy:
+                pass  # The password is verified; rehash on a later login
+        # NOTE: identity is selected as username; id and role travel as claims (see identity.py)
+        access_token = create_access_token(identity=username, additional_claims=identity_claims(user))
         user_id_str =   str(user['_id'])
 
-        return jsonify(access_token=access_token, user_id=user_id_str, role=user.get('role', 'user')), 200
+        return jsonify(access_token=access_token, user_id=user_id_str, role=effective_role(user)), 200
     else:
         return jsonify({'error': 'Invalid username or password'}), 401
 
@@ -133,7 +150,7 @@ def reset_password():
         return jsonify({'error': 'User not found'}), 404
     
     # Update password
-    new_hashed_password = generate_password_hash(new_password)
+    new_hashed_password = hash_password(new_password)
     db.users.update_one(
         {'username': username},
         {'$set': {'password': new_hashed_password}}
@@ -161,14 +178,14 @@ def change_password():
         return jsonify({'error': 'User not found'}), 404
     
     # Verify current password
-    if not check_password_hash(user['password'], old_password):
+    if not verify_password(user.get('password'), old_password):
         return jsonify({'error': 'Current password is incorrect'}), 401
     
     # Check if new password is different from old password
     if old_password == new_password:
         return jsonify({'error': 'New password must be different from current password'}), 400
     
-    new_hashed_password = generate_password_hash(new_password)
+    new_hashed_password = hash_password(new_password)
     db.users.update_one({'username': username}, {'$set': {'password': new_hashed_password}})
     return jsonify({'message': 'Password changed successfully'}), 200
 
@@ -1,8 +1,14 @@
 from flask import Blueprint, request, jsonify, Response
 from db import get_db
 from bson import json_util
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from datetime import datetime, timezone
+from helpers import serialize_message
+from inbox import ensure_conversation, serialize_inbox_entry
+from sync import record_changes
+from contacts import can_message
+from identity import get_current_identity, get_current_user
+from routes.messages import _get_message_page_params, _message_page_response
 
 conversations_bp = Blueprint('conversations', __name__, url_prefix='/api/conversations')
 
@@ -10,57 +16,20 @@ conversations_bp = Blueprint('conversations', __name__, url_prefix='/api/convers
 @jwt_required()
 def get_my_conversations():
     """
-    Get all conversations for the current user with user details and last message.
-    Returns list of conversations with other user's info.
+    Get all conversations for the current user with the other user's info,
+    the last message and the unread count, most recent first.
+    Served from the denormalized summaries (see inbox.py) with one indexed query.
     """
     db = get_db()
-    current_user = db.users.find_one({"username": get_jwt_identity()})
+    current_user = get_current_identity(db)
     if not current_user:
         return jsonify({"error": "User not found"}), 404
     
-    # Find all conversations where user is sender or receiver
-    conversations = list(db.conversations.find({
-        "$or": [
-            {"sender_id": current_user["_id"]},
-            {"receiver_id": current_user["_id"]}
-        ]
-    }))
-    
-    # Enrich with user details and last message
-    result = []
-    for conv in conversations:
-        # Determine the other user
-        other_user_id = conv["receiver_id"] if conv["sender_id"] == current_user["_id"] else conv["sender_id"]
-        other_user = db.users.find_one({"_id": other_user_id})
-        
-        if not other_user:
-            continue
-        
-        # Get last message (using the DM conversation_id format from messages)
-        # Since messages use username-based conversation_id, we need to construct it
-        from routes.messages import _dm_conversation_id
-        conversation_id = _dm_conversation_id(current_user["username"], other_user["username"])
-        last_message = db.messages.find_one(
-            {"conversation_id": conversation_id},
-            sort=[("created_at", -1)]
-        )
-        
-        result.append({
-            "conversation_id": str(conv["_id"]),
-            "username": other_user["username"],
-            "name": other_user.get("name", other_user["username"]),
-            "last_message": {
-                "content": last_message["content"] if last_message else None,
-                "created_at": last_message["created_at"] if last_message else None,
-                "sender_username": last_message["sender_username"] if last_message else None
-            } if last_message else None
-        })
-    
-    # Sort by last message time
-    result.sort(
-        key=lambda x: x["last_message"]["created_at"] if x["last_message"] else "",
-        reverse=True
-    )
+    conversations = db.conversations.find(
+        {"participant_ids": current_user["_id"]},
+        {"participants": 1, "last_message": 1, "unread": 1}
+    ).sort("last_message_at", -1)
+    result = [serialize_inbox_entry(conv, current_user["_id"]) for conv in conversations]
     
     return Response(json_util.dumps(result), mimetype="application/json")
 
@@ -82,7 +51,7 @@ def create_conversation():
         return jsonify({"error": "receiver_username is required"}), 400
     
     # Get current user
-    current_user = db.users.find_one({"username": get_jwt_identity()})
+    current_user = get_current_user(db)
     if not current_user:
         return jsonify({"error": "Current user not found"}), 404
     
@@ -96,14 +65,7 @@ def create_conversation():
         return jsonify({"error": "Cannot create conversation with yourself"}), 400
     
     # Validate reservation relationship
-    has_relationship = db.reservations.find_one({
-        "$or": [
-            {"user_id": current_user["_id"], "host_id": receiver_user["_id"]},
-            {"user_id": receiver_user["_id"], "host_id": current_user["_id"]}
-        ]
-    })
-    
-    if not has_relationship:
+    if not can_message(db, current_user["_id"], receiver_user["_id"]):
         return jsonify({
             "error": "You can only create conversations with hosts of your reservations or guests of your listings"
         }), 403
@@ -117,19 +79,13 @@ def create_conversation():
     })
     
     if existing_conversation:
-        return Response(json_util.dumps(existing_conversation), mimetype="application/json"), 200
+        return Response(json_util.dumps(serialize_message(existing_conversation)), mimetype="application/json"), 200
     
     # Create new conversation
-    conversation_doc = {
-        "sender_id": current_user["_id"],
-        "receiver_id": receiver_user["_id"],
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
-    
-    result = db.conversations.insert_one(conversation_doc)
-    conversation_doc["_id"] = result.inserted_id
+    conversation_doc = ensure_conversation(db, current_user, receiver_user)
+    record_changes(db, [current_user["username"], receiver_username], conversation_id=conversation_doc["_id"])
     
-    return Response(json_util.dumps(conversation_doc), mimetype="application/json"), 201
+    return Response(json_util.dumps(serialize_message(conversation_doc)), mimetype="application/json"), 201
 
 @conversations_bp.route('/<conversation_id>', methods=['GET'])
 @jwt_required()
@@ -138,7 +94,7 @@ def get_conversation(conversation_id):
     conversation = db.conversations.find_one({"_id": conversation_id})
     if not conversation:
         return jsonify({"error": "Conversation not found"}), 404
-    return Response(json_util.dumps(conversation), mimetype="application/json")
+    return Response(json_util.dumps(serialize_message(conversation)), mimetype="application/json")
 
 @conversations_bp.route('/<conversation_id>', methods=['DELETE'])
 @jwt_required()
@@ -153,9 +109,12 @@ def delete_conversation(conversation_id):
 @conversations_bp.route('/messages/<conversation_id>', methods=['GET'])
 @jwt_required()
 def get_conversation_messages(conversation_id):
+    """Query params: limit, before, after (see routes.messages._get_message_page_params)."""
     db = get_db()
-    messages = db.messages.find({"conversation_id": conversation_id})
-    return Response(json_util.dumps(messages), mimetype="application/json")
+    params = _get_message_page_params(request.args)
+    if not params:
+        return jsonify({"error": "Invalid pagination parameters"}), 400
+    return _message_page_response(db, {"conversation_id": conversation_id}, params)
 
 @conversations_bp.route('/messages/<conversation_id>', methods=['POST'])
 @jwt_required()
@@ -165,7 +124,7 @@ def create_conversation_message(conversation_id):
     if not conversation:
         return jsonify({"error": "Conversation not found"}), 404
     
-    user = db.users.find_one({"username": get_jwt_identity()})
+    user = get_current_identity(db)
     if not user:
         return jsonify({"error": "User not found"}), 404
     
@@ -174,7 +133,7 @@ def create_conversation_message(conversation_id):
         "sender_id": user["_id"],
         "receiver_id": conversation["receiver_id"],
         "content": request.json["content"],
-        "created_at": datetime.now(timezone.utc).isoformat(),
+        "created_at": datetime.now(timezone.utc),
     })
     return jsonify({"message": "Message created"}), 201
 
@@ -186,7 +145,7 @@ def update_conversation_message(message_id):
     if not message:
         return jsonify({"error": "Conversation not found"}), 404
     
-    user = db.users.find_one({"username": get_jwt_identity()})
+    user = get_current_identity(db)
     if not user:
         return jsonify({"error": "User not found"}), 404
     
@@ -202,7 +161,7 @@ def delete_conversation_message(message_id):
     if not message:
         return jsonify({"error": "Conversation not found"}), 404
     
-    user = db.users.find_one({"username": get_jwt_identity()})
+    user = get_current_identity(db)
     if not user:
         return jsonify({"error": "User not found"}), 404
     
@@ -0,0 +1,63 @@
+from flask import Blueprint, request, jsonify, Response
+from db import get_db
+from bson import json_util
+from flask_jwt_extended import jwt_required
+from datetime import datetime, timedelta
+from helpers import to_object_id, parse_date
+from analytics import compute_host_analytics, GRANULARITIES
+from identity import get_current_identity
+
+hosts_bp = Blueprint('hosts', __name__, url_prefix='/api/hosts')
+
+DEFAULT_ANALYTICS_DAYS = 30
+MAX_ANALYTICS_DAYS = 2 * 366
+
+# NOTE: THESE ROUTES REQUIRE HOST (OWNER) OR ADMIN PRIVILEGES
+@hosts_bp.route('/<host_id>/analytics', methods=['GET'])
+@jwt_required()
+def get_host_analytics(host_id):
+    """
+    Occupancy rate, ADR and revenue per listing of a host.
+    Query params: from, to (YYYY-MM-DD, defaults to the last 30 days),
+    granularity (day, week or month, defaults to day).
+    """
+    db = get_db()
+    
+    _id = to_object_id(host_id)
+    if not _id:
+        return jsonify({'error': 'Invalid host ID'}), 400
+    
+    current_user = get_current_identity(db)
+    if not current_user:
+        return jsonify({'error': 'User not found'}), 404
+    if current_user['_id'] != _id and current_user.get('role') != 'admin':
+        return jsonify({'error': 'You can only view your own analytics'}), 403
+    
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in GRANULARITIES:
+        return jsonify({'error': f'granularity must be one of {GRANULARITIES}'}), 400
+    
+    from_param = request.args.get('from')
+    to_param = request.args.get('to')
+    
+    tomorrow = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    to_date = parse_date(to_param) if to_param else tomorrow
+    if not to_date:
+        return jsonify({'error': 'Invalid to date'}), 400
+    from_date = parse_date(from_param) if from_param else to_date - timedelta(days=DEFAULT_ANALYTICS_DAYS)
+    if not from_date or from_date >= to_date:
+        return jsonify({'error': 'Invalid from date'}), 400
+    if (to_date - from_date).days > MAX_ANALYTICS_DAYS:
+        return jsonify({'error': f'Date range cannot exceed {MAX_ANALYTICS_DAYS} days'}), 400
+    
+    analytics = compute_host_analytics(db, _id, from_date, to_date, granularity)
+    
+    return Response(
+        json_util.dumps({
+            'host_id': host_id,
+            'from': from_date.strftime('%Y-%m-%d'),
+            'to': to_date.strftime('%Y-%m-%d'),
+            **analytics
+        }),
+        mimetype="application/json"
+    )
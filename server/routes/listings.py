@@ -1,12 +1,20 @@
 # NOTE: CRUD routes for Listings
 
-from flask import Flask, jsonify, Response, Blueprint, request
+from flask import Flask, jsonify, Response, Blueprint, request, stream_with_context
+from collections import Counter
 from flask_jwt_extended import jwt_required
-from flask_jwt_extended import get_jwt_identity
 from bson import json_util
 from bson.objectid import ObjectId
+from bson.errors import BSONError
+from pymongo import UpdateMany
+from pymongo.errors import BulkWriteError
 from db import get_db
-from helpers import check_validation, to_object_id, is_host, is_admin
+from helpers import check_validation, first_invalid_field, to_object_id, is_host, is_admin, parse_date, get_keyset_params, keyset_page
+from availability import get_booked_ranges
+from stats import increment_stats, status_transition
+from cascade import enqueue_cascade
+from identity import get_current_identity, invalidate_identity
+from datetime import datetime, timedelta
 from validations import listings_validations, update_listing_validations
 
 # LISTINGS TABLE
@@ -21,9 +29,20 @@ from validations import listings_validations, update_listing_validations
 # naerby: list of str
 # details: dict (e.g., {"bedrooms": 2, "bathrooms": 1, "max_guests": 4})
 # photos: list of str (URLs or file paths to photos)
+# status: str -> "pending", "approved" or "declined"
+# moderation_batch: ObjectId -> the moderate_listings request that last set the status
 
 listings_bp = Blueprint("listings", __name__, url_prefix="/api/listings")
 
+# Moderation decisions and the listing status they set
+MODERATION_DECISIONS = {"approve": "approved", "reject": "declined"}
+MAX_MODERATION_BATCH = 1000
+
+# NDJSON import/export
+IMPORT_CHUNK_SIZE = 1000
+MAX_REPORTED_IMPORT_ERRORS = 1000
+EXPORT_BATCH_SIZE = 1000
+
 
 def transform_listing_for_frontend(listing):
     """
@@ -99,6 +118,45 @@ def get_listing_detail(listing_id):
     else:
         return jsonify({"error": "Listing not found"}), 404
 
+# Availability window limits for the calendar endpoint
+DEFAULT_AVAILABILITY_DAYS = 365
+MAX_AVAILABILITY_DAYS = 3 * 365
+
+# Get booked date ranges for a listing (public endpoint)
+@listings_bp.route("/<listing_id>/availability", methods=["GET"])
+def get_listing_availability(listing_id):
+    """
+    Return merged booked intervals for the date picker.
+    Query params: from, to (YYYY-MM-DD). Defaults to the next 365 days.
+    Each interval's end_date is the checkout day, which stays bookable.
+    """
+    db = get_db()
+    
+    _id = to_object_id(listing_id)
+    if not _id:
+        return jsonify({"error": "Invalid listing ID"}), 400
+    
+    from_param = request.args.get("from")
+    to_param = request.args.get("to")
+    
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    from_date = parse_date(from_param) if from_param else today
+    if not from_date:
+        return jsonify({"error": "Invalid from date"}), 400
+    to_date = parse_date(to_param) if to_param else from_date + timedelta(days=DEFAULT_AVAILABILITY_DAYS)
+    if not to_date or to_date < from_date:
+        return jsonify({"error": "Invalid to date"}), 400
+    if (to_date - from_date).days > MAX_AVAILABILITY_DAYS:
+        return jsonify({"error": f"Date range cannot exceed {MAX_AVAILABILITY_DAYS} days"}), 400
+    
+    booked = get_booked_ranges(db, _id, from_date, to_date)
+    return jsonify({
+        "listing_id": listing_id,
+        "from": from_date.strftime("%Y-%m-%d"),
+        "to": to_date.strftime("%Y-%m-%d"),
+        "booked": booked
+    }), 200
+
 # Get host username for a listing (public endpoint)
 @listings_bp.route("/<listing_id>/host/username", methods=["GET"])
 def get_listing_host_username(listing_id):
@@ -175,20 +233,128 @@ def get_listing_host(listing_id):
 
 # NOTE : THESE ROUTES REQUIRE ADMIN PRIVILEGES
 @listings_bp.route("/admin/pending", methods=["GET"])
+@jwt_required()
 def get_pending_listings():
+    """
+    Moderation queue, oldest submissions first.
+    Query params: order (asc or desc), limit, cursor.
+    """
     db = get_db()
     
-    # Fetch all pending listings
-    listings = list(db.listings.find({"status": "pending"}))
+    if not is_admin(db):
+        return jsonify({"error": "Admin privileges required"}), 403
+    
+    params = get_keyset_params(request.args, {"created": "_id"}, "created", default_order="asc", default_limit=50)
+    if not params:
+        return jsonify({"error": "Invalid pagination parameters"}), 400
+    
+    listings, next_cursor = keyset_page(db.listings, {"status": "pending"}, params)
     return Response(
-        json_util.dumps(listings),
+        json_util.dumps({"listings": listings, "next_cursor": next_cursor}),
         mimetype="application/json"
     )
 
+@listings_bp.route("/admin/moderate", methods=["POST"])
+@jwt_required()
+def moderate_listings():
+    """
+    Apply a batch of moderation decisions with one bulk write.
+    Expected payload:
+    {
+        "decisions": [{"listing_id": "...", "decision": "approve" | "reject"}, ...]
+    }
+    Only pending listings are moderated. Returns one result per decision, in
+    order: approved, declined, unchanged, already_moderated (not pending
+    anymore), not_found, duplicate or invalid.
+    """
+    db = get_db()
+    
+    if not is_admin(db):
+        return jsonify({"error": "Admin privileges required"}), 403
+    
+    data = request.json or {}
+    decisions = data.get("decisions")
+    if not isinstance(decisions, list) or not decisions:
+        return jsonify({"error": "decisions must be a non-empty list"}), 400
+    if len(decisions) > MAX_MODERATION_BATCH:
+        return jsonify({"error": f"At most {MAX_MODERATION_BATCH} decisions per request"}), 400
+    
+    # Validate every item first; one bad entry does not fail the batch
+    results = []
+    targets = {}
+    for item in decisions:
+        listing_id = item.get("listing_id") if isinstance(item, dict) else None
+        status = MODERATION_DECISIONS.get(item.get("decision")) if isinstance(item, dict) else None
+        _id = to_object_id(listing_id)
+        if not _id or not status:
+            results.append({"listing_id": listing_id, "result": "invalid"})
+        elif _id in targets:
+            results.append({"listing_id": listing_id, "result": "duplicate"})
+        else:
+            targets[_id] = status
+            results.append({"listing_id": listing_id, "result": None, "_id": _id})
+    
+    # One round-trip for the current statuses, one unordered bulk write
+    current = {
+        listing["_id"]: listing.get("status")
+        for listing in db.listings.find({"_id": {"$in": list(targets)}}, {"status": 1})
+    }
+    by_status = {}
+    for _id, status in targets.items():
+        if current.get(_id) == "pending":
+            by_status.setdefault(status, []).append(_id)
+    attempted = [_id for ids in by_status.values() for _id in ids]
+    
+    # The pending guard keeps a stale request from overriding another admin's
+    # decision; the batch id tells which listings this request changed
+    batch_id = ObjectId()
+    modified = 0
+    if by_status:
+        modified = db.listings.bulk_write([
+            UpdateMany(
+                {"_id": {"$in": ids}, "status": "pending"},
+                {"$set": {"status": status, "moderation_batch": batch_id}}
+            )
+            for status, ids in by_status.items()
+        ], ordered=False).modified_count
+    if modified == len(attempted):
+        changed = set(attempted)
+    else:
+        changed = {
+            listing["_id"]
+            for listing in db.listings.find({"_id": {"$in": attempted}, "moderation_batch": batch_id}, {"_id": 1})
+        }
+    
+    transitions = Counter()
+    for status, count in Counter(targets[_id] for _id in changed).items():
+        transitions.update(status_transition("listings_by_status", status, "pending", count=count))
+    if transitions:
+        increment_stats(db, dict(transitions))
+    
+    for result in results:
+        _id = result.pop("_id", None)
+        if not _id:
+            continue
+        if _id not in current:
+            result["result"] = "not_found"
+        elif current[_id] == targets[_id]:
+            result["result"] = "unchanged"
+        elif _id in changed:
+            result["result"] = targets[_id]
+        else:
+            # Not pending anymore, before the read or between the read and the write
+            result["result"] = "already_moderated"
+    
+    return jsonify({"results": results, "modified": len(changed)})
+
 @listings_bp.route("/admin/approve-listing", methods=["POST"])
+@jwt_required()
 def approve_listing():
     db = get_db()
     
+    if not is_admin(db):
+        return jsonify({"error": "Admin privileges required"}), 403
+    
     # Get data from request
     data = request.json
     if not data or 'listing_id' not in data:
@@ -200,20 +366,26 @@ def approve_listing():
         return jsonify({"error": "Invalid listing ID"}), 400
     
     # Approving the listing
-    result = db.listings.update_one(
+    listing = db.listings.find_one_and_update(
         {"_id": _id},
-        {"$set": {"status": "approved"}}
+        {"$set": {"status": "approved"}},
+        projection={"status": 1}
     )
-    if result.modified_count:
+    if listing and listing.get("status") != "approved":
+        increment_stats(db, status_transition("listings_by_status", "approved", listing.get("status")))
         return jsonify({"message": "Listing approved"})
     else:
         return jsonify({"error": "Listing not found"}), 404
 
 
 @listings_bp.route("/admin/reject-listing", methods=["POST"])
+@jwt_required()
 def reject_listing():
     db = get_db()
     
+    if not is_admin(db):
+        return jsonify({"error": "Admin privileges required"}), 403
+    
     # Get data from request
     data = request.json
     if not data or 'listing_id' not in data:
@@ -225,11 +397,13 @@ def reject_listing():
         return jsonify({"error": "Invalid listing ID"}), 400
     
     # Rejecting the listing
-    result = db.listings.update_one(
+    listing = db.listings.find_one_and_update(
         {"_id": _id},
-        {"$set": {"status": "declined"}}
+        {"$set": {"status": "declined"}},
+        projection={"status": 1}
     )
-    if result.modified_count:
+    if listing and listing.get("status") != "declined":
+        increment_stats(db, status_transition("listings_by_status", "declined", listing.get("status")))
         return jsonify({"message": "Listing rejected"})
     else:
         return jsonify({"error": "Listing not found"}), 404
@@ -241,8 +415,7 @@ def reject_listing():
 def create_listing():
     db = get_db()
     
-    current_user = get_jwt_identity()
-    user = db.users.find_one({"username": current_user})
+    user = get_current_identity(db)
     
     if not user:
         return jsonify({"error": "User not found"}), 404
@@ -251,8 +424,10 @@ def create_listing():
     if user.get('role') != 'host':
         db.users.update_one(
             {"_id": user['_id']},
-            {"$set": {"role": "host"}}
+            {"$set": {"role": "host"}, "$inc": {"role_version": 1}}
         )
+        invalidate_identity(user['username'])
+        increment_stats(db, status_transition('users_by_role', 'host', user.get('role')))
     
     # Get data from request
     data = request.json
@@ -272,8 +447,123 @@ def create_listing():
     data['city'] = data['city'].lower()
     # Inserting the new listing into the database
     result = db.listings.insert_one(data)
+    increment_stats(db, {'listings_by_status.pending': 1}, {'listings.created': 1})
     return jsonify({"_id": str(result.inserted_id)}), 201
 
+@listings_bp.route("/bulk", methods=["POST"])
+@jwt_required()
+def bulk_import_listings():
+    """
+    Import listings from an NDJSON body (one listing object per line).
+    Lines are validated like POST /api/listings/ and inserted in unordered
+    chunks of IMPORT_CHUNK_SIZE; the body is read as a stream, so memory use
+    does not grow with the size of the import.
+    Returns the number of inserted listings and per-line errors (1-based line numbers).
+    """
+    db = get_db()
+    
+    user = get_current_identity(db)
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+    
+    inserted = 0
+    error_count = 0
+    errors = []
+    chunk = []
+    
+    def report(line_number, error):
+        nonlocal error_count
+        error_count += 1
+        if len(errors) < MAX_REPORTED_IMPORT_ERRORS:
+            errors.append({"line": line_number, "error": error})
+    
+    def flush():
+        nonlocal inserted
+        try:
+            inserted += len(db.listings.insert_many([doc for _, doc in chunk], ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            inserted += e.details.get("nInserted", 0)
+            for write_error in e.details.get("writeErrors", []):
+                report(chunk[write_error["index"]][0], write_error.get("errmsg", "Write failed"))
+        chunk.clear()
+    
+    for line_number, line in enumerate(request.stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            data = json_util.loads(line)
+        except (ValueError, TypeError, ArithmeticError, BSONError):
+            # Malformed JSON, or Extended JSON values such as {"$oid": "x"} or {"$date": [1]}
+            report(line_number, "Invalid JSON")
+            continue
+        if not isinstance(data, dict):
+            report(line_number, "Expected a JSON object")
+            continue
+        
+        # Same rules as create_listing; exported _id values are not reused
+        data.pop("_id", None)
+        data["host_id"] = user["_id"]
+        data["status"] = "pending"
+        field = first_invalid_field(data, listings_validations)
+        if field:
+            report(line_number, f"Invalid {field}")
+            continue
+        data["city"] = data["city"].lower()
+        
+        chunk.append((line_number, data))
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            flush()
+    if chunk:
+        flush()
+    
+    if inserted:
+        if user.get("role") == "user":
+            db.users.update_one({"_id": user["_id"]}, {"$set": {"role": "host"}, "$inc": {"role_version": 1}})
+            invalidate_identity(user["username"])
+            increment_stats(db, status_transition("users_by_role", "host", "user"))
+        increment_stats(db, {"listings_by_status.pending": inserted}, {"listings.created": inserted})
+    
+    return jsonify({"inserted": inserted, "error_count": error_count, "errors": errors}), 201 if inserted else 400
+
+@listings_bp.route("/export", methods=["GET"])
+@jwt_required()
+def export_listings():
+    """
+    Stream listings as NDJSON (MongoDB extended JSON, one listing per line).
+    Admins export every listing (optional host_id and status filters);
+    other users export their own listings.
+    """
+    db = get_db()
+    
+    user = get_current_identity(db)
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+    
+    query = {}
+    if user.get("role") == "admin":
+        if request.args.get("host_id"):
+            host_id = to_object_id(request.args["host_id"])
+            if not host_id:
+                return jsonify({"error": "Invalid host ID"}), 400
+            query["host_id"] = host_id
+    else:
+        query["host_id"] = user["_id"]
+    if request.args.get("status"):
+        query["status"] = request.args["status"]
+    
+    cursor = db.listings.find(query).sort("_id", 1).batch_size(EXPORT_BATCH_SIZE)
+    
+    def generate():
+        for listing in cursor:
+            yield json_util.dumps(listing) + "\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=listings.ndjson"}
+    )
+
 @listings_bp.route("/host/<host_id>", methods=["GET"])
 @jwt_required()
 def get_listings_by_host(host_id):
@@ -306,8 +596,11 @@ def delete_listing(listing_id):
         return jsonify({"error": "Invalid listing ID"}), 400
     
     # Deleting the listing from the database
-    result = db.listings.delete_one({"_id": _id})
-    if result.deleted_count:
+    listing = db.listings.find_one_and_delete({"_id": _id}, projection={"status": 1, "host_id": 1})
+    if listing:
+        increment_stats(db, {f"listings_by_status.{listing.get('status')}": -1})
+        # Reservations, reviews and the calendar are cleaned up in the background
+        enqueue_cascade(db, "listing", _id, host_id=listing.get("host_id"))
         return jsonify({"message": "Listing deleted"})
     else:
         return jsonify({"error": "Listing not found"}), 404
@@ -1,21 +1,99 @@
-from flask import Blueprint, request, jsonify, Response
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from db import get_db
 from bson import json_util
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from helpers import check_validation, to_object_id
+from helpers import check_validation, to_object_id, serialize_message, format_timestamp, decode_cursor, encode_cursor
+from inbox import dm_conversation_id, record_message, record_messages, refresh_last_message, mark_conversation_read, serialize_inbox_entry
+from pubsub import get_hub, TooManyStreams, RETRY_AFTER_SECONDS
+from sync import record_changes, record_change_batch, get_changes
+from contacts import can_message
+from archive import tiered_keyset_page, find_one_with_archive, find_with_archive, sorted_with_archive
+from identity import get_current_identity, get_current_user
 from validations import messages_validations
 from datetime import datetime, timezone
 
 messages_bp = Blueprint('messages', __name__, url_prefix='/api/messages')
 
+STREAM_KEEPALIVE_SECONDS = 15
+STREAM_REPLAY_LIMIT = 500
+DEFAULT_MESSAGE_PAGE_SIZE = 50
+MAX_MESSAGE_PAGE_SIZE = 200
+DEFAULT_SYNC_LIMIT = 500
+MAX_SYNC_LIMIT = 1000
+# Fields needed to record a sync change for both parties of a message
+MESSAGE_SYNC_PROJECTION = {'conversation_id': 1, 'sender_username': 1, 'receiver_username': 1}
+# Reservations whose guests receive a host broadcast (with start_date >= today)
+BROADCAST_STATUSES = ['upcoming', 'confirmed']
+MAX_BROADCAST_RECIPIENTS = 1000
+
+
+@messages_bp.errorhandler(TooManyStreams)
+def too_many_streams(error):
+    response = jsonify({'error': 'Too many open streams, please try again later'})
+    response.headers['Retry-After'] = str(RETRY_AFTER_SECONDS)
+    return response, 503
+
 
 def _get_username_from_token():
     return get_jwt_identity()
 
 
-def _dm_conversation_id(user_a: str, user_b: str) -> str:
-    a, b = sorted([str(user_a), str(user_b)])
-    return f"dm:{a}|{b}"
+def _user_channel(username):
+    return f"user:{username}"
+
+
+def _get_message_page_params(args):
+    """
+    Parse `limit` and one of the `before`/`after` cursors for keyset paging on
+    (created_at, _id). Without a cursor the newest page is returned.
+    Returns keyset parameters (see helpers.keyset_page) or None if invalid.
+    """
+    if args.get('before') and args.get('after'):
+        return None
+    try:
+        limit = int(args.get('limit', DEFAULT_MESSAGE_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return None
+    if limit < 1:
+        return None
+    cursor = args.get('before') or args.get('after')
+    after = decode_cursor(cursor) if cursor else None
+    if cursor and not after:
+        return None
+    return {
+        'sort_field': 'created_at',
+        # Older pages walk backwards from `before`, newer ones forwards from `after`
+        'direction': 1 if args.get('after') else -1,
+        'limit': min(limit, MAX_MESSAGE_PAGE_SIZE),
+        'after': after
+    }
+
+
+def _message_page_response(db, query, params):
+    """
+    Page of messages in chronological order, with cursors to continue:
+    `before` loads older messages (None when there are none), `after` polls for
+    newer ones, and `has_more` tells whether the paged direction has more.
+    """
+    messages, next_cursor = tiered_keyset_page(db, 'messages', query, params)
+    if params['direction'] == -1:
+        messages.reverse()
+        before = next_cursor
+    else:
+        before = encode_cursor(messages[0], 'created_at') if messages else None
+    after = encode_cursor(messages[-1], 'created_at') if messages else None
+    return Response(json_util.dumps({
+        'messages': [serialize_message(m) for m in messages],
+        'before': before,
+        'after': after,
+        'has_more': next_cursor is not None
+    }), mimetype="application/json")
+
+
+def _sse_event(event_type, data, event_id=None):
+    lines = [f"id: {event_id}"] if event_id else []
+    lines += [f"event: {event_type}", f"data: {data}"]
+    return "\n".join(lines) + "\n\n"
 
 
 @messages_bp.route('/', methods=['POST'])
@@ -47,47 +125,266 @@ def create_message():
 
     # ❌ Validate user-host relationship via reservations
     # Get sender user
-    sender_user = db.users.find_one({"username": sender_username})
+    sender_user = get_current_user(db)
     if not sender_user:
         return jsonify({"error": "Sender user not found"}), 404
 
     # Check if they have a reservation relationship
     # Either: sender is guest and receiver is host OR sender is host and receiver is guest
-    has_relationship = db.reservations.find_one({
-        "$or": [
-            {
-                "user_id": sender_user["_id"],
-                "host_id": receiver_user["_id"]
-            },
-            {
-                "user_id": receiver_user["_id"],
-                "host_id": sender_user["_id"]
-            }
-        ]
-    })
-
-    if not has_relationship:
+    if not can_message(db, sender_user["_id"], receiver_user["_id"]):
         return jsonify({
             "error": "You can only message hosts of your reservations or guests of your listings"
         }), 403
 
-    conversation_id = _dm_conversation_id(sender_username, receiver_username)
+    conversation_id = dm_conversation_id(sender_username, receiver_username)
 
     doc = {
         "sender_username": sender_username,
         "receiver_username": receiver_username,
         "conversation_id": conversation_id,
         "content": content,
-        "created_at": datetime.now(timezone.utc).isoformat(),
+        "created_at": datetime.now(timezone.utc),
     }
 
     result = db.messages.insert_one(doc)
+    conversation = record_message(db, sender_user, receiver_user, doc)
+    record_changes(db, [sender_username, receiver_username],
+                   message_id=result.inserted_id, conversation_id=conversation['_id'])
+
+    # Push to both parties' open streams (the sender may have other tabs open)
+    payload = json_util.dumps(serialize_message(dict(doc, _id=str(result.inserted_id))))
+    hub = get_hub()
+    for username in (receiver_username, sender_username):
+        hub.publish(_user_channel(username), 'message', payload, event_id=str(result.inserted_id))
     return jsonify({
         "_id": str(result.inserted_id),
         "conversation_id": conversation_id
     }), 201
 
 
+def _broadcast_recipients(db, host_id, listing_id=None):
+    """Guests with upcoming reservations on the host's listings, one aggregation."""
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    match = {
+        'host_id': host_id,
+        'user_id': {'$ne': host_id},
+        'status': {'$in': BROADCAST_STATUSES},
+        'start_date': {'$gte': today},
+        'listing_deleted': {'$ne': True},
+        'guest_deleted': {'$ne': True}
+    }
+    if listing_id:
+        match['listing_id'] = listing_id
+    pipeline = [
+        {'$match': match},
+        {'$group': {'_id': '$user_id'}},
+        {'$sort': {'_id': 1}},
+        {'$limit': MAX_BROADCAST_RECIPIENTS + 1},
+        {'$lookup': {'from': 'users', 'localField': '_id', 'foreignField': '_id', 'as': 'user'}},
+        {'$unwind': '$user'},
+        {'$project': {'_id': '$user._id', 'username': '$user.username', 'name': '$user.name'}}
+    ]
+    return list(db.reservations.aggregate(pipeline))
+
+
+@messages_bp.route('/broadcast', methods=['POST'])
+@jwt_required()
+def broadcast_message():
+    """
+    Send the same message to every guest with an upcoming reservation on the
+    current host's listings (HOST ONLY).
+    Request body: {"content": str, "listing_id": str (optional, one listing only)}
+    """
+    db = get_db()
+    data = request.json or {}
+    content = data.get('content')
+    if not isinstance(content, str) or not content:
+        return jsonify({'error': 'Invalid data', 'required': ['content']}), 400
+
+    listing_id = None
+    if data.get('listing_id'):
+        listing_id = to_object_id(data['listing_id'])
+        if not listing_id:
+            return jsonify({'error': 'Invalid listing ID'}), 400
+
+    host = get_current_user(db)
+    if not host or host.get('role') != 'host':
+        return jsonify({'error': 'Host privileges required'}), 403
+
+    recipients = _broadcast_recipients(db, host['_id'], listing_id)
+    if len(recipients) > MAX_BROADCAST_RECIPIENTS:
+        return jsonify({
+            'error': f"Too many recipients (max {MAX_BROADCAST_RECIPIENTS}); broadcast per listing instead"
+        }), 400
+    if not recipients:
+        return jsonify({'sent': 0, 'recipients': []})
+
+    now = datetime.now(timezone.utc)
+    docs = [{
+        'sender_username': host['username'],
+        'receiver_username': guest['username'],
+        'conversation_id': dm_conversation_id(host['username'], guest['username']),
+        'content': content,
+        'created_at': now,
+    } for guest in recipients]
+    # insert_many sets _id on each document
+    db.messages.insert_many(docs)
+
+    conversation_ids = record_messages(db, host, list(zip(recipients, docs)))
+    record_change_batch(db, [
+        {'username': username, 'message_id': doc['_id'], 'conversation_id': conversation_ids.get(doc['conversation_id'])}
+        for doc in docs
+        for username in (doc['receiver_username'], doc['sender_username'])
+    ])
+
+    # Each guest gets their message; the host's own streams get one summary
+    # event instead of one per recipient, which would overflow their queues
+    hub = get_hub()
+    for doc in docs:
+        payload = json_util.dumps(serialize_message(dict(doc, _id=str(doc['_id']))))
+        hub.publish(_user_channel(doc['receiver_username']), 'message', payload, event_id=str(doc['_id']))
+    summary = json_util.dumps({
+        'sender_username': host['username'],
+        'content': content,
+        'created_at': format_timestamp(now),
+        'recipients': [doc['receiver_username'] for doc in docs]
+    })
+    # The newest message id, so a reconnect does not replay the broadcast
+    hub.publish(_user_channel(host['username']), 'broadcast', summary, event_id=str(docs[-1]['_id']))
+
+    return jsonify({
+        'sent': len(docs),
+        'recipients': [doc['receiver_username'] for doc in docs],
+        'message_ids': [str(doc['_id']) for doc in docs]
+    }), 201
+
+
+@messages_bp.route('/stream', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def stream_messages():
+    """
+    Server-Sent Events stream of messages sent to or by the current user.
+    EventSource cannot set headers, so the token may also be passed as ?jwt=<token>.
+    After a reconnect, messages newer than Last-Event-ID (or ?last_event_id=)
+    are replayed from the database before live events. When more than
+    STREAM_REPLAY_LIMIT were missed, a `reset` event (with the id of the newest
+    one) is sent instead and the client reloads its conversations.
+    """
+    db = get_db()
+    username = _get_username_from_token()
+
+    # Subscribe before replaying so nothing published in between is lost
+    subscription = get_hub().subscribe(_user_channel(username))
+
+    missed = []
+    reset_id = None
+    last_event_id = to_object_id(request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+    if last_event_id:
+        query = {
+            '$or': [{'sender_username': username}, {'receiver_username': username}],
+            '_id': {'$gt': last_event_id}
+        }
+        missed = list(db.messages.find(query).sort('_id', 1).limit(STREAM_REPLAY_LIMIT + 1))
+        if len(missed) > STREAM_REPLAY_LIMIT:
+            missed = []
+            reset_id = str(db.messages.find_one(query, {'_id': 1}, sort=[('_id', -1)])['_id'])
+
+    def generate():
+        try:
+            if reset_id:
+                yield _sse_event('reset', '{}', reset_id)
+            replayed = set()
+            for message in missed:
+                replayed.add(str(message['_id']))
+                message['_id'] = str(message['_id'])
+                yield _sse_event('message', json_util.dumps(serialize_message(message)), message['_id'])
+            yield "retry: 3000\n\n"
+            while not subscription.overflowed:
+                event = subscription.get(timeout=STREAM_KEEPALIVE_SECONDS)
+                if event is None:
+                    yield ": keepalive\n\n"
+                elif event['id'] not in replayed:
+                    yield _sse_event(event['type'], event['data'], event['id'])
+            # Fell behind: end the stream, the client reconnects with Last-Event-ID
+        finally:
+            subscription.close()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@messages_bp.route('/sync', methods=['GET'])
+@jwt_required()
+def sync_messages():
+    """
+    Messaging changes of the current user since a sync cursor.
+    Query params:
+        since: cursor returned by the previous call (0 or absent for a first sync)
+        limit: maximum number of changes (default 500)
+    A client applies the changes, stores `cursor` and calls again while
+    `has_more` is true. `reset` means the changes after `since` are no longer
+    retained: the client must reload its messages and inbox, then sync from
+    the returned cursor.
+    """
+    db = get_db()
+    username = _get_username_from_token()
+    try:
+        since = int(request.args.get('since', 0))
+        limit = int(request.args.get('limit', DEFAULT_SYNC_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'Invalid sync parameters'}), 400
+    if since < 0 or limit < 1:
+        return jsonify({'error': 'Invalid sync parameters'}), 400
+    limit = min(limit, MAX_SYNC_LIMIT)
+
+    changes, has_more, reset = get_changes(db, username, since, limit)
+    if reset:
+        counter = db.sync_counters.find_one({'_id': username}) or {'seq': 0}
+        return jsonify({
+            'messages': [], 'deleted_message_ids': [], 'conversations': [],
+            'cursor': str(counter['seq']), 'has_more': False, 'reset': True
+        })
+
+    # Later entries win: a message edited then deleted is only reported deleted
+    message_state = {}
+    conversation_ids = set()
+    for change in changes:
+        if change.get('message_id'):
+            message_state[change['message_id']] = change.get('deleted', False)
+        if change.get('conversation_id'):
+            conversation_ids.add(change['conversation_id'])
+
+    deleted_ids = [_id for _id, deleted in message_state.items() if deleted]
+    live_ids = [_id for _id, deleted in message_state.items() if not deleted]
+    messages = []
+    if live_ids:
+        # A changed message may have been archived before this sync
+        messages = [
+            serialize_message(m)
+            for m in sorted_with_archive(db, 'messages', {'_id': {'$in': live_ids}}, 'created_at')
+        ]
+    conversations = []
+    if conversation_ids:
+        current_user = get_current_identity(db)
+        if current_user:
+            conversations = [
+                serialize_inbox_entry(c, current_user['_id'])
+                for c in db.conversations.find({'_id': {'$in': list(conversation_ids)}})
+            ]
+
+    return Response(json_util.dumps({
+        'messages': messages,
+        'deleted_message_ids': [str(_id) for _id in deleted_ids],
+        'conversations': conversations,
+        'cursor': str(changes[-1]['seq'] if changes else since),
+        'has_more': has_more,
+        'reset': False
+    }), mimetype="application/json")
+
+
 @messages_bp.route('/<message_id>', methods=['GET'])
 @jwt_required()
 def get_message(message_id):
@@ -96,9 +393,16 @@ def get_message(message_id):
     if not _id:
         return jsonify({'error': 'Invalid message ID'}), 400
 
-    message = db.messages.find_one({'_id': _id})
+    message = find_one_with_archive(db, 'messages', {'_id': _id})
     if message:
-        return Response(json_util.dumps(message), mimetype="application/json")
+        return Response(json_util.dumps(serialize_message(message)), mimetype="application/json")
+    return jsonify({'error': 'Message not found'}), 404
+
+
+def _message_write_miss(db, _id):
+    """Response for an edit or delete of a message that is not in the hot collection."""
+    if find_one_with_archive(db, 'messages', {'_id': _id}, {'_id': 1}):
+        return jsonify({'error': 'Archived messages are read-only'}), 409
     return jsonify({'error': 'Message not found'}), 404
 
 
@@ -110,10 +414,13 @@ def delete_message(message_id):
     if not _id:
         return jsonify({'error': 'Invalid message ID'}), 400
 
-    result = db.messages.delete_one({'_id': _id})
-    if result.deleted_count:
+    message = db.messages.find_one_and_delete({'_id': _id}, projection=MESSAGE_SYNC_PROJECTION)
+    if message:
+        conversation_id = refresh_last_message(db, message.get('conversation_id'))
+        record_changes(db, [message.get('sender_username'), message.get('receiver_username')],
+                       message_id=_id, conversation_id=conversation_id, deleted=True)
         return jsonify({'message': 'Message deleted'})
-    return jsonify({'error': 'Message not found'}), 404
+    return _message_write_miss(db, _id)
 
 
 @messages_bp.route('/<message_id>', methods=['PUT'])
@@ -130,48 +437,69 @@ def update_message(message_id):
         return jsonify({'error': 'Invalid message ID'}), 400
 
     # ✅ doğru şekilde ObjectId ile update
-    result = db.messages.update_one({'_id': _id}, {'$set': data})
-    if result.matched_count:
+    message = db.messages.find_one_and_update({'_id': _id}, {'$set': data}, projection=MESSAGE_SYNC_PROJECTION)
+    if message:
+        conversation_id = refresh_last_message(db, message.get('conversation_id'))
+        record_changes(db, [message.get('sender_username'), message.get('receiver_username')],
+                       message_id=_id, conversation_id=conversation_id)
         return jsonify({'message': 'Message updated'})
-    return jsonify({'error': 'Message not found'}), 404
+    return _message_write_miss(db, _id)
 
 
 @messages_bp.route("/", methods=["GET"])
 @jwt_required()
 def get_messages():
     db = get_db()
-    messages = list(db.messages.find({}).sort("created_at", 1))
+    messages = [serialize_message(m) for m in db.messages.find({}).sort("created_at", 1)]
     return Response(json_util.dumps(messages), mimetype="application/json")
 
 
 @messages_bp.route('/conversation/<conversation_id>', methods=['GET'])
 @jwt_required()
 def get_conversation_messages(conversation_id):
+    """Query params: limit, before, after (see _get_message_page_params)."""
     db = get_db()
-    messages = list(db.messages.find({'conversation_id': str(conversation_id)}).sort("created_at", 1))
-    return Response(json_util.dumps(messages), mimetype="application/json")
+    params = _get_message_page_params(request.args)
+    if not params:
+        return jsonify({'error': 'Invalid pagination parameters'}), 400
+    return _message_page_response(db, {'conversation_id': str(conversation_id)}, params)
 
 
 @messages_bp.route('/dm/<other_username>', methods=['GET'])
 @jwt_required()
 def get_dm_messages(other_username):
+    """
+    Direct messages with another user, newest page first.
+    Query params: limit, before, after (see _get_message_page_params).
+    """
     db = get_db()
     me = _get_username_from_token()
-    conversation_id = _dm_conversation_id(me, other_username)
+    conversation_id = dm_conversation_id(me, other_username)
 
-    messages = list(db.messages.find({'conversation_id': conversation_id}).sort("created_at", 1))
-    return Response(json_util.dumps(messages), mimetype="application/json")
+    params = _get_message_page_params(request.args)
+    if not params:
+        return jsonify({'error': 'Invalid pagination parameters'}), 400
+
+    # Opening a conversation marks it as read
+    if not params['after']:
+        current_user = get_current_identity(db)
+        if current_user:
+            summary_id = mark_conversation_read(db, conversation_id, current_user['_id'])
+            if summary_id:
+                record_changes(db, [me], conversation_id=summary_id)
+    return _message_page_response(db, {'conversation_id': conversation_id}, params)
 
 
 @messages_bp.route('/user/<username>', methods=['GET'])
 @jwt_required()
 def get_user_messages(username):
+    """Query params: limit, before, after (see _get_message_page_params)."""
     db = get_db()
-    messages = list(db.messages.find({
-        "$or": [{"sender_username": username}, {"receiver_username": username}]
-    }).sort("created_at", 1))
-
-    return Response(json_util.dumps(messages), mimetype="application/json")
+    params = _get_message_page_params(request.args)
+    if not params:
+        return jsonify({'error': 'Invalid pagination parameters'}), 400
+    query = {"$or": [{"sender_username": username}, {"receiver_username": username}]}
+    return _message_page_response(db, query, params)
 
 
 @messages_bp.route('/conversations', methods=['GET'])
@@ -181,17 +509,17 @@ def get_available_conversations():
     current_username = _get_username_from_token()
     
     # Get current user
-    current_user = db.users.find_one({"username": current_username})
+    current_user = get_current_identity(db)
     if not current_user:
         return jsonify({"error": "User not found"}), 404
     
-    # Find all reservations where user is either guest or host
-    reservations = list(db.reservations.find({
+    # Find all reservations where user is either guest or host, archived ones included
+    reservations = find_with_archive(db, "reservations", {
         "$or": [
             {"user_id": current_user["_id"]},  # User is guest
             {"host_id": current_user["_id"]}   # User is host
         ]
-    }))
+    }, {"user_id": 1, "host_id": 1})
     
     # Collect unique user IDs that current user can message
     messageable_user_ids = set()
@@ -207,28 +535,30 @@ def get_available_conversations():
             # Current user is host, add guest
             messageable_user_ids.add(res["user_id"])
     
-    # Get user details and last message for each conversation
-    conversations = []
-    for user_id in messageable_user_ids:
-        user = db.users.find_one({"_id": user_id})
-        if not user:
-            continue
-            
-        # Get last message in conversation
-        conversation_id = _dm_conversation_id(current_username, user["username"])
-        last_message = db.messages.find_one(
-            {"conversation_id": conversation_id},
-            sort=[("created_at", -1)]
+    # Get user details and conversation summaries in two batched queries
+    users = list(db.users.find({"_id": {"$in": list(messageable_user_ids)}}, {"username": 1, "name": 1}))
+    summaries = {
+        summary["dm_id"]: summary
+        for summary in db.conversations.find(
+            {"dm_id": {"$in": [dm_conversation_id(current_username, user["username"]) for user in users]}},
+            {"dm_id": 1, "last_message": 1, "unread": 1}
         )
+    }
+    
+    conversations = []
+    for user in users:
+        summary = summaries.get(dm_conversation_id(current_username, user["username"]), {})
+        last_message = summary.get("last_message")
         
         conversations.append({
             "username": user["username"],
             "name": user.get("name", user["username"]),
             "last_message": {
-                "content": last_message["content"] if last_message else None,
-                "created_at": last_message["created_at"] if last_message else None,
-                "sender_username": last_message["sender_username"] if last_message else None
-            } if last_message else None
+                "content": last_message["content"],
+                "created_at": format_timestamp(last_message["created_at"]),
+                "sender_username": last_message["sender_username"]
+            } if last_message else None,
+            "unread_count": summary.get("unread", {}).get(str(current_user["_id"]), 0)
         })
     
     # Sort by last message time (most recent first)
@@ -4,8 +4,11 @@ from bson import json_util
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from bson.objectid import ObjectId
 from validations import payment_validations
-from helpers import check_validation, validate_expiry_date, validate_card_number, to_object_id
+from helpers import check_validation, validate_expiry_date, validate_card_number, to_object_id, id_variants, record_status_changes
 from datetime import datetime
+from analytics import invalidate_host_analytics
+from stats import increment_stats
+from identity import get_current_identity
 import hashlib
 
 payment_bp = Blueprint('payment', __name__, url_prefix='/api/payment')
@@ -13,8 +16,8 @@ payment_bp = Blueprint('payment', __name__, url_prefix='/api/payment')
 # PAYMENT TABLE SCHEMA
 #------------------------------
 # _id: ObjectId -> Primary Key
-# user_id: str -> Foreign Key (references Users table)
-# reservation_id: str -> Foreign Key (references Reservations table)
+# user_id: ObjectId -> Foreign Key (references Users table)
+# reservation_id: ObjectId -> Foreign Key (references Reservations table)
 # card_holder: str -> Name on card (encrypted)
 # card_last_four: str -> Last 4 digits of card
 # amount: float -> Payment amount
@@ -40,7 +43,6 @@ def process_payment():
     db = get_db()
     data = request.json
     current_user = get_jwt_identity()
-    print(data)
 
     
     # Validate basic data structure
@@ -66,8 +68,12 @@ def process_payment():
     if not reservation:
         return jsonify({'error': 'Reservation not found'}), 404
     
+    # Expired holds have released their nights and must be booked again
+    if reservation.get('status') in ['expired', 'cancelled', 'declined']:
+        return jsonify({'error': 'Reservation is no longer payable'}), 400
+    
     # Get user info
-    user = db.users.find_one({'username': current_user})
+    user = get_current_identity(db)
     if not user:
         return jsonify({'error': 'User not found'}), 404
     
@@ -79,10 +85,16 @@ def process_payment():
         return jsonify({'error': 'Unauthorized to pay for this reservation'}), 403
     
     # Check if payment already exists for this reservation
-    existing_payment = db.payments.find_one({'reservation_id': str(reservation_id)})
+    existing_payment = db.payments.find_one({'reservation_id': id_variants(reservation_id)})
     if existing_payment and existing_payment.get('status') == 'success':
         return jsonify({'error': 'Payment already processed for this reservation'}), 400
     
+    # Claim the hold before charging: the lifecycle job may have expired it
+    # (releasing its nights) since it was read above
+    claimed = db.reservations.update_one({'_id': reservation_id, 'status': 'unpaid'}, {'$set': {'status': 'confirmed'}})
+    if not claimed.modified_count:
+        return jsonify({'error': 'Reservation is no longer payable'}), 409
+    
     # Process payment (in a real app, this would integrate with a payment gateway)
     # For now, we'll simulate a successful payment
     
@@ -112,13 +124,19 @@ def process_payment():
         'created_at': datetime.now(),
     }
     
-    result = db.payments.insert_one(payment_data)
+    try:
+        result = db.payments.insert_one(payment_data)
+    except Exception:
+        # Give the hold back so the guest can retry
+        db.reservations.update_one({'_id': reservation_id, 'status': 'confirmed'}, {'$set': {'status': 'unpaid'}})
+        raise
     
-    # Update reservation status to confirmed after successful payment
-    db.reservations.update_one(
-        {'_id': reservation_id},
-        {'$set': {'status': 'confirmed', 'payment_id': str(result.inserted_id)}}
-    )
+    db.reservations.update_one({'_id': reservation_id}, {'$set': {'payment_id': str(result.inserted_id)}})
+    record_status_changes(db, [reservation_id], 'confirmed', current_user,
+                          reason='Payment processed', previous=reservation.get('status'))
+    payment_stats = {'payments.count': 1, 'payments.gmv': data['amount']}
+    increment_stats(db, payment_stats, payment_stats)
+    invalidate_host_analytics(reservation.get('host_id'))
     
     return jsonify({
         'message': 'Payment processed successfully',
@@ -144,17 +162,17 @@ def get_payment(payment_id):
         return jsonify({'error': 'Payment not found'}), 404
     
     # Get user info
-    user = db.users.find_one({'username': current_user})
+    user = get_current_identity(db)
     if not user:
         return jsonify({'error': 'User not found'}), 404
     
     # Verify the payment belongs to the current user
-    if payment.get('user_id') != str(user['_id']):
+    if str(payment.get('user_id')) != str(user['_id']):
         return jsonify({'error': 'Unauthorized to view this payment'}), 403
     
     return jsonify({
         '_id': str(payment['_id']),
-        'reservation_id': payment['reservation_id'],
+        'reservation_id': str(payment['reservation_id']),
         'card_last_four': payment['card_last_four'],
         'amount': payment['amount'],
         'status': payment['status'],
@@ -174,22 +192,22 @@ def get_payment_by_reservation(reservation_id):
     if not _id:
         return jsonify({'error': 'Invalid reservation ID'}), 400
     
-    payment = db.payments.find_one({'reservation_id': str(_id)})
+    payment = db.payments.find_one({'reservation_id': id_variants(_id)})
     if not payment:
         return jsonify({'error': 'Payment not found for this reservation'}), 404
     
     # Get user info
-    user = db.users.find_one({'username': current_user})
+    user = get_current_identity(db)
     if not user:
         return jsonify({'error': 'User not found'}), 404
     
     # Verify the payment belongs to the current user
-    if payment.get('user_id') != str(user['_id']):
+    if str(payment.get('user_id')) != str(user['_id']):
         return jsonify({'error': 'Unauthorized to view this payment'}), 403
     
     return jsonify({
         '_id': str(payment['_id']),
-        'reservation_id': payment['reservation_id'],
+        'reservation_id': str(payment['reservation_id']),
         'card_last_four': payment['card_last_four'],
         'amount': payment['amount'],
         'status': payment['status'],
@@ -1,10 +1,17 @@
 from flask import jsonify, request, Blueprint, Response
 from db import get_db 
 from bson import json_util
-from flask_jwt_extended import jwt_required
+from flask_jwt_extended import jwt_required, get_jwt_identity
 from bson.objectid import ObjectId
 from validations import reservations_validations, update_reservation_validations
-from helpers import check_validation, check_reservation_dates, to_object_id, is_host, is_admin
+from helpers import check_validation, check_reservation_dates, to_object_id, is_host, is_admin, parse_date, serialize_reservation, record_status_changes, get_pagination, id_list_variants, get_keyset_params
+from datetime import datetime
+from availability import ACTIVE_STATUSES, find_overlapping_reservation, hold_dates, release_dates, invalidate_availability, decline_overlapping_requests
+from analytics import invalidate_host_analytics
+from stats import increment_stats
+from contacts import add_contact, remove_contact
+from archive import find_one_with_archive, find_with_archive, paged_with_archive, tiered_keyset_page
+from identity import get_current_identity
 
 reservation_bp = Blueprint('reservation', __name__, url_prefix='/api/reservations')
 
@@ -14,25 +21,41 @@ reservation_bp = Blueprint('reservation', __name__, url_prefix='/api/reservation
 # user_id: int -> Foreign Key (references Users table)
 # host_id: int -> Foreign Key (references Hosts table)
 # listing_id: int -> Foreign Key (references Listings table)
-# start_date: date
-# end_date: date
+# start_date: date -> stored as BSON date, returned as "YYYY-MM-DD"
+# end_date: date -> stored as BSON date, returned as "YYYY-MM-DD"
 # guests: int -> number of guests
 # total_price: float -> total price of the reservation
-# status: str -> status of the reservation (e.g., "pending", "upcoming", "declined", "past", "unpaid")
+# status: str -> status of the reservation (e.g., "pending", "upcoming", "declined", "past", "unpaid", "expired")
+# NOTE: "past" and "expired" are set by jobs/reservation_lifecycle.py
+
+# Public sort names of the admin reservation list
+ADMIN_SORT_FIELDS = {'created': '_id', 'start_date': 'start_date'}
 
 # NOTE: THESE ROUTES REQUIRE ADMIN PRIVILEGES
 @reservation_bp.route("/", methods=["GET"])
 @jwt_required()
 def get_reservations():
+    """
+    Every reservation, archived ones included, newest first (ADMIN ONLY).
+    Query params: status, sort (created or start_date), order, limit, cursor.
+    The dashboard counters come from GET /api/admin/stats instead.
+    """
     db = get_db()
     
     if not is_admin(db):
         return jsonify({'error': 'Admin privileges required'}), 403
 
-    reservations = list(db.reservations.find({}))
+    params = get_keyset_params(request.args, ADMIN_SORT_FIELDS, 'created', default_limit=50)
+    if not params:
+        return jsonify({'error': 'Invalid pagination parameters'}), 400
+    query = {'status': request.args['status']} if request.args.get('status') else {}
 
+    reservations, next_cursor = tiered_keyset_page(db, 'reservations', query, params)
     return Response(
-        json_util.dumps(reservations),
+        json_util.dumps({
+            'reservations': [serialize_reservation(r) for r in reservations],
+            'next_cursor': next_cursor
+        }),
         mimetype="application/json"
     )
     
@@ -48,13 +71,30 @@ def delete_reservation(reservation_id):
     if not is_admin(db):
         return jsonify({'error': 'Admin privileges required'}), 403
     
-    result = db.reservations.delete_one({'_id': _id})
-    if result.deleted_count:
+    reservation = db.reservations.find_one_and_delete({'_id': _id}, projection={'listing_id': 1, 'host_id': 1, 'user_id': 1, 'status': 1})
+    if reservation:
+        release_dates(db, _id, reservation.get('listing_id'))
+        invalidate_host_analytics(reservation.get('host_id'))
+        remove_contact(db, reservation.get('user_id'), reservation.get('host_id'))
+        increment_stats(db, {f"reservations_by_status.{reservation.get('status')}": -1})
         return jsonify({'message': 'Reservation deleted'})
     else:
         return jsonify({'error': 'Reservation not found'}), 404
 
 # NOTE: THESE ROUTES REQUIRE HOST PRIVILEGES
+def _host_access_error(db, host_id):
+    """Error response unless the caller is the host `host_id` or an admin, else None."""
+    current_user = get_current_identity(db)
+    if not current_user:
+        return jsonify({'error': 'User not found'}), 404
+    if current_user['role'] == 'admin':
+        return None
+    if current_user['role'] != 'host':
+        return jsonify({'error': 'Host privileges required'}), 403
+    if current_user['_id'] != host_id:
+        return jsonify({'error': 'You can only view your own reservations'}), 403
+    return None
+
 @reservation_bp.route('/host/<host_id>', methods=['GET'])
 @jwt_required()
 def get_reservations_by_host(host_id):
@@ -64,16 +104,119 @@ def get_reservations_by_host(host_id):
     if not _id:
         return jsonify({'error': 'Invalid host ID'}), 400
     
-    if not is_host(db):
-        return jsonify({'error': 'Host privileges required'}), 403
+    error = _host_access_error(db, _id)
+    if error:
+        return error
     
-    reservations = list(db.reservations.find({'host_id': _id}))
+    reservations = [serialize_reservation(r) for r in find_with_archive(db, 'reservations', {'host_id': _id})]
     
     return Response(
         json_util.dumps(reservations),
         mimetype="application/json"
     )
 
+# Listing and guest fields joined into dashboard rows. Plain equality lookups
+# (a pipeline combined with localField needs MongoDB 5.0), trimmed to the
+# dashboard fields right after the join.
+DASHBOARD_LOOKUPS = [
+    {'$lookup': {'from': 'listings', 'localField': 'listing_id', 'foreignField': '_id', 'as': 'listing'}},
+    {'$lookup': {'from': 'users', 'localField': 'user_id', 'foreignField': '_id', 'as': 'guest'}},
+    {'$addFields': {
+        'listing': {'$arrayElemAt': [{'$map': {'input': '$listing', 'as': 'l', 'in': {
+            '_id': '$$l._id', 'title': '$$l.title', 'image': {'$arrayElemAt': ['$$l.images', 0]}
+        }}}, 0]},
+        'guest': {'$arrayElemAt': [{'$map': {'input': '$guest', 'as': 'g', 'in': {
+            '_id': '$$g._id', 'name': '$$g.name', 'username': '$$g.username', 'avatar': '$$g.avatar'
+        }}}, 0]}
+    }},
+]
+
+UPCOMING_CHECKINS_LIMIT = 5
+
+# Statuses a host can accept: requests that still hold their nights
+ACCEPTABLE_STATUSES = ['pending', 'unpaid']
+
+@reservation_bp.route('/host/<host_id>/dashboard', methods=['GET'])
+@jwt_required()
+def get_host_dashboard(host_id):
+    """
+    Paginated host reservations joined with listing title/image and guest name,
+    plus per-status counts and the next check-ins, in one aggregation.
+    Query params: page, limit, status (optional filter for the paginated list).
+    """
+    db = get_db()
+    
+    _id = to_object_id(host_id)
+    if not _id:
+        return jsonify({'error': 'Invalid host ID'}), 400
+    
+    error = _host_access_error(db, _id)
+    if error:
+        return error
+    
+    pagination = get_pagination(request.args)
+    if not pagination:
+        return jsonify({'error': 'Invalid pagination parameters'}), 400
+    page, limit = pagination
+    
+    list_match = {}
+    status = request.args.get('status')
+    if status:
+        list_match['status'] = status
+    
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    
+    pipeline = [
+        {'$match': {'host_id': _id}},
+        {'$facet': {
+            'reservations': [
+                {'$match': list_match},
+                {'$sort': {'start_date': -1, '_id': -1}},
+                {'$skip': (page - 1) * limit},
+                {'$limit': limit},
+                *DASHBOARD_LOOKUPS
+            ],
+            'total': [
+                {'$match': list_match},
+                {'$count': 'count'}
+            ],
+            'status_counts': [
+                {'$group': {'_id': '$status', 'count': {'$sum': 1}}}
+            ],
+            'upcoming_checkins': [
+                {'$match': {'status': {'$in': ['upcoming', 'confirmed']}, 'start_date': {'$gte': today}}},
+                {'$sort': {'start_date': 1}},
+                {'$limit': UPCOMING_CHECKINS_LIMIT},
+                *DASHBOARD_LOOKUPS
+            ]
+        }}
+    ]
+    result = next(db.reservations.aggregate(pipeline))
+    
+    total = result['total'][0]['count'] if result['total'] else 0
+    dashboard = {
+        'reservations': [serialize_reservation(r) for r in result['reservations']],
+        'upcoming_checkins': [serialize_reservation(r) for r in result['upcoming_checkins']],
+        'status_counts': {row['_id']: row['count'] for row in result['status_counts'] if row['_id']},
+        'page': page,
+        'limit': limit,
+        'total': total
+    }
+    
+    return Response(
+        json_util.dumps(dashboard),
+        mimetype="application/json"
+    )
+
+def _host_update_error(db, _id, conflict_message):
+    """Response for a host status change whose guarded update matched nothing."""
+    reservation = db.reservations.find_one({'_id': _id}, {'host_id': 1})
+    if not reservation:
+        return jsonify({'error': 'Reservation not found'}), 404
+    if str(reservation.get('host_id')) != str(get_current_identity(db)['_id']):
+        return jsonify({'error': 'You can only manage reservations of your own listings'}), 403
+    return jsonify({'error': conflict_message}), 409
+
 @reservation_bp.route('/<reservation_id>/accept', methods=['POST'])
 @jwt_required()
 def accept_reservation(reservation_id):
@@ -86,15 +229,30 @@ def accept_reservation(reservation_id):
     if not _id:
         return jsonify({'error': 'Invalid reservation ID'}), 400
     
-    result = db.reservations.update_one(
-        {'_id': _id},
-        {'$set': {'status': 'upcoming'}}
+    # Declined, cancelled or expired reservations gave their nights back to
+    # the calendar, so only requests still holding them can be accepted
+    reservation = db.reservations.find_one_and_update(
+        {'_id': _id, 'host_id': get_current_identity(db)['_id'], 'status': {'$in': ACCEPTABLE_STATUSES}},
+        {'$set': {'status': 'upcoming'}},
+        projection={'listing_id': 1, 'host_id': 1, 'start_date': 1, 'end_date': 1, 'status': 1}
     )
+    if not reservation:
+        return _host_update_error(db, _id, 'Reservation can no longer be accepted')
     
-    if result.matched_count:
-        return jsonify({'message': 'Reservation accepted'})
-    else:
-        return jsonify({'error': 'Reservation not found'}), 404
+    invalidate_host_analytics(reservation.get('host_id'))
+    actor = get_jwt_identity()
+    record_status_changes(db, [_id], 'upcoming', actor, previous=reservation.get('status'))
+    
+    # Pending requests for the same nights can no longer be accepted
+    declined_ids = decline_overlapping_requests(db, reservation)
+    record_status_changes(db, declined_ids, 'declined', actor,
+                          reason=f'Overlaps accepted reservation {_id}', previous='pending')
+    
+    invalidate_availability(reservation.get('listing_id'))
+    return jsonify({
+        'message': 'Reservation accepted',
+        'auto_declined': [str(declined_id) for declined_id in declined_ids]
+    })
     
 @reservation_bp.route('/<reservation_id>/decline', methods=['POST'])
 @jwt_required()
@@ -108,15 +266,18 @@ def decline_reservation(reservation_id):
     if not _id:
         return jsonify({'error': 'Invalid reservation ID'}), 400
     
-    result = db.reservations.update_one(
-        {'_id': _id},
-        {'$set': {'status': 'declined'}}
+    reservation = db.reservations.find_one_and_update(
+        {'_id': _id, 'host_id': get_current_identity(db)['_id'], 'status': {'$in': ACTIVE_STATUSES}},
+        {'$set': {'status': 'declined'}},
+        projection={'listing_id': 1, 'host_id': 1, 'status': 1}
     )
+    if not reservation:
+        return _host_update_error(db, _id, 'Reservation can no longer be declined')
     
-    if result.matched_count:
-        return jsonify({'message': 'Reservation declined'})
-    else:
-        return jsonify({'error': 'Reservation not found'}), 404
+    release_dates(db, _id, reservation.get('listing_id'))
+    invalidate_host_analytics(reservation.get('host_id'))
+    record_status_changes(db, [_id], 'declined', get_jwt_identity(), previous=reservation.get('status'))
+    return jsonify({'message': 'Reservation declined'})
 
 
 @reservation_bp.route('/<reservation_id>', methods=['PUT'])
@@ -125,7 +286,6 @@ def update_reservation(reservation_id):
     db = get_db()
     data = request.json
     
-    print(data)
     # Validate data
     if not check_validation(data, update_reservation_validations):
         return jsonify({'error': 'Invalid data'}), 400
@@ -134,11 +294,37 @@ def update_reservation(reservation_id):
     if not _id:
         return jsonify({'error': 'Invalid reservation ID'}), 400
     
-    result = db.reservations.update_one({'_id': _id}, {'$set': data})
-    if result.matched_count:
+    reservation = db.reservations.find_one({'_id': _id}, {'listing_id': 1, 'host_id': 1, 'start_date': 1, 'end_date': 1, 'status': 1})
+    if not reservation:
+        return jsonify({'error': 'Reservation not found'}), 404
+    
+    previous_status = reservation.get('status')
+    status = data['status']
+    if status == previous_status:
         return jsonify({'message': 'Reservation updated'})
+    
+    # Keep the listing calendar in sync with the new status
+    was_active = previous_status in ACTIVE_STATUSES
+    is_active = status in ACTIVE_STATUSES
+    newly_held = is_active and not was_active
+    if newly_held:
+        if not hold_dates(db, reservation['listing_id'], _id, reservation['start_date'], reservation['end_date']):
+            return jsonify({'error': 'Listing is not available for the selected dates'}), 409
+    
+    # Only the status can change here; dates, listing and host stay as stored
+    result = db.reservations.update_one({'_id': _id, 'status': previous_status}, {'$set': {'status': status}})
+    if not result.matched_count:
+        if newly_held:
+            release_dates(db, _id, reservation['listing_id'])
+        return jsonify({'error': 'Reservation was modified, please try again'}), 409
+    
+    if is_active:
+        invalidate_availability(reservation['listing_id'])
     else:
-        return jsonify({'error': 'Reservation not found'}), 404
+        release_dates(db, _id, reservation['listing_id'])
+    invalidate_host_analytics(reservation.get('host_id'))
+    record_status_changes(db, [_id], status, get_jwt_identity(), previous=previous_status)
+    return jsonify({'message': 'Reservation updated'})
 
 # NOTE: THESE ROUTES REQUIRE AUTHENTICATION
 @reservation_bp.route('/', methods=['POST'])
@@ -146,44 +332,63 @@ def update_reservation(reservation_id):
 def create_reservation():
     db = get_db()
     data = request.json
-    data['status'] = 'unpaid'  # Default status
-
-    # Validate data
-    validation = check_validation(data, reservations_validations)
-    date_validation = check_reservation_dates(data)
-
-    listing = db.listings.find_one({'_id': to_object_id(data['listing_id'])})
-    
-    host_id = listing['host_id']
-    data['host_id'] = host_id
-    user_id = data['user_id']
-    data['user_id'] = user_id
 
-    if not validation:
+    # Validate data before touching the database
+    if not check_validation(data, reservations_validations):
         return jsonify({'error': 'Invalid data'}), 400
-    if not date_validation:
+    if not check_reservation_dates(data):
         return jsonify({'error': 'Invalid reservation dates'}), 400
 
     # Convert string IDs to ObjectIds for consistency
-    if 'user_id' in data:
-        user_id = to_object_id(data['user_id'])
-        if not user_id:
-            return jsonify({'error': 'Invalid user ID'}), 400
-        data['user_id'] = user_id
-    
-    if 'host_id' in data:
-        host_id = to_object_id(data['host_id'])
-        if not host_id:
-            return jsonify({'error': 'Invalid host ID'}), 400
-        data['host_id'] = host_id
-    
-    if 'listing_id' in data:
-        listing_id = to_object_id(data['listing_id'])
-        if not listing_id:
-            return jsonify({'error': 'Invalid listing ID'}), 400
-        data['listing_id'] = listing_id
-    
-    result = db.reservations.insert_one(data)
+    user_id = to_object_id(data['user_id'])
+    if not user_id:
+        return jsonify({'error': 'Invalid user ID'}), 400
+    
+    listing_id = to_object_id(data['listing_id'])
+    if not listing_id:
+        return jsonify({'error': 'Invalid listing ID'}), 400
+    
+    listing = db.listings.find_one({'_id': listing_id}, {'host_id': 1})
+    if not listing:
+        return jsonify({'error': 'Listing not found'}), 404
+    
+    # host_id always comes from the listing, never from the client
+    host_id = to_object_id(str(listing.get('host_id')))
+    if not host_id:
+        return jsonify({'error': 'Invalid host ID'}), 400
+    
+    # Store dates as BSON dates so range queries use the index
+    start_date = parse_date(data['start_date'])
+    end_date = parse_date(data['end_date'])
+    
+    data.update({
+        '_id': ObjectId(),
+        'user_id': user_id,
+        'host_id': host_id,
+        'listing_id': listing_id,
+        'start_date': start_date,
+        'end_date': end_date,
+        'status': 'unpaid'  # Default status
+    })
+    
+    # Double-booking guard: a cheap indexed check first, then the atomic hold
+    # on the listing calendar, which is what actually serializes checkouts.
+    if find_overlapping_reservation(db, listing_id, start_date, end_date):
+        return jsonify({'error': 'Listing is not available for the selected dates'}), 409
+    if not hold_dates(db, listing_id, data['_id'], start_date, end_date):
+        return jsonify({'error': 'Listing is not available for the selected dates'}), 409
+    
+    try:
+        result = db.reservations.insert_one(data)
+    except Exception:
+        release_dates(db, data['_id'])
+        raise
+    # Booked ranges are read from `reservations`: a lookup between the hold and
+    # the insert may have cached them without this booking
+    invalidate_availability(listing_id)
+    invalidate_host_analytics(host_id)
+    add_contact(db, user_id, host_id)
+    record_status_changes(db, [data['_id']], 'unpaid', get_jwt_identity(), reason='Reservation created')
     return jsonify({'_id': str(result.inserted_id)}), 201
 
 @reservation_bp.route('/<reservation_id>', methods=['GET'])
@@ -195,15 +400,24 @@ def get_reservation(reservation_id):
     if not _id:
         return jsonify({'error': 'Invalid reservation ID'}), 400
     
-    reservation = db.reservations.find_one({'_id': _id})
+    reservation = find_one_with_archive(db, 'reservations', {'_id': _id})
     if reservation:
         return Response(
-            json_util.dumps(reservation),
+            json_util.dumps(serialize_reservation(reservation)),
             mimetype="application/json"
         ) 
     else:
         return jsonify({'error': 'Reservation not found'}), 404
     
+def _user_access_error(db, user_id):
+    """Error response unless the caller is the user `user_id` or an admin, else None."""
+    current_user = get_current_identity(db)
+    if not current_user:
+        return jsonify({'error': 'User not found'}), 404
+    if current_user['_id'] != user_id and current_user['role'] != 'admin':
+        return jsonify({'error': 'You can only view your own reservations'}), 403
+    return None
+
 @reservation_bp.route('/user/<user_id>', methods=['GET'])
 @jwt_required()
 def get_reservations_by_user(user_id):
@@ -213,13 +427,90 @@ def get_reservations_by_user(user_id):
     if not _id:
         return jsonify({'error': 'Invalid user ID'}), 400
     
-    reservations = list(db.reservations.find({'user_id': _id}))
+    error = _user_access_error(db, _id)
+    if error:
+        return error
+    
+    reservations = [serialize_reservation(r) for r in find_with_archive(db, 'reservations', {'user_id': _id})]
     
     return Response(
         json_util.dumps(reservations),
         mimetype="application/json"
     )
 
+# Listing fields embedded in trip cards
+TRIP_LISTING_PROJECTION = {
+    'title': 1, 'city': 1, 'property_type': 1, 'price': 1,
+    'images': {'$slice': 1}, 'average_rating': 1, 'review_count': 1
+}
+
+@reservation_bp.route('/user/<user_id>/trips', methods=['GET'])
+@jwt_required()
+def get_user_trips(user_id):
+    """
+    Paginated trips of a user, each with a listing card, a has_review flag
+    and the payment status. Related documents are resolved with one batched
+    $in query per collection instead of one request per trip.
+    Query params: page, limit, status (optional).
+    """
+    db = get_db()
+    
+    _id = to_object_id(user_id)
+    if not _id:
+        return jsonify({'error': 'Invalid user ID'}), 400
+    
+    error = _user_access_error(db, _id)
+    if error:
+        return error
+    
+    pagination = get_pagination(request.args)
+    if not pagination:
+        return jsonify({'error': 'Invalid pagination parameters'}), 400
+    page, limit = pagination
+    
+    query = {'user_id': _id}
+    status = request.args.get('status')
+    if status:
+        query['status'] = status
+    
+    # Trips that ended long ago live in the archive tier
+    reservations, total = paged_with_archive(db, 'reservations', query, 'start_date', (page - 1) * limit, limit)
+    
+    listing_ids = list({r['listing_id'] for r in reservations if r.get('listing_id')})
+    reservation_ids = [r['_id'] for r in reservations]
+    
+    listings = {
+        str(listing['_id']): listing
+        for listing in db.listings.find({'_id': id_list_variants(listing_ids)}, TRIP_LISTING_PROJECTION)
+    }
+    reviewed = {
+        str(review['reservation_id'])
+        for review in db.reviews.find({'reservation_id': id_list_variants(reservation_ids)}, {'reservation_id': 1})
+    }
+    payments = {
+        str(payment['reservation_id']): payment.get('status')
+        for payment in db.payments.find({'reservation_id': id_list_variants(reservation_ids)}, {'reservation_id': 1, 'status': 1})
+    }
+    
+    trips = []
+    for reservation in reservations:
+        listing = listings.get(str(reservation.get('listing_id')))
+        if listing:
+            images = listing.pop('images', None) or []
+            listing['image'] = images[0] if images else None
+        reservation_key = str(reservation['_id'])
+        
+        trip = serialize_reservation(reservation)
+        trip['listing'] = listing
+        trip['has_review'] = reservation_key in reviewed
+        trip['payment_status'] = payments.get(reservation_key)
+        trips.append(trip)
+    
+    return Response(
+        json_util.dumps({'trips': trips, 'page': page, 'limit': limit, 'total': total}),
+        mimetype="application/json"
+    )
+
 @reservation_bp.route('/<reservation_id>/cancel', methods=['POST'])
 @jwt_required()
 def cancel_reservation(reservation_id):
@@ -229,12 +520,16 @@ def cancel_reservation(reservation_id):
     if not _id:
         return jsonify({'error': 'Invalid reservation ID'}), 400
     
-    result = db.reservations.update_one(
+    reservation = db.reservations.find_one_and_update(
         {'_id': _id},
-        {'$set': {'status': 'cancelled'}}
+        {'$set': {'status': 'cancelled'}},
+        projection={'listing_id': 1, 'host_id': 1, 'status': 1}
     )
     
-    if result.matched_count:
+    if reservation:
+        release_dates(db, _id, reservation.get('listing_id'))
+        invalidate_host_analytics(reservation.get('host_id'))
+        record_status_changes(db, [_id], 'cancelled', get_jwt_identity(), previous=reservation.get('status'))
         return jsonify({'message': 'Reservation canceled'})
     else:
         return jsonify({'error': 'Reservation not found'}), 404
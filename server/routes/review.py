@@ -1,7 +1,7 @@
 from flask import jsonify, request, Blueprint, Response
 from db import get_db 
 from bson import json_util
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from bson.objectid import ObjectId
 from datetime import datetime
 from helpers import (
@@ -9,22 +9,34 @@ from helpers import (
     validate_review_creation,
     to_object_id, 
     is_admin,
-    update_listing_rating
+    update_listing_rating,
+    id_variants,
+    stringify_ids,
+    get_keyset_params,
+    keyset_page
 )
 from validations import review_validations
+from stats import increment_stats
+from archive import find_one_with_archive
+from identity import get_current_identity
 
 review_bp = Blueprint('review', __name__, url_prefix='/api/reviews')
 
 # REVIEW TABLE
 #------------------------------
 # _id: ObjectId -> Primary Key
-# reservation_id: str -> Foreign Key (references Reservations table)
-# user_id: str -> Foreign Key (references Users table) - the customer who wrote the review
-# listing_id: str -> Foreign Key (references Listings table)
+# reservation_id: ObjectId -> Foreign Key (references Reservations table)
+# user_id: ObjectId -> Foreign Key (references Users table) - the customer who wrote the review
+# property_id: ObjectId -> Foreign Key (references Listings table)
 # rating: int/float -> rating (1-5 stars)
 # comment: str -> review text/comment
 # created_at: datetime -> when the review was created
 # updated_at: datetime -> when the review was last updated
+# NOTE: Legacy reviews may still store the foreign keys as strings until
+# jobs/normalize_ids.py has run, so reads go through id_variants().
+
+# Foreign keys returned to the client as plain strings
+REVIEW_ID_FIELDS = ('reservation_id', 'user_id', 'property_id')
 
 # NOTE: THESE ROUTES REQUIRE AUTHENTICATION
 @review_bp.route('/', methods=['POST'])
@@ -43,8 +55,7 @@ def create_review():
         return jsonify({'error': 'Invalid comment format'}), 400
     
     # Get current user
-    current_username = get_jwt_identity()
-    current_user = db.users.find_one({'username': current_username})
+    current_user = get_current_identity(db)
     if not current_user:
         return jsonify({'error': 'User not found'}), 404
     
@@ -53,7 +64,7 @@ def create_review():
     if not reservation_id:
         return jsonify({'error': 'Invalid reservation ID'}), 400
     
-    reservation = db.reservations.find_one({'_id': reservation_id})
+    reservation = find_one_with_archive(db, 'reservations', {'_id': reservation_id})
     if not reservation:
         return jsonify({'error': 'Reservation not found'}), 404
     
@@ -64,9 +75,9 @@ def create_review():
     
     # Prepare review data
     review_data = {
-        'reservation_id': str(reservation_id),
-        'user_id': str(current_user['_id']),
-        'property_id': data.get('property_id'),
+        'reservation_id': reservation_id,
+        'user_id': current_user['_id'],
+        'property_id': to_object_id(data.get('property_id')),
         'rating': data.get('rating'),
         'comment': data.get('comment', ''),
         'created_at': datetime.utcnow(),
@@ -78,6 +89,7 @@ def create_review():
     
     # Update listing's average rating and review count
     update_listing_rating(db, data.get('property_id'))
+    increment_stats(db, {'reviews.count': 1, 'reviews.rating_sum': review_data['rating']}, {'reviews.count': 1})
     
     return jsonify({'_id': str(result.inserted_id), 'message': 'Review created successfully'}), 201
 
@@ -92,6 +104,7 @@ def get_review(review_id):
     
     review = db.reviews.find_one({'_id': _id})
     if review:
+        stringify_ids(review, REVIEW_ID_FIELDS)
         return Response(
             json_util.dumps(review),
             mimetype="application/json"
@@ -108,8 +121,9 @@ def get_review_by_reservation(reservation_id):
     if not _id:
         return jsonify({'error': 'Invalid reservation ID'}), 400
     
-    review = db.reviews.find_one({'reservation_id': str(_id)})
+    review = db.reviews.find_one({'reservation_id': id_variants(_id)})
     if review:
+        stringify_ids(review, REVIEW_ID_FIELDS)
         return Response(
             json_util.dumps(review),
             mimetype="application/json"
@@ -141,10 +155,11 @@ def get_reviews_by_property(property_id):
             )
     
     # Fetch reviews for the property
-    reviews = list(db.reviews.find({'property_id': property_id}).sort('created_at', -1))
+    reviews = list(db.reviews.find({'property_id': id_variants(property_id)}).sort('created_at', -1))
     
     # Populate user information for each review
     for review in reviews:
+        stringify_ids(review, REVIEW_ID_FIELDS)
         user_id = review.get('user_id')
         if user_id:
             try:
@@ -174,7 +189,9 @@ def get_reviews_by_user(user_id):
     if not _id:
         return jsonify({'error': 'Invalid user ID'}), 400
     
-    reviews = list(db.reviews.find({'user_id': str(_id)}).sort('created_at', -1))
+    reviews = list(db.reviews.find({'user_id': id_variants(_id)}).sort('created_at', -1))
+    for review in reviews:
+        stringify_ids(review, REVIEW_ID_FIELDS)
     
     return Response(
         json_util.dumps(reviews),
@@ -188,8 +205,7 @@ def update_review(review_id):
     data = request.json
     
     # Get current user
-    current_username = get_jwt_identity()
-    current_user = db.users.find_one({'username': current_username})
+    current_user = get_current_identity(db)
     if not current_user:
         return jsonify({'error': 'User not found'}), 404
     
@@ -203,7 +219,7 @@ def update_review(review_id):
         return jsonify({'error': 'Review not found'}), 404
     
     # Check if current user is the owner of the review or admin
-    if review.get('user_id') != str(current_user['_id']) and not is_admin(db):
+    if str(review.get('user_id')) != str(current_user['_id']) and not is_admin(db):
         return jsonify({'error': 'You can only update your own reviews'}), 403
     
     # Validate and build update data (only rating and comment can be updated)
@@ -231,6 +247,8 @@ def update_review(review_id):
     if result.matched_count:
         # Update listing's average rating and review count
         update_listing_rating(db, review.get('property_id'))
+        if 'rating' in update_data:
+            increment_stats(db, {'reviews.rating_sum': update_data['rating'] - review.get('rating', 0)})
         return jsonify({'message': 'Review updated successfully'})
     else:
         return jsonify({'error': 'Review not found'}), 404
@@ -241,8 +259,7 @@ def delete_review(review_id):
     db = get_db()
     
     # Get current user
-    current_username = get_jwt_identity()
-    current_user = db.users.find_one({'username': current_username})
+    current_user = get_current_identity(db)
     if not current_user:
         return jsonify({'error': 'User not found'}), 404
     
@@ -256,7 +273,7 @@ def delete_review(review_id):
         return jsonify({'error': 'Review not found'}), 404
     
     # Check if current user is the owner of the review or admin
-    if review.get('user_id') != str(current_user['_id']) and not is_admin(db):
+    if str(review.get('user_id')) != str(current_user['_id']) and not is_admin(db):
         return jsonify({'error': 'You can only delete your own reviews'}), 403
     
     # Store property_id before deletion for rating update
@@ -267,6 +284,7 @@ def delete_review(review_id):
     if result.deleted_count:
         # Update listing's average rating and review count
         update_listing_rating(db, property_id)
+        increment_stats(db, {'reviews.count': -1, 'reviews.rating_sum': -review.get('rating', 0)})
         return jsonify({'message': 'Review deleted successfully'})
     else:
         return jsonify({'error': 'Review not found'}), 404
@@ -308,7 +326,7 @@ def get_property_review_stats(property_id):
     total_reviews = listing.get('review_count', 0)
     
     # Calculate rating distribution (still need to fetch reviews for this)
-    reviews = list(db.reviews.find({'property_id': property_id}))
+    reviews = list(db.reviews.find({'property_id': id_variants(property_id)}, {'rating': 1}))
     rating_distribution = {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
     for review in reviews:
         rating = int(review.get('rating', 0))
@@ -326,34 +344,40 @@ def get_property_review_stats(property_id):
 @review_bp.route('/', methods=['GET'])
 @jwt_required()
 def get_all_reviews():
+    """
+    One page of reviews, newest first, with their authors (ADMIN ONLY).
+    Query params: order, limit, cursor.
+    """
     db = get_db()
     
     if not is_admin(db):
         return jsonify({'error': 'Admin privileges required'}), 403
     
-    reviews = list(db.reviews.find({}).sort('created_at', -1))
+    params = get_keyset_params(request.args, {'created_at': 'created_at'}, 'created_at', default_limit=50)
+    if not params:
+        return jsonify({'error': 'Invalid pagination parameters'}), 400
+    reviews, next_cursor = keyset_page(db.reviews, {}, params)
     
-    # Populate user information for each review
+    # Populate user information with one query for the page
     for review in reviews:
-        user_id = review.get('user_id')
-        if user_id:
-            try:
-                user_obj_id = ObjectId(user_id) if ObjectId.is_valid(user_id) else None
-                if user_obj_id:
-                    user = db.users.find_one({'_id': user_obj_id})
-                    if user:
-                        review['user'] = {
-                            'name': user.get('name', 'Anonymous'),
-                            'username': user.get('username'),
-                            'email': user.get('email'),
-                            'avatar': user.get('avatar')
-                        }
-            except Exception:
-                # If user_id format is invalid, skip user population
-                pass
+        stringify_ids(review, REVIEW_ID_FIELDS)
+    user_ids = {to_object_id(review.get('user_id')) for review in reviews} - {None}
+    users = {
+        str(user['_id']): user
+        for user in db.users.find({'_id': {'$in': list(user_ids)}}, {'name': 1, 'username': 1, 'email': 1, 'avatar': 1})
+    }
+    for review in reviews:
+        user = users.get(review.get('user_id'))
+        if user:
+            review['user'] = {
+                'name': user.get('name', 'Anonymous'),
+                'username': user.get('username'),
+                'email': user.get('email'),
+                'avatar': user.get('avatar')
+            }
     
     return Response(
-        json_util.dumps(reviews),
+        json_util.dumps({'reviews': reviews, 'next_cursor': next_cursor}),
         mimetype="application/json"
     )
 
@@ -2,7 +2,7 @@ from flask import Blueprint, jsonify, Response, request
 from flask_jwt_extended import jwt_required
 from bson import json_util
 from db import get_db
-from helpers import to_object_id, check_validation
+from helpers import to_object_id, check_validation, id_variants
 from validations import search_validations
 from google import genai
 from google.genai import types
@@ -206,8 +206,7 @@ def search_listings_ai():
         transformed_listings = []
         for listing in listings:
             # Calculate reviews stats
-            listing_id = str(listing['_id'])
-            reviews = list(db.reviews.find({'property_id': listing_id}))
+            reviews = list(db.reviews.find({'property_id': id_variants(listing['_id'])}, {'rating': 1}))
             
             total_reviews = len(reviews)
             if total_reviews > 0:
@@ -253,8 +252,7 @@ def search_listings(city: str):
     
     # Enrich with reviews
     for listing in listings:
-        listing_id = str(listing['_id'])
-        reviews = list(db.reviews.find({'property_id': listing_id}))
+        reviews = list(db.reviews.find({'property_id': id_variants(listing['_id'])}, {'rating': 1}))
         
         total_reviews = len(reviews)
         if total_reviews > 0:
@@ -1,10 +1,15 @@
 from flask import Blueprint, request, jsonify, Response
 from db import get_db
 from bson import json_util
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
+from pymongo import ReturnDocument
 from validations import user_validations
-from helpers import check_validation, is_admin, to_object_id
+from helpers import check_validation, is_admin, to_object_id, id_variants, get_keyset_params, keyset_page, build_user_filter, USER_SORT_FIELDS, USER_LIST_PROJECTION
 from datetime import datetime
+from stats import increment_stats, status_transition
+from cascade import enqueue_cascade
+from archive import count_with_archive
+from identity import invalidate_identity, get_current_user, get_current_identity, CURRENT_USER_PROJECTION
 
 user_bp = Blueprint('user', __name__, url_prefix='/api/users')
 
@@ -31,8 +36,8 @@ def get_user(user_id):
     user = db.users.find_one({'_id': _id})
     if user:
         # Calculate statistics
-        trip_count = db.reservations.count_documents({'user_id': _id})
-        review_count = db.reviews.count_documents({'user_id': str(_id)})
+        trip_count = count_with_archive(db, 'reservations', {'user_id': _id})
+        review_count = db.reviews.count_documents({'user_id': id_variants(_id)})
         
         # Construct response with stats and remove sensitive data
         response = {
@@ -76,10 +81,8 @@ def get_username_by_id(user_id):
 def get_current_user_profile():
     """Get current user's profile with statistics"""
     db = get_db()
-    current_username = get_jwt_identity()  # This returns username, not user_id
-    
-    # Get user data by username
-    user = db.users.find_one({'username': current_username})
+    # Get user data of the token's username
+    user = get_current_user(db)
     if not user:
         return jsonify({'error': 'User not found'}), 404
     
@@ -87,10 +90,10 @@ def get_current_user_profile():
     
     # Get statistics
     # Count trips (reservations)
-    trip_count = db.reservations.count_documents({'user_id': user_id})
+    trip_count = count_with_archive(db, 'reservations', {'user_id': user_id})
     
-    # Count reviews written by user (user_id is stored as string in reviews)
-    review_count = db.reviews.count_documents({'user_id': str(user_id)})
+    # Count reviews written by user (legacy reviews store user_id as string)
+    review_count = db.reviews.count_documents({'user_id': id_variants(user_id)})
     
     # Count listings if user is a host
     listing_count = 0
@@ -127,11 +130,10 @@ def get_current_user_profile():
 def update_current_user_profile():
     """Update current user's profile information"""
     db = get_db()
-    current_username = get_jwt_identity()  # This returns username, not user_id
     data = request.json
     
-    # Get user by username
-    user = db.users.find_one({'username': current_username})
+    # Get user of the token's username
+    user = get_current_identity(db)
     if not user:
         return jsonify({'error': 'User not found'}), 404
     
@@ -142,15 +144,15 @@ def update_current_user_profile():
     if not update_data:
         return jsonify({'error': 'No valid fields to update'}), 400
     
-    # Update user
-    result = db.users.update_one(
-        {'username': current_username},
-        {'$set': update_data}
+    # Update user and return the updated data
+    updated_user = db.users.find_one_and_update(
+        {'_id': user['_id']},
+        {'$set': update_data},
+        projection=CURRENT_USER_PROJECTION,
+        return_document=ReturnDocument.AFTER
     )
     
-    if result.matched_count:
-        # Return updated user data
-        updated_user = db.users.find_one({'username': current_username})
+    if updated_user:
         return Response(
             json_util.dumps(updated_user),
             mimetype="application/json"
@@ -172,9 +174,16 @@ def update_user(user_id):
     if not _id:
         return jsonify({'error': 'Invalid user ID'}), 400
     
-    result = db.users.update_one({'_id': _id}, {'$set': data})
+    update = {'$set': data}
+    if 'role' in data or 'is_admin' in data:
+        update['$inc'] = {'role_version': 1}
+    user = db.users.find_one_and_update({'_id': _id}, update, projection={'role': 1, 'username': 1})
 
-    if result.matched_count:
+    if user:
+        if 'role' in data and data['role'] != user.get('role'):
+            increment_stats(db, status_transition('users_by_role', data['role'], user.get('role')))
+        if 'role_version' in update.get('$inc', {}):
+            invalidate_identity(user.get('username'))
         return jsonify({'message': 'User updated'})
     else:
         return jsonify({'error': 'User not found'}), 404    
@@ -183,15 +192,24 @@ def update_user(user_id):
 @user_bp.route("/", methods=["GET"])
 @jwt_required()
 def get_users():
+    """
+    Keyset-paginated user list.
+    Query params: q, username, email, name (prefix search), role, ids,
+    sort (created, username, email or name), order (asc or desc), limit, cursor.
+    """
     db = get_db()
     
     if not is_admin(db):
         return jsonify({'error': 'Admin privileges required'}), 403
     
-    users = list(db.users.find({}))
+    params = get_keyset_params(request.args, USER_SORT_FIELDS, 'created')
+    if not params:
+        return jsonify({'error': 'Invalid sort or pagination parameters'}), 400
+    
+    users, next_cursor = keyset_page(db.users, build_user_filter(request.args), params, USER_LIST_PROJECTION)
     
     return Response(
-        json_util.dumps(users),
+        json_util.dumps({'users': users, 'next_cursor': next_cursor}),
         mimetype="application/json"
     )
 
@@ -207,8 +225,11 @@ def delete_user(user_id):
     if not _id:
         return jsonify({'error': 'Invalid user ID'}), 400
     
-    result = db.users.delete_one({'_id': _id})
-    if result.deleted_count:
+    user = db.users.find_one_and_delete({'_id': _id}, projection={'role': 1, 'username': 1})
+    if user:
+        increment_stats(db, {f"users_by_role.{user.get('role', 'user')}": -1})
+        enqueue_cascade(db, 'user', _id, username=user.get('username'))
+        invalidate_identity(user.get('username'))
         return jsonify({'message': 'User deleted'})
     else:
         return jsonify({'error': 'User not found'}), 404
@@ -225,8 +246,13 @@ def promote_user(user_id):
     if not _id:
         return jsonify({'error': 'Invalid user ID'}), 400
     
-    result = db.users.update_one({'_id': _id}, {'$set': {'role': 'host'}})
-    if result.matched_count:
+    user = db.users.find_one_and_update(
+        {'_id': _id}, {'$set': {'role': 'host'}, '$inc': {'role_version': 1}}, projection={'role': 1, 'username': 1}
+    )
+    if user:
+        invalidate_identity(user.get('username'))
+        if user.get('role') != 'host':
+            increment_stats(db, status_transition('users_by_role', 'host', user.get('role')))
         return jsonify({'message': 'User promoted to host'})
     else:
         return jsonify({'error': 'User not found'}), 404
@@ -243,8 +269,13 @@ def demote_user(user_id):
     if not _id:
         return jsonify({'error': 'Invalid user ID'}), 400
     
-    result = db.users.update_one({'_id': _id}, {'$set': {'role': 'user'}})
-    if result.matched_count:
+    user = db.users.find_one_and_update(
+        {'_id': _id}, {'$set': {'role': 'user'}, '$inc': {'role_version': 1}}, projection={'role': 1, 'username': 1}
+    )
+    if user:
+        invalidate_identity(user.get('username'))
+        if user.get('role') != 'user':
+            increment_stats(db, status_transition('users_by_role', 'user', user.get('role')))
         return jsonify({'message': 'User demoted to regular user'})
     else:
         return jsonify({'error': 'User not found'}), 404
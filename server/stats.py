@@ -0,0 +1,77 @@
+# NOTE: Materialized platform statistics for the admin dashboard.
+#
+# Write handlers keep the counters up to date with small $inc updates, and
+# jobs/reconcile_stats.py periodically recomputes them with aggregations to
+# repair any drift (failed hooks, manual edits, legacy data).
+#
+# PLATFORM_STATS TABLE (single document)
+#------------------------------
+# _id: "platform"
+# users_by_role: dict -> {role: count}
+# listings_by_status: dict -> {status: count}
+# reservations_by_status: dict -> {status: count}
+# payments: dict -> {count, gmv} (successful payments only)
+# reviews: dict -> {count, rating_sum}
+# reconciled_at: datetime -> last full recomputation
+#
+# PLATFORM_STATS_DAILY TABLE
+#------------------------------
+# _id: str -> "YYYY-MM-DD" (UTC)
+# reservations: dict -> {status: reservations moved into that status that day}
+# payments: dict -> {count, gmv}
+# reviews: dict -> {count}
+# users: dict -> {registered}
+# listings: dict -> {created}
+
+from collections import Counter
+from datetime import datetime, timezone
+
+STATS_ID = 'platform'
+
+
+def today_key():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d')
+
+
+def increment_stats(db, totals=None, daily=None):
+    """Apply $inc updates to the platform document and to today's daily document."""
+    totals = {k: v for k, v in (totals or {}).items() if v}
+    daily = {k: v for k, v in (daily or {}).items() if v}
+    if totals:
+        db.platform_stats.update_one({'_id': STATS_ID}, {'$inc': totals}, upsert=True)
+    if daily:
+        db.platform_stats_daily.update_one({'_id': today_key()}, {'$inc': daily}, upsert=True)
+
+
+def status_transition(group, new_status, previous=None, count=1):
+    """
+    $inc fields for moving documents into `new_status`.
+
+    Args:
+        group: counter group, e.g. "reservations_by_status"
+        new_status: status the documents now have (None for deletions)
+        previous: previous status, or a list with one previous status per document
+        count: number of documents (ignored when previous is a list)
+    """
+    inc = Counter()
+    if isinstance(previous, (list, tuple)):
+        count = len(previous)
+        for status in previous:
+            if status:
+                inc[f'{group}.{status}'] -= 1
+    elif previous:
+        inc[f'{group}.{previous}'] -= count
+    if new_status:
+        inc[f'{group}.{new_status}'] += count
+    return dict(inc)
+
+
+def get_platform_stats(db, days=30):
+    """Platform counters plus the most recent `days` daily documents."""
+    stats = db.platform_stats.find_one({'_id': STATS_ID}) or {}
+    stats.pop('_id', None)
+    daily = list(db.platform_stats_daily.find({}).sort('_id', -1).limit(days))
+    for doc in daily:
+        doc['date'] = doc.pop('_id')
+    stats['daily'] = daily[::-1]
+    return stats
@@ -0,0 +1,114 @@
+# NOTE: Per-user change log for incremental messaging sync (GET /api/messages/sync).
+#
+# Every write that changes what a user sees in messaging (new, edited or deleted
+# message, conversation summary change) appends one entry per affected user,
+# numbered by that user's own counter. A client stores the last seq it applied
+# and asks only for entries after it.
+#
+# SYNC_COUNTERS TABLE
+#------------------------------
+# _id: str -> username
+# seq: int -> last sequence number handed out
+#
+# SYNC_CHANGES TABLE
+#------------------------------
+# username: str
+# seq: int -> unique and increasing per username
+# message_id: ObjectId -> changed message (optional)
+# conversation_id: ObjectId -> changed conversation summary (optional)
+# deleted: bool -> the message was deleted
+# created_at: datetime -> entries expire after SYNC_RETENTION_DAYS (TTL index)
+
+from datetime import datetime, timedelta, timezone
+from pymongo import ReturnDocument
+
+SYNC_RETENTION_DAYS = 30
+# A missing seq younger than this may still be in flight (its counter was
+# incremented but the entry not inserted yet); older gaps are permanent
+GAP_GRACE_SECONDS = 5
+
+
+def next_seqs(db, username, count=1):
+    """Reserve `count` consecutive sequence numbers for `username`."""
+    counter = db.sync_counters.find_one_and_update(
+        {'_id': username},
+        {'$inc': {'seq': count}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return range(counter['seq'] - count + 1, counter['seq'] + 1)
+
+
+def record_change_batch(db, changes):
+    """
+    Append change entries given as dicts with username and optionally
+    message_id, conversation_id and deleted; one counter update per user.
+    """
+    by_user = {}
+    for change in changes:
+        if change.get('username'):
+            by_user.setdefault(change['username'], []).append(change)
+
+    now = datetime.now(timezone.utc)
+    entries = []
+    for username, user_changes in by_user.items():
+        for seq, change in zip(next_seqs(db, username, len(user_changes)), user_changes):
+            entries.append({
+                'username': username,
+                'seq': seq,
+                'message_id': change.get('message_id'),
+                'conversation_id': change.get('conversation_id'),
+                'deleted': change.get('deleted', False),
+                'created_at': now
+            })
+    if entries:
+        db.sync_changes.insert_many(entries, ordered=False)
+
+
+def record_changes(db, usernames, message_id=None, conversation_id=None, deleted=False):
+    """Append the same change entry for each user in `usernames`."""
+    record_change_batch(db, [
+        {'username': username, 'message_id': message_id, 'conversation_id': conversation_id, 'deleted': deleted}
+        for username in set(usernames)
+    ])
+
+
+def get_changes(db, username, since, limit):
+    """
+    Change entries of `username` with seq > since, oldest first.
+
+    Entries are returned only up to a gap that may still be filled, so a
+    client never moves its cursor past a change it has not seen.
+
+    Returns:
+        (entries, has_more, reset) where reset means entries after `since`
+        have expired and the client must reload everything.
+    """
+    candidates = list(
+        db.sync_changes.find({'username': username, 'seq': {'$gt': since}}).sort('seq', 1).limit(limit + 1)
+    )
+    has_more = len(candidates) > limit
+    grace_cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=GAP_GRACE_SECONDS)
+
+    entries = []
+    reset = False
+    expected = since + 1
+    for entry in candidates[:limit]:
+        if entry['seq'] != expected:
+            created_at = entry['created_at'].replace(tzinfo=None)
+            if created_at > grace_cutoff:
+                # A concurrent write may still insert the missing entry
+                has_more = True
+                break
+            if not entries and since:
+                # The oldest entries after `since` expired
+                reset = True
+                break
+        entries.append(entry)
+        expected = entry['seq'] + 1
+
+    if not candidates and since:
+        # Nothing retained after `since`: fine unless the counter moved past it
+        counter = db.sync_counters.find_one({'_id': username}) or {'seq': 0}
+        reset = counter['seq'] > since
+    return ([] if reset else entries), has_more, reset
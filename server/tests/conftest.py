@@ -0,0 +1,113 @@
+# NOTE: Test fixtures: the Flask app on an in-memory MongoDB (mongomock).
+#
+# Run from the server/ directory:
+#   pip install -r requirements-dev.txt
+#   python -m pytest -q
+#
+# db.py connects at import time, so the config file and the MongoClient patch
+# are set up before any application module is imported.
+
+import os
+import sys
+import tempfile
+import pytest
+from bson.objectid import ObjectId
+
+mongomock = pytest.importorskip('mongomock')
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+_config = tempfile.NamedTemporaryFile('w', suffix='.ini', delete=False)
+_config.write(
+    '[PROD]\n'
+    'SECRET_KEY=test-secret-key-long-enough-for-hs256\n'
+    'MONGO_URI=mongodb://localhost/itubnb_test\n'
+    # Spawned hashing processes would re-import the test modules
+    'PASSWORD_HASH_WORKERS=0\n'
+)
+_config.close()
+os.environ['ITUBNB_CONFIG'] = _config.name
+os.environ.setdefault('GOOGLE_GENAI_API_KEY', 'test')
+mongomock.patch(servers=(('localhost', 27017),)).start()
+
+# Newer pymongo passes `sort` to bulk updates, which mongomock does not take
+_add_update = mongomock.collection.BulkOperationBuilder.add_update
+mongomock.collection.BulkOperationBuilder.add_update = (
+    lambda self, *args, sort=None, **kwargs: _add_update(self, *args, **kwargs)
+)
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+import app as app_module  # noqa: E402
+from db import get_db  # noqa: E402
+from contacts import contacts_cache  # noqa: E402
+from identity import role_version_cache  # noqa: E402
+from availability import availability_cache  # noqa: E402
+from analytics import analytics_cache  # noqa: E402
+
+CACHES = [contacts_cache, role_version_cache, availability_cache, analytics_cache]
+PASSWORD = 'secret1'
+
+
+@pytest.fixture(scope='session')
+def app():
+    app = app_module.create_app()
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def db(app):
+    db = get_db()
+    yield db
+    for name in db.list_collection_names():
+        db.drop_collection(name)
+    for cache in CACHES:
+        cache.clear()
+
+
+@pytest.fixture
+def client(app, db):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(db):
+    def make_user(username, role='user'):
+        user = {
+            'username': username,
+            'name': username.title(),
+            'email': f'{username}@example.com',
+            'password': generate_password_hash(PASSWORD),
+            'role': role
+        }
+        user['_id'] = db.users.insert_one(user).inserted_id
+        return user
+    return make_user
+
+
+@pytest.fixture
+def auth(app):
+    """Authorization header for `user`, with the claims login would add."""
+    from identity import identity_claims
+
+    def auth(user):
+        with app.app_context():
+            token = create_access_token(identity=user['username'], additional_claims=identity_claims(user))
+        return {'Authorization': f'Bearer {token}'}
+    return auth
+
+
+@pytest.fixture
+def listing(client, db, make_user, auth):
+    """An approved listing of a new host; returns (listing_id, host)."""
+    host = make_user('host', role='host')
+    response = client.post('/api/listings/', headers=auth(host), json={
+        'title': 'Flat', 'description': 'Sea view', 'price': 100, 'city': 'Istanbul',
+        'property_type': 'apartment', 'amenities': [], 'details': {}, 'nearby': [], 'images': ['a.jpg']
+    })
+    assert response.status_code == 201
+    listing_id = response.get_json()['_id']
+    db.listings.update_one({'_id': ObjectId(listing_id)}, {'$set': {'status': 'approved'}})
+    return listing_id, host
@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+from archive import archive_name
+
+
+def _walk(client, path, headers, key, **params):
+    """Every page of an admin list, following next_cursor."""
+    items, cursor = [], None
+    while True:
+        body = client.get(path, headers=headers, query_string={**params, **({'cursor': cursor} if cursor else {})}).get_json()
+        items += body[key]
+        cursor = body['next_cursor']
+        if not cursor:
+            return items
+
+
+def test_reservations_are_paged_across_tiers(client, db, make_user, auth):
+    admin = make_user('admin', role='admin')
+    start = datetime(2030, 1, 1)
+    db.reservations.insert_many([
+        {'status': 'upcoming' if i % 2 else 'cancelled', 'start_date': start, 'end_date': start + timedelta(days=2)}
+        for i in range(5)
+    ])
+    db[archive_name('reservations')].insert_one({'status': 'past', 'start_date': start, 'end_date': start})
+
+    first = client.get('/api/reservations/', headers=auth(admin), query_string={'limit': 2}).get_json()
+    every = _walk(client, '/api/reservations/', auth(admin), 'reservations', limit=2)
+    upcoming = _walk(client, '/api/reservations/', auth(admin), 'reservations', limit=2, status='upcoming')
+
+    assert len(first['reservations']) == 2 and first['next_cursor']
+    assert len(every) == 6 and len({r['_id']['$oid'] for r in every}) == 6
+    assert [r['status'] for r in upcoming] == ['upcoming', 'upcoming']
+
+
+def test_reviews_are_paged_with_their_authors(client, db, make_user, auth):
+    admin, guest = make_user('admin', role='admin'), make_user('guest')
+    now = datetime.utcnow()
+    db.reviews.insert_many([
+        {'user_id': guest['_id'], 'rating': 4, 'comment': str(i), 'created_at': now - timedelta(minutes=i)}
+        for i in range(3)
+    ])
+
+    reviews = _walk(client, '/api/reviews/', auth(admin), 'reviews', limit=2)
+
+    assert [r['comment'] for r in reviews] == ['0', '1', '2']
+    assert all(r['user']['username'] == 'guest' for r in reviews)
+
+
+def test_admin_lists_require_admin(client, make_user, auth):
+    headers = auth(make_user('guest'))
+    assert client.get('/api/reservations/', headers=headers).status_code == 403
+    assert client.get('/api/reviews/', headers=headers).status_code == 403
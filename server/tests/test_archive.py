@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta
+from bson.objectid import ObjectId
+from archive import archive_name
+
+
+def test_history_merges_string_and_date_timestamps_across_tiers(client, db, make_user, auth):
+    user = make_user('guest')
+    old = datetime.utcnow() - timedelta(days=800)
+    db[archive_name('messages')].insert_many([
+        {'conversation_id': 'c1', 'content': 'first', 'created_at': old},
+        {'conversation_id': 'c1', 'content': 'second', 'created_at': (old + timedelta(days=1)).isoformat()},
+    ])
+    db.messages.insert_one({'conversation_id': 'c1', 'content': 'third', 'created_at': datetime.utcnow()})
+
+    response = client.get('/api/conversations/messages/c1', headers=auth(user))
+
+    assert response.status_code == 200
+    assert [m['content'] for m in response.get_json()['messages']] == ['first', 'second', 'third']
+
+
+def test_archived_reservations_keep_contacts_available(client, db, make_user, auth):
+    guest, host = make_user('guest'), make_user('host', role='host')
+    db[archive_name('reservations')].insert_one({
+        '_id': ObjectId(), 'user_id': guest['_id'], 'host_id': host['_id'], 'listing_id': ObjectId(),
+        'status': 'past', 'start_date': datetime(2020, 1, 1), 'end_date': datetime(2020, 1, 4)
+    })
+
+    response = client.get('/api/messages/conversations', headers=auth(guest))
+
+    assert response.status_code == 200
+    assert [c['username'] for c in response.get_json()] == ['host']
@@ -0,0 +1,126 @@
+import threading
+from datetime import datetime
+from bson.objectid import ObjectId
+from mongomock.collection import Collection
+from availability import hold_dates, ACTIVE_STATUSES
+
+THREADS = 16
+
+
+def run_concurrently(target, count=THREADS):
+    """Call target(i) from `count` threads released at the same time; returns the results."""
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def worker(i):
+        barrier.wait()
+        results[i] = target(i)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_holds_for_overlapping_nights(db):
+    listing_id = ObjectId()
+
+    def hold(i):
+        # Every interval contains the night of Jan 5th
+        return hold_dates(db, listing_id, ObjectId(), datetime(2030, 1, 1 + i % 5), datetime(2030, 1, 6 + i % 3))
+
+    results = run_concurrently(hold)
+
+    assert results.count(True) == 1
+    assert len(db.listing_calendars.find_one({'_id': listing_id})['booked']) == 1
+
+
+def test_concurrent_create_reservation_for_same_nights(app, db, listing, make_user, auth):
+    listing_id, _ = listing
+    guests = [make_user(f'guest{i}') for i in range(THREADS)]
+
+    def book(i):
+        response = app.test_client().post('/api/reservations/', headers=auth(guests[i]), json={
+            'user_id': str(guests[i]['_id']), 'listing_id': listing_id,
+            'start_date': '2030-01-01', 'end_date': '2030-01-04', 'total_price': 300, 'guests': 2
+        })
+        return response.status_code
+
+    results = run_concurrently(book)
+
+    assert results.count(201) == 1
+    assert results.count(409) == THREADS - 1
+    assert len(db.listing_calendars.find_one({'_id': ObjectId(listing_id)})['booked']) == 1
+    assert db.reservations.count_documents({'status': {'$in': ACTIVE_STATUSES}}) == 1
+
+
+def test_declined_reservation_cannot_be_accepted_after_rebooking(client, db, listing, make_user, auth):
+    listing_id, host = listing
+    first, second = make_user('guest1'), make_user('guest2')
+
+    def book(guest):
+        return client.post('/api/reservations/', headers=auth(guest), json={
+            'user_id': str(guest['_id']), 'listing_id': listing_id,
+            'start_date': '2030-01-01', 'end_date': '2030-01-04', 'total_price': 300, 'guests': 2
+        })
+
+    first_id = book(first).get_json()['_id']
+    assert client.post(f'/api/reservations/{first_id}/decline', headers=auth(host)).status_code == 200
+    assert book(second).status_code == 201
+
+    response = client.post(f'/api/reservations/{first_id}/accept', headers=auth(host))
+
+    assert response.status_code == 409
+    assert db.reservations.count_documents({'status': {'$in': ACTIVE_STATUSES}}) == 1
+
+
+def test_availability_read_between_hold_and_insert_is_not_cached(client, db, listing, make_user, auth, monkeypatch):
+    listing_id, _ = listing
+    guest = make_user('guest')
+    path = f'/api/listings/{listing_id}/availability?from=2030-01-01&to=2030-02-01'
+    insert_one = Collection.insert_one
+
+    def read_then_insert(self, document, *args, **kwargs):
+        # A date picker asks for availability after the hold, before the insert
+        if self.name == 'reservations':
+            assert client.get(path).get_json()['booked'] == []
+        return insert_one(self, document, *args, **kwargs)
+
+    monkeypatch.setattr(Collection, 'insert_one', read_then_insert)
+    response = client.post('/api/reservations/', headers=auth(guest), json={
+        'user_id': str(guest['_id']), 'listing_id': listing_id,
+        'start_date': '2030-01-05', 'end_date': '2030-01-08', 'total_price': 300, 'guests': 2
+    })
+
+    assert response.status_code == 201
+    assert client.get(path).get_json()['booked'] == [{'start_date': '2030-01-05', 'end_date': '2030-01-08'}]
+
+
+def test_accept_declines_only_requests_still_pending(client, db, listing, make_user, auth, monkeypatch):
+    listing_id, host = listing
+    listing_id = ObjectId(listing_id)
+    stay = {'listing_id': listing_id, 'host_id': host['_id'],
+            'start_date': datetime(2030, 1, 1), 'end_date': datetime(2030, 1, 4)}
+    # Legacy overlapping requests, booked before the calendar guard existed
+    accepted, paid, declined = db.reservations.insert_many([dict(stay, status='pending') for _ in range(3)]).inserted_ids
+    db.listing_calendars.insert_one({'_id': listing_id, 'booked': [
+        {'reservation_id': _id, **{k: stay[k] for k in ('start_date', 'end_date')}} for _id in (accepted, paid, declined)
+    ]})
+    update_many = Collection.update_many
+
+    def paid_meanwhile(self, filter, *args, **kwargs):
+        # One request gets paid between the read and the update
+        if self.name == 'reservations':
+            db.reservations.update_one({'_id': paid}, {'$set': {'status': 'confirmed'}})
+        return update_many(self, filter, *args, **kwargs)
+
+    monkeypatch.setattr(Collection, 'update_many', paid_meanwhile)
+    response = client.post(f'/api/reservations/{accepted}/accept', headers=auth(host))
+
+    assert response.status_code == 200
+    assert response.get_json()['auto_declined'] == [str(declined)]
+    assert [e['reservation_id'] for e in db.reservation_events.find({'status': 'declined'})] == [declined]
+    held = {b['reservation_id'] for b in db.listing_calendars.find_one({'_id': listing_id})['booked']}
+    assert held == {accepted, paid}
@@ -0,0 +1,32 @@
+import json
+from datetime import datetime, timedelta
+from pubsub import get_hub, SUBSCRIPTION_QUEUE_SIZE
+
+
+def test_broadcast_publishes_one_summary_to_the_host(client, db, make_user, auth):
+    host = make_user('host', role='host')
+    start = datetime.utcnow() + timedelta(days=30)
+    guests = [{'username': f'guest{i}', 'name': f'Guest {i}'} for i in range(SUBSCRIPTION_QUEUE_SIZE + 5)]
+    db.users.insert_many(guests)
+    db.reservations.insert_many([{
+        'user_id': guest['_id'], 'host_id': host['_id'], 'listing_id': host['_id'],
+        'status': 'confirmed', 'start_date': start, 'end_date': start + timedelta(days=3)
+    } for guest in guests])
+    hub = get_hub()
+    host_stream, guest_stream = hub.subscribe('user:host'), hub.subscribe('user:guest0')
+
+    try:
+        response = client.post('/api/messages/broadcast', headers=auth(host), json={'content': 'New door code'})
+
+        assert response.status_code == 201
+        assert response.get_json()['sent'] == len(guests)
+        assert not host_stream.overflowed
+        summary = host_stream.get(timeout=0)
+        assert summary['type'] == 'broadcast'
+        assert summary['id'] == response.get_json()['message_ids'][-1]
+        assert len(json.loads(summary['data'])['recipients']) == len(guests)
+        assert host_stream.get(timeout=0) is None
+        assert guest_stream.get(timeout=0)['type'] == 'message'
+    finally:
+        host_stream.close()
+        guest_stream.close()
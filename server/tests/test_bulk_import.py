@@ -0,0 +1,28 @@
+import json
+
+LISTING = {
+    'title': 'Flat', 'description': 'Sea view', 'price': 100, 'city': 'Istanbul',
+    'property_type': 'apartment', 'amenities': [], 'details': {}, 'nearby': [], 'images': ['a.jpg']
+}
+
+
+def test_malformed_extended_json_is_reported_per_line(client, db, make_user, auth):
+    host = make_user('host', role='host')
+    lines = [
+        json.dumps(LISTING),
+        '{"_id": {"$oid": "not-an-object-id"}}',
+        '{"created_at": {"$date": [1]}}',
+        '{"created_at": {"$date": 1e400}}',
+        '{"price": {"$numberDecimal": "abc"}}',
+        '{"title": ',
+        json.dumps(LISTING),
+    ]
+
+    response = client.post('/api/listings/bulk', headers=auth(host), data='\n'.join(lines),
+                           content_type='application/x-ndjson')
+
+    assert response.status_code == 201
+    body = response.get_json()
+    assert body['inserted'] == 2
+    assert body['errors'] == [{'line': line, 'error': 'Invalid JSON'} for line in range(2, 7)]
+    assert db.listings.count_documents({}) == 2
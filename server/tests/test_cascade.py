@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from bson.objectid import ObjectId
+from mongomock.collection import Collection
+from cascade import enqueue_cascade
+import jobs.cascade_deletes as cascade_deletes
+from jobs.cascade_deletes import process_cascade_tasks, MAX_ATTEMPTS
+
+
+@pytest.fixture
+def broken_listing_steps(monkeypatch):
+    """Listing tasks raise; user tasks run as usual."""
+    def broken(db, task, batch_size):
+        def fail():
+            raise RuntimeError('boom')
+        return [('fail', fail)]
+    monkeypatch.setitem(cascade_deletes.STEPS, 'listing', broken)
+
+
+def test_failing_task_is_retried_later_without_blocking_the_queue(db, broken_listing_steps):
+    enqueue_cascade(db, 'listing', ObjectId())
+    enqueue_cascade(db, 'user', ObjectId(), username='gone')
+
+    assert process_cascade_tasks(db) == 1
+
+    failed = db.cascade_tasks.find_one({'kind': 'listing'})
+    assert failed['status'] == 'pending'
+    assert failed['attempts'] == 1
+    assert 'boom' in failed['last_error']
+    assert failed['next_run_at'].replace(tzinfo=timezone.utc) > datetime.now(timezone.utc)
+    assert db.cascade_tasks.find_one({'kind': 'user'})['status'] == 'done'
+    # Not due yet: the next pass leaves it alone
+    assert process_cascade_tasks(db) == 0
+    assert db.cascade_tasks.find_one({'kind': 'listing'})['attempts'] == 1
+
+
+def test_task_is_set_aside_after_max_attempts(db, broken_listing_steps):
+    enqueue_cascade(db, 'listing', ObjectId())
+
+    for _ in range(MAX_ATTEMPTS):
+        db.cascade_tasks.update_many({}, {'$set': {'next_run_at': datetime.now(timezone.utc) - timedelta(seconds=1)}})
+        process_cascade_tasks(db)
+
+    task = db.cascade_tasks.find_one()
+    assert task['status'] == 'failed'
+    assert task['attempts'] == MAX_ATTEMPTS
+
+
+def test_tasks_queued_without_next_run_at_still_run(db):
+    db.cascade_tasks.insert_one({
+        'kind': 'user', 'target_id': ObjectId(), 'status': 'pending', 'steps_done': [],
+        'created_at': datetime.now(timezone.utc)
+    })
+
+    assert process_cascade_tasks(db) == 1
+    assert db.cascade_tasks.find_one()['status'] == 'done'
+
+
+def test_cancel_skips_reservations_that_left_active_statuses(db, monkeypatch):
+    listing_id = ObjectId()
+    stay = {'listing_id': listing_id, 'host_id': ObjectId(),
+            'start_date': datetime(2030, 1, 1), 'end_date': datetime(2030, 1, 4)}
+    expired, upcoming = db.reservations.insert_many([dict(stay, status='unpaid'), dict(stay, status='upcoming')]).inserted_ids
+    update_many = Collection.update_many
+
+    def expired_meanwhile(self, filter, *args, **kwargs):
+        # The lifecycle job expires the hold between the cascade's read and its update
+        if self.name == 'reservations' and '$in' in str(filter.get('_id')):
+            db.reservations.update_one({'_id': expired, 'status': 'unpaid'}, {'$set': {'status': 'expired'}})
+        return update_many(self, filter, *args, **kwargs)
+
+    monkeypatch.setattr(Collection, 'update_many', expired_meanwhile)
+    enqueue_cascade(db, 'listing', listing_id)
+    process_cascade_tasks(db)
+
+    assert db.reservations.find_one({'_id': expired})['status'] == 'expired'
+    assert db.reservations.find_one({'_id': upcoming})['status'] == 'cancelled'
+    assert [e['reservation_id'] for e in db.reservation_events.find({'status': 'cancelled'})] == [upcoming]
+    stats = db.platform_stats.find_one()['reservations_by_status']
+    assert stats == {'upcoming': -1, 'cancelled': 1}
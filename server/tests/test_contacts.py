@@ -0,0 +1,45 @@
+from datetime import datetime
+from bson.objectid import ObjectId
+from archive import archive_name
+from contacts import add_contact, remove_contact, get_contacts, can_message, contact_pair_id
+
+
+def test_counters_and_cache_follow_reservations(db):
+    guest, host = ObjectId(), ObjectId()
+    # Cached before the first reservation
+    assert get_contacts(db, guest) == frozenset()
+
+    add_contact(db, guest, host)
+    add_contact(db, guest, host)
+    assert db.contact_pairs.find_one({'_id': contact_pair_id(guest, host)})['reservations'] == 2
+    assert get_contacts(db, guest) == {str(host)}
+    assert get_contacts(db, host) == {str(guest)}
+
+    remove_contact(db, guest, host)
+    assert db.contact_pairs.find_one({'_id': contact_pair_id(guest, host)})['reservations'] == 1
+    assert get_contacts(db, host) == {str(guest)}
+
+    remove_contact(db, guest, host)
+    assert db.contact_pairs.find_one({'_id': contact_pair_id(guest, host)}) is None
+    assert get_contacts(db, guest) == frozenset()
+    assert get_contacts(db, host) == frozenset()
+
+
+def test_self_and_missing_ids_are_ignored(db):
+    user = ObjectId()
+    add_contact(db, user, user)
+    add_contact(db, user, None)
+    remove_contact(db, None, user)
+    assert db.contact_pairs.count_documents({}) == 0
+
+
+def test_can_message_falls_back_to_archived_reservations(db):
+    guest, host = ObjectId(), ObjectId()
+    assert not can_message(db, guest, host)
+
+    db[archive_name('reservations')].insert_one({
+        'user_id': guest, 'host_id': host, 'status': 'past',
+        'start_date': datetime(2020, 1, 1), 'end_date': datetime(2020, 1, 4)
+    })
+    assert can_message(db, guest, host)
+    assert can_message(db, host, guest)
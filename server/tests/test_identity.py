@@ -0,0 +1,96 @@
+import threading
+from datetime import datetime
+import pytest
+from bson.objectid import ObjectId
+from mongomock.collection import Collection
+from identity import role_version_cache
+
+READ_METHODS = ['find', 'find_one', 'find_one_and_update', 'count_documents', 'aggregate']
+
+
+@pytest.fixture
+def users_queries(monkeypatch):
+    """Filters of the queries sent to `users`, nested mongomock calls counted once."""
+    queries = []
+    local = threading.local()
+
+    def counting(method):
+        def wrapper(self, *args, **kwargs):
+            depth = getattr(local, 'depth', 0)
+            if self.name == 'users' and depth == 0:
+                queries.append(args[0] if args else kwargs.get('filter'))
+            local.depth = depth + 1
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                local.depth = depth
+        return wrapper
+
+    for name in READ_METHODS:
+        monkeypatch.setattr(Collection, name, counting(getattr(Collection, name)))
+    return queries
+
+
+@pytest.fixture
+def reviewer(db, make_user):
+    user = make_user('guest')
+    listing_id = ObjectId()
+    db.listings.insert_one({'_id': listing_id, 'title': 'Flat', 'status': 'approved'})
+    reservation_id = db.reservations.insert_one({
+        'user_id': user['_id'], 'host_id': ObjectId(), 'listing_id': listing_id,
+        'start_date': datetime(2030, 1, 1), 'end_date': datetime(2030, 1, 4),
+        'total_price': 300, 'status': 'unpaid'
+    }).inserted_id
+    review_id = db.reviews.insert_one({
+        'reservation_id': reservation_id, 'user_id': user['_id'], 'property_id': listing_id,
+        'rating': 4, 'comment': '', 'created_at': datetime.utcnow()
+    }).inserted_id
+    return user, reservation_id, review_id
+
+
+def _requests(reservation_id, review_id):
+    return [
+        ('put', f'/api/reviews/{review_id}', {'rating': 5}, 200),
+        ('post', '/api/payment/process', {
+            'card_number': '4242424242424242', 'card_holder': 'Guest', 'expiry': '12/35',
+            'cvv': '123', 'reservation_id': str(reservation_id), 'amount': 300
+        }, 201),
+        ('delete', f'/api/reviews/{review_id}', None, 200),
+    ]
+
+
+@pytest.mark.parametrize('role_cached', [False, True])
+def test_caller_is_loaded_at_most_once_per_request(client, reviewer, auth, users_queries, role_cached):
+    user, reservation_id, review_id = reviewer
+    headers = auth(user)
+    if role_cached:
+        role_version_cache.set(user['username'], 'role_version', user.get('role_version', 0))
+
+    for method, path, body, expected_status in _requests(reservation_id, review_id):
+        if not role_cached:
+            role_version_cache.clear()
+        users_queries.clear()
+
+        response = getattr(client, method)(path, headers=headers, json=body)
+
+        assert response.status_code == expected_status, path
+        # One load on a role_version cache miss, none while it is cached
+        assert len(users_queries) <= 1, (path, users_queries)
+        if role_cached:
+            assert users_queries == [], path
+
+
+def test_token_without_claims_loads_caller_once(client, app, reviewer, users_queries):
+    from flask_jwt_extended import create_access_token
+    user, reservation_id, review_id = reviewer
+    with app.app_context():
+        headers = {'Authorization': f"Bearer {create_access_token(identity=user['username'])}"}
+
+    for method, path, body, expected_status in _requests(reservation_id, review_id):
+        role_version_cache.clear()
+        users_queries.clear()
+
+        response = getattr(client, method)(path, headers=headers, json=body)
+
+        assert response.status_code == expected_status, path
+        assert len(users_queries) == 1, (path, users_queries)
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+from inbox import dm_conversation_id, record_message, serialize_inbox_entry
+from jobs.backfill_conversations import rebuild_last_messages
+
+
+def _pair(db):
+    guest = {'username': 'guest', 'name': 'Guest', 'role': 'user'}
+    host = {'username': 'host', 'name': 'Host', 'role': 'host'}
+    db.users.insert_many([guest, host])
+    db.reservations.insert_one({'user_id': guest['_id'], 'host_id': host['_id'], 'status': 'confirmed'})
+    return guest, host
+
+
+def _inbox(client, headers):
+    response = client.get('/api/conversations/', headers=headers)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_messages_update_the_summary_and_opening_resets_unread(client, db, auth):
+    guest, host = _pair(db)
+    for content in ('Hi', 'When is check-in?'):
+        response = client.post('/api/messages/', headers=auth(guest),
+                               json={'receiver_username': 'host', 'content': content})
+        assert response.status_code == 201
+
+    [entry] = _inbox(client, auth(host))
+    assert entry['username'] == 'guest'
+    assert entry['last_message']['content'] == 'When is check-in?'
+    assert entry['last_message']['sender_username'] == 'guest'
+    assert entry['unread_count'] == 2
+    assert _inbox(client, auth(guest))[0]['unread_count'] == 0
+
+    assert client.get('/api/messages/dm/guest', headers=auth(host)).status_code == 200
+    assert _inbox(client, auth(host))[0]['unread_count'] == 0
+
+
+def test_record_message_and_serialize_inbox_entry(db):
+    guest, host = _pair(db)
+    now = datetime.utcnow()
+    message = {'_id': 'm1', 'conversation_id': dm_conversation_id('guest', 'host'),
+               'content': 'Hi', 'created_at': now}
+    conversation = record_message(db, guest, host, message)
+
+    entry = serialize_inbox_entry(conversation, host['_id'])
+    assert entry['username'] == 'guest'
+    assert entry['unread_count'] == 1
+    assert serialize_inbox_entry({'_id': 'c1', 'participants': []}, host['_id'])['last_message'] is None
+
+
+def test_backfill_keeps_a_newer_last_message(db):
+    guest, host = _pair(db)
+    dm_id = dm_conversation_id('guest', 'host')
+    old = datetime.utcnow() - timedelta(hours=1)
+    db.messages.insert_one({'conversation_id': dm_id, 'sender_username': 'guest', 'receiver_username': 'host',
+                            'content': 'Old', 'created_at': old})
+    # Sent after the aggregation read its snapshot
+    newer = {'_id': 'm2', 'conversation_id': dm_id, 'content': 'New', 'created_at': datetime.utcnow()}
+    record_message(db, host, guest, newer)
+
+    assert rebuild_last_messages(db) == 0
+    assert db.conversations.find_one({'dm_id': dm_id})['last_message']['content'] == 'New'
+
+    db.conversations.delete_many({})
+    assert rebuild_last_messages(db) == 1
+    summary = db.conversations.find_one({'dm_id': dm_id})
+    assert summary['last_message']['content'] == 'Old'
+    assert summary['participant_ids'] == [guest['_id'], host['_id']]
@@ -0,0 +1,25 @@
+import pytest
+from bson.objectid import ObjectId
+from helpers import keyset_page
+
+
+@pytest.mark.parametrize('direction', [1, -1])
+def test_keyset_pages_include_missing_values(db, direction):
+    names = ['ann', None, 'bob', 'cem', None, 'dan', 'eda', None]
+    for name in names:
+        user = {'_id': ObjectId()}
+        if name is not None:
+            user['name'] = name
+        db.users.insert_one(user)
+
+    seen, after = [], None
+    while True:
+        params = {'sort_field': 'name', 'direction': direction, 'limit': 2, 'after': after}
+        docs, cursor = keyset_page(db.users, {}, params)
+        seen += docs
+        if not cursor:
+            break
+        after = (docs[-1].get('name'), docs[-1]['_id'])
+
+    assert len(seen) == len(names)
+    assert len({doc['_id'] for doc in seen}) == len(names)
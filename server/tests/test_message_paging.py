@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+from archive import archive_name
+from inbox import dm_conversation_id
+
+DM_ID = dm_conversation_id('guest', 'host')
+
+
+def _messages(db):
+    """Seven messages a day apart, the two oldest archived; returns their contents, oldest first."""
+    start = datetime.utcnow() - timedelta(days=400)
+    docs = [{
+        'conversation_id': DM_ID, 'sender_username': 'host', 'receiver_username': 'guest',
+        'content': f'm{i}', 'created_at': start + timedelta(days=i * (60 if i > 1 else 1))
+    } for i in range(7)]
+    db[archive_name('messages')].insert_many(docs[:2])
+    db.messages.insert_many(docs[2:])
+    return [doc['content'] for doc in docs]
+
+
+def _page(client, headers, url):
+    response = client.get(url, headers=headers)
+    assert response.status_code == 200
+    page = response.get_json()
+    return [m['content'] for m in page['messages']], page
+
+
+def test_walks_back_and_forward_with_cursors(client, db, auth):
+    guest = {'username': 'guest', 'name': 'Guest', 'role': 'user'}
+    db.users.insert_one(guest)
+    contents = _messages(db)
+    headers = auth(guest)
+
+    newest, page = _page(client, headers, '/api/messages/dm/host?limit=3')
+    assert newest == contents[4:] and page['has_more']
+    middle, page = _page(client, headers, f"/api/messages/dm/host?limit=3&before={page['before']}")
+    assert middle == contents[1:4] and page['has_more']
+    oldest, page = _page(client, headers, f"/api/messages/dm/host?limit=3&before={page['before']}")
+    assert oldest == contents[:1] and not page['has_more'] and page['before'] is None
+
+    forward, page = _page(client, headers, f"/api/messages/dm/host?limit=4&after={page['after']}")
+    assert forward == contents[1:5] and page['has_more']
+    forward, page = _page(client, headers, f"/api/messages/dm/host?limit=4&after={page['after']}")
+    assert forward == contents[5:] and not page['has_more']
+
+
+def test_conversation_messages_are_paged(client, db, auth):
+    guest = {'username': 'guest', 'name': 'Guest', 'role': 'user'}
+    db.users.insert_one(guest)
+    contents = _messages(db)
+    headers = auth(guest)
+
+    newest, page = _page(client, headers, f'/api/conversations/messages/{DM_ID}?limit=5')
+    assert newest == contents[2:] and page['has_more']
+    oldest, page = _page(client, headers, f"/api/conversations/messages/{DM_ID}?limit=5&before={page['before']}")
+    assert oldest == contents[:2] and not page['has_more']
+    assert client.get(f'/api/conversations/messages/{DM_ID}?before=x&after=y', headers=headers).status_code == 400
@@ -0,0 +1,76 @@
+from bson.objectid import ObjectId
+from mongomock.collection import Collection
+from stats import STATS_ID
+
+
+def _pending(db, count):
+    return db.listings.insert_many([{'title': f'Flat {i}', 'status': 'pending'} for i in range(count)]).inserted_ids
+
+
+def test_moderation_skips_listings_no_longer_pending(client, db, make_user, auth):
+    admin = make_user('admin', role='admin')
+    pending, moderated = _pending(db, 2)
+    db.listings.update_one({'_id': moderated}, {'$set': {'status': 'declined'}})
+
+    response = client.post('/api/listings/admin/moderate', headers=auth(admin), json={'decisions': [
+        {'listing_id': str(pending), 'decision': 'approve'},
+        {'listing_id': str(moderated), 'decision': 'approve'},
+    ]})
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [r['result'] for r in body['results']] == ['approved', 'already_moderated']
+    assert body['modified'] == 1
+    assert db.listings.find_one({'_id': moderated})['status'] == 'declined'
+    stats = db.platform_stats.find_one({'_id': STATS_ID})['listings_by_status']
+    assert stats == {'pending': -1, 'approved': 1}
+
+
+def test_moderation_racing_another_admin_counts_only_its_changes(client, db, make_user, auth, monkeypatch):
+    admin = make_user('admin', role='admin')
+    ids = _pending(db, 4)
+    bulk_write = Collection.bulk_write
+
+    def moderated_meanwhile(self, requests, *args, **kwargs):
+        # Another admin rejects one listing and approves another between the read and the write
+        if self.name == 'listings':
+            db.listings.update_one({'_id': ids[0]}, {'$set': {'status': 'declined'}})
+            db.listings.update_one({'_id': ids[1]}, {'$set': {'status': 'approved'}})
+        return bulk_write(self, requests, *args, **kwargs)
+
+    monkeypatch.setattr(Collection, 'bulk_write', moderated_meanwhile)
+    response = client.post('/api/listings/admin/moderate', headers=auth(admin), json={
+        'decisions': [{'listing_id': str(_id), 'decision': 'approve'} for _id in ids[:3]]
+                     + [{'listing_id': str(ids[3]), 'decision': 'reject'}]
+    })
+
+    body = response.get_json()
+    assert [r['result'] for r in body['results']] == ['already_moderated', 'already_moderated', 'approved', 'declined']
+    assert body['modified'] == 2
+    assert db.listings.find_one({'_id': ids[0]})['status'] == 'declined'
+    stats = db.platform_stats.find_one({'_id': STATS_ID})['listings_by_status']
+    assert stats == {'pending': -2, 'approved': 1, 'declined': 1}
+
+
+def test_moderation_endpoints_require_admin(client, db, make_user, auth):
+    headers = auth(make_user('host', role='host'))
+    listing_id = str(_pending(db, 1)[0])
+
+    assert client.get('/api/listings/admin/pending').status_code == 401
+    assert client.get('/api/listings/admin/pending', headers=headers).status_code == 403
+    for path in ('/api/listings/admin/approve-listing', '/api/listings/admin/reject-listing'):
+        assert client.post(path, json={'listing_id': listing_id}).status_code == 401
+        assert client.post(path, headers=headers, json={'listing_id': listing_id}).status_code == 403
+    assert db.listings.find_one()['status'] == 'pending'
+
+
+def test_moderation_reports_unknown_and_invalid_listings(client, db, make_user, auth):
+    admin = make_user('admin', role='admin')
+
+    response = client.post('/api/listings/admin/moderate', headers=auth(admin), json={'decisions': [
+        {'listing_id': str(ObjectId()), 'decision': 'approve'},
+        {'listing_id': 'nope', 'decision': 'approve'},
+    ]})
+
+    assert [r['result'] for r in response.get_json()['results']] == ['not_found', 'invalid']
+    assert db.platform_stats.find_one({'_id': STATS_ID}) is None
@@ -0,0 +1,48 @@
+import pytest
+from werkzeug.security import generate_password_hash
+import passwords
+import routes.auth
+from passwords import hash_parameters, needs_rehash
+
+
+@pytest.mark.parametrize('configured, stored, rehash', [
+    ('scrypt', 'scrypt:32768:8:1', False),
+    (' Scrypt:32768:8:1 ', 'scrypt:32768:8:1', False),
+    ('scrypt:16384:8:1', 'scrypt:32768:8:1', True),
+    ('pbkdf2', f'pbkdf2:sha256:{passwords.DEFAULT_PBKDF2_ITERATIONS}', False),
+    ('pbkdf2:SHA256', f'pbkdf2:sha256:{passwords.DEFAULT_PBKDF2_ITERATIONS}', False),
+    ('pbkdf2:sha256:600000', 'pbkdf2:sha256:1000000', True),
+    ('scrypt', 'pbkdf2:sha256:1000000', True),
+])
+def test_needs_rehash_compares_parameters(monkeypatch, configured, stored, rehash):
+    monkeypatch.setattr(passwords, '_CONFIGURED_PARAMETERS', hash_parameters(configured))
+    assert needs_rehash(f'{stored}$salt$hash') is rehash
+
+
+def test_login_rehashes_outdated_hash_once(client, db, make_user):
+    user = make_user('guest')
+    db.users.update_one({'_id': user['_id']}, {'$set': {'password': generate_password_hash('secret1', 'pbkdf2:sha256:1000')}})
+
+    def login():
+        response = client.post('/api/auth/login', json={'username': 'guest', 'password': 'secret1'})
+        assert response.status_code == 200
+        return db.users.find_one({'_id': user['_id']})['password']
+
+    rehashed = login()
+    assert not needs_rehash(rehashed)
+    assert login() == rehashed
+
+
+def test_login_succeeds_when_the_pool_is_too_busy_to_rehash(client, db, make_user, monkeypatch):
+    user = make_user('guest')
+    outdated = generate_password_hash('secret1', 'pbkdf2:sha256:1000')
+    db.users.update_one({'_id': user['_id']}, {'$set': {'password': outdated}})
+
+    def busy(*args, **kwargs):
+        raise passwords.PasswordHashBusy()
+
+    monkeypatch.setattr(routes.auth, 'hash_password', busy)
+    response = client.post('/api/auth/login', json={'username': 'guest', 'password': 'secret1'})
+
+    assert response.status_code == 200
+    assert db.users.find_one({'_id': user['_id']})['password'] == outdated
@@ -0,0 +1,19 @@
+def test_host_cannot_read_another_hosts_reservations(client, listing, make_user, auth):
+    _, host = listing
+    other_host = make_user('otherhost', role='host')
+
+    for path in (f"/api/reservations/host/{host['_id']}", f"/api/reservations/host/{host['_id']}/dashboard"):
+        assert client.get(path, headers=auth(other_host)).status_code == 403, path
+        assert client.get(path, headers=auth(make_user(f'guest{len(path)}'))).status_code == 403, path
+
+    assert client.get(f"/api/reservations/host/{host['_id']}", headers=auth(host)).status_code == 200
+
+
+def test_user_cannot_read_another_users_trips(client, make_user, auth):
+    guest, other = make_user('guest'), make_user('other')
+    admin = make_user('admin', role='admin')
+
+    for path in (f"/api/reservations/user/{guest['_id']}", f"/api/reservations/user/{guest['_id']}/trips"):
+        assert client.get(path, headers=auth(other)).status_code == 403, path
+        assert client.get(path, headers=auth(guest)).status_code == 200, path
+        assert client.get(path, headers=auth(admin)).status_code == 200, path
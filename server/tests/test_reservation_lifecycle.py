@@ -0,0 +1,75 @@
+from datetime import datetime
+from bson.objectid import ObjectId
+from mongomock.collection import Collection
+from jobs.reservation_lifecycle import run_lifecycle
+
+CARD = {'card_number': '4242424242424242', 'card_holder': 'Guest', 'expiry': '12/35', 'cvv': '123'}
+
+
+def _book(client, auth, guest, listing_id):
+    response = client.post('/api/reservations/', headers=auth(guest), json={
+        'user_id': str(guest['_id']), 'listing_id': listing_id,
+        'start_date': '2030-01-01', 'end_date': '2030-01-04', 'total_price': 300, 'guests': 2
+    })
+    assert response.status_code == 201
+    return response.get_json()['_id']
+
+
+def test_expired_hold_cannot_be_paid(client, db, listing, make_user, auth):
+    listing_id, _ = listing
+    guest = make_user('guest')
+    reservation_id = _book(client, auth, guest, listing_id)
+
+    # A negative hold window expires every unpaid reservation
+    assert run_lifecycle(db, unpaid_hold_minutes=-1)['expired'] == 1
+    response = client.post('/api/payment/process', headers=auth(guest),
+                           json={**CARD, 'reservation_id': reservation_id, 'amount': 300})
+
+    assert response.status_code in (400, 409)
+    assert db.payments.count_documents({}) == 0
+    assert db.reservations.find_one({'_id': ObjectId(reservation_id)})['status'] == 'expired'
+
+
+def test_payment_racing_expiry_is_rejected(client, db, listing, make_user, auth, monkeypatch):
+    listing_id, _ = listing
+    guest = make_user('guest')
+    reservation_id = _book(client, auth, guest, listing_id)
+    find_one = Collection.find_one
+
+    def read_then_expire(self, *args, **kwargs):
+        # The payment reads the hold, then the lifecycle job expires it
+        document = find_one(self, *args, **kwargs)
+        if self.name == 'reservations' and document and document['_id'] == ObjectId(reservation_id):
+            run_lifecycle(db, unpaid_hold_minutes=-1)
+        return document
+
+    monkeypatch.setattr(Collection, 'find_one', read_then_expire)
+    response = client.post('/api/payment/process', headers=auth(guest),
+                           json={**CARD, 'reservation_id': reservation_id, 'amount': 300})
+
+    assert response.status_code == 409
+    assert db.payments.count_documents({}) == 0
+    assert db.reservations.find_one({'_id': ObjectId(reservation_id)})['status'] == 'expired'
+
+
+def test_lifecycle_records_only_reservations_it_changed(db, monkeypatch):
+    ids = [ObjectId() for _ in range(3)]
+    db.reservations.insert_many([
+        {'_id': _id, 'listing_id': ObjectId(), 'status': 'unpaid',
+         'start_date': datetime(2030, 1, 1), 'end_date': datetime(2030, 1, 4)}
+        for _id in ids
+    ])
+    update_many = Collection.update_many
+
+    def paid_meanwhile(self, filter, *args, **kwargs):
+        # One hold gets paid between the job's read and its update
+        if self.name == 'reservations':
+            db.reservations.update_one({'_id': ids[0]}, {'$set': {'status': 'confirmed'}})
+        return update_many(self, filter, *args, **kwargs)
+
+    monkeypatch.setattr(Collection, 'update_many', paid_meanwhile)
+    counts = run_lifecycle(db, unpaid_hold_minutes=-1)
+
+    assert counts['expired'] == 2
+    assert {e['reservation_id'] for e in db.reservation_events.find({'status': 'expired'})} == set(ids[1:])
+    assert db.reservations.find_one({'_id': ids[0]})['status'] == 'confirmed'
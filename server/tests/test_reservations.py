@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+from bson.objectid import ObjectId
+
+
+def test_update_reservation_only_changes_status(client, db, listing, make_user, auth):
+    listing_id, _ = listing
+    guest = make_user('guest')
+    headers = auth(guest)
+    reservation_id = client.post('/api/reservations/', headers=headers, json={
+        'user_id': str(guest['_id']), 'listing_id': listing_id,
+        'start_date': '2030-01-01', 'end_date': '2030-01-04', 'total_price': 300, 'guests': 2
+    }).get_json()['_id']
+    before = db.reservations.find_one()
+
+    response = client.put(f'/api/reservations/{reservation_id}', headers=headers, json={
+        'status': 'pending', 'start_date': '2031-05-05', 'listing_id': 'x', 'host_id': 'y'
+    })
+    assert response.status_code == 200
+    # A no-op update does not count another transition
+    client.put(f'/api/reservations/{reservation_id}', headers=headers, json={'status': 'pending'})
+
+    after = db.reservations.find_one()
+    assert after['status'] == 'pending'
+    assert {k: after[k] for k in ('start_date', 'end_date', 'listing_id', 'host_id')} == \
+        {k: before[k] for k in ('start_date', 'end_date', 'listing_id', 'host_id')}
+    assert db.reservation_events.count_documents({'status': 'pending'}) == 1
+
+
+def test_host_dashboard_joins_listing_and_guest(client, db, listing, auth):
+    listing_id, host = listing
+    guest = {'username': 'guest', 'name': 'Guest', 'role': 'user', 'password': 'hash', 'avatar': 'g.png'}
+    db.users.insert_one(guest)
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    db.reservations.insert_many([{
+        'listing_id': ObjectId(listing_id), 'user_id': guest['_id'], 'host_id': host['_id'], 'status': status,
+        'start_date': today + timedelta(days=offset), 'end_date': today + timedelta(days=offset + 2)
+    } for status, offset in (('confirmed', 10), ('pending', 20), ('past', -30))])
+
+    response = client.get(f"/api/reservations/host/{host['_id']}/dashboard?limit=2", headers=auth(host))
+
+    assert response.status_code == 200
+    dashboard = response.get_json()
+    assert dashboard['total'] == 3
+    assert dashboard['status_counts'] == {'confirmed': 1, 'pending': 1, 'past': 1}
+    assert [r['status'] for r in dashboard['reservations']] == ['pending', 'confirmed']
+    row = dashboard['reservations'][0]
+    assert (row['listing']['title'], row['listing']['image']) == ('Flat', 'a.jpg')
+    assert row['guest']['name'] == 'Guest' and row['guest']['avatar'] == 'g.png'
+    assert 'password' not in row['guest']
+    assert [r['status'] for r in dashboard['upcoming_checkins']] == ['confirmed']
+
+    response = client.get(f"/api/reservations/host/{host['_id']}/dashboard?status=past", headers=auth(host))
+    assert [r['status'] for r in response.get_json()['reservations']] == ['past']
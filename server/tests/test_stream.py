@@ -0,0 +1,65 @@
+from datetime import datetime
+import pytest
+from bson.objectid import ObjectId
+from pubsub import get_hub, MongoBackend
+import routes.messages as messages_routes
+
+
+@pytest.fixture
+def one_stream_slot(monkeypatch):
+    hub = get_hub()
+    monkeypatch.setattr(hub, 'max_subscriptions', hub.count + 1)
+    return hub
+
+
+def test_streams_beyond_the_cap_are_refused(client, make_user, auth, one_stream_slot):
+    taken = one_stream_slot.subscribe('user:someone')
+    try:
+        response = client.get('/api/messages/stream', headers=auth(make_user('guest')))
+
+        assert response.status_code == 503
+        assert response.headers['Retry-After']
+    finally:
+        taken.close()
+    # The slot is free again once the other stream closed
+    one_stream_slot.subscribe('user:guest').close()
+
+
+def test_too_many_missed_messages_send_a_reset(client, db, auth, monkeypatch):
+    monkeypatch.setattr(messages_routes, 'STREAM_REPLAY_LIMIT', 2)
+    guest = {'username': 'guest', 'name': 'Guest', 'role': 'user'}
+    db.users.insert_one(guest)
+    last_seen = ObjectId()
+    ids = db.messages.insert_many([{
+        'sender_username': 'host', 'receiver_username': 'guest', 'conversation_id': 'dm:guest|host',
+        'content': f'm{i}', 'created_at': datetime.utcnow()
+    } for i in range(3)]).inserted_ids
+
+    response = client.get(f'/api/messages/stream?last_event_id={last_seen}', headers=auth(guest), buffered=False)
+    try:
+        first = next(iter(response.response))
+    finally:
+        response.close()
+
+    first = first.decode() if isinstance(first, bytes) else first
+    assert first.startswith(f'id: {ids[-1]}\nevent: reset\n')
+
+
+def test_mongo_tail_resumes_in_natural_order(db):
+    dispatched = []
+    backend = MongoBackend(db, collection='pubsub_test')
+    backend.dispatch = lambda channel, event: dispatched.append(event['id'])
+    backend.collection = db['pubsub_test']
+    # Published by two workers: the later event has the smaller ObjectId
+    first, second, third = ObjectId(), ObjectId(), ObjectId()
+    for _id in (first, third, second):
+        backend.collection.insert_one({'_id': _id, 'channel': 'user:guest', 'event': {'id': str(_id)}})
+
+    assert backend._tail_after(first) == second
+    assert dispatched == [str(third), str(second)]
+
+    # The resume point was overwritten: everything left is newer
+    dispatched.clear()
+    backend.collection.delete_one({'_id': first})
+    backend._tail_after(ObjectId())
+    assert dispatched == [str(third), str(second)]
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+from archive import archive_name
+from sync import get_changes, record_changes, GAP_GRACE_SECONDS
+
+
+def _entries(db, username, seqs, age_seconds=0):
+    created_at = datetime.utcnow() - timedelta(seconds=age_seconds)
+    db.sync_changes.insert_many([{'username': username, 'seq': seq, 'created_at': created_at} for seq in seqs])
+    db.sync_counters.update_one({'_id': username}, {'$max': {'seq': max(seqs)}}, upsert=True)
+
+
+def _seqs(entries):
+    return [entry['seq'] for entry in entries]
+
+
+def test_returns_changes_up_to_an_in_flight_gap(db):
+    _entries(db, 'guest', [1, 2, 4])
+
+    entries, has_more, reset = get_changes(db, 'guest', 0, 10)
+    assert (_seqs(entries), has_more, reset) == ([1, 2], True, False)
+    # The cursor stays at 2 until seq 3 is inserted or the gap is old enough
+    assert get_changes(db, 'guest', 2, 10) == ([], True, False)
+
+
+def test_an_old_gap_is_skipped(db):
+    _entries(db, 'guest', [1, 2, 4], age_seconds=GAP_GRACE_SECONDS + 60)
+
+    entries, has_more, reset = get_changes(db, 'guest', 0, 10)
+    assert (_seqs(entries), has_more, reset) == ([1, 2, 4], False, False)
+
+
+def test_expired_head_resets(db):
+    # Entries 2-3 expired, the client last saw 1
+    _entries(db, 'guest', [4, 5], age_seconds=GAP_GRACE_SECONDS + 60)
+
+    assert get_changes(db, 'guest', 1, 10) == ([], False, True)
+
+
+def test_since_past_every_retained_entry(db):
+    record_changes(db, ['guest'])
+    record_changes(db, ['guest'])
+
+    assert get_changes(db, 'guest', 2, 10) == ([], False, False)
+    # Everything after the cursor expired while the counter moved on
+    db.sync_changes.delete_many({})
+    assert get_changes(db, 'guest', 1, 10) == ([], False, True)
+
+
+def test_sync_returns_archived_messages(client, db, auth):
+    guest = {'username': 'guest', 'name': 'Guest', 'role': 'user'}
+    db.users.insert_one(guest)
+    message = {'conversation_id': 'dm:guest|host', 'sender_username': 'host', 'receiver_username': 'guest',
+               'content': 'Welcome', 'created_at': datetime.utcnow() - timedelta(days=400)}
+    db[archive_name('messages')].insert_one(message)
+    record_changes(db, ['guest'], message_id=message['_id'])
+
+    response = client.get('/api/messages/sync?since=0', headers=auth(guest))
+    assert response.status_code == 200
+    assert [m['content'] for m in response.get_json()['messages']] == ['Welcome']
+
+    response = client.delete(f"/api/messages/{message['_id']}", headers=auth(guest))
+    assert response.status_code == 409
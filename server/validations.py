@@ -38,7 +38,7 @@ reservations_validations = {
 }
 
 update_reservation_validations = {
-    "status": lambda x: isinstance(x, str) and x in ["pending", "upcoming", "declined", "past", "unpaid"],
+    "status": lambda x: isinstance(x, str) and x in ["pending", "upcoming", "declined", "past", "unpaid", "expired"],
 }
 
 messages_validations = {